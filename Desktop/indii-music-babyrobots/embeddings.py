@@ -0,0 +1,197 @@
+"""Embedding functions for MemoryHub.
+
+"default" is Chroma's built-in model, which is downloaded on first use. "local" is a
+deterministic hashed character n-gram embedding computed with NumPy, which needs no
+network or model files. Either one can be wrapped in CachedEmbeddingFunction, which keeps
+a content-hash -> vector cache on disk so identical documents are embedded once.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions import register_embedding_function
+
+EMBEDDINGS = ("default", "local")
+DEFAULT_EMBEDDING = os.environ.get("INDII_EMBEDDING", "default")
+CACHE_FILENAME = "embedding_cache.sqlite3"
+# Texts handed to the wrapped embedding function per call on a cache miss
+DEFAULT_BATCH_SIZE = 256
+# Keys per SQLite lookup, below SQLite's bound-parameter limit
+_LOOKUP_CHUNK = 500
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+_MIX = np.uint64(0xBF58476D1CE4E5B9)
+
+
+def _ngram_hashes(data: np.ndarray, n: int) -> np.ndarray:
+    # 64-bit FNV-1a of every n-byte window of `data`, finished with a multiply-xorshift so
+    # that both the low bits (bucket) and the top bit (sign) are well mixed
+    windows = np.lib.stride_tricks.sliding_window_view(data, n)
+    h = np.full(len(windows), _FNV_OFFSET ^ np.uint64(n), dtype=np.uint64)
+    for k in range(n):
+        h ^= windows[:, k]
+        h *= _FNV_PRIME
+    h ^= h >> np.uint64(31)
+    h *= _MIX
+    h ^= h >> np.uint64(29)
+    return h
+
+
+@register_embedding_function
+class HashedNgramEmbedding(EmbeddingFunction[Documents]):
+    """Feature-hashed character n-grams, sublinearly scaled and L2-normalized.
+
+    Each n-gram adds +1 or -1 (by its hash) to one of `dim` buckets (the hashing trick), so
+    texts sharing many substrings end up close together. A batch of texts is embedded with
+    a handful of vectorized NumPy passes, one per n-gram length.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (3, 5), lowercase: bool = True):
+        self.dim = dim
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.lowercase = lowercase
+
+    def __call__(self, input: Documents) -> Embeddings:
+        texts = [text.lower() for text in input] if self.lowercase else list(input)
+        if not texts:
+            return []
+        encoded = [text.encode("utf-8") for text in texts]
+        # All texts in one byte array; n-grams spanning two texts are masked out below
+        ends = np.cumsum([len(data) for data in encoded])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        counts = np.zeros(len(texts) * self.dim)
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            if len(data) < n:
+                break
+            hashes = _ngram_hashes(data, n)
+            starts = np.arange(len(hashes))
+            owner = np.searchsorted(ends, starts, side="right")
+            inside = starts + n <= ends[owner]
+            hashes, owner = hashes[inside], owner[inside]
+            buckets = (hashes % np.uint64(self.dim)).astype(np.int64)
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+            counts += np.bincount(owner * self.dim + buckets, weights=signs, minlength=counts.size)
+        vectors = counts.reshape(len(texts), self.dim)
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        return list(vectors.astype(np.float32))
+
+    @staticmethod
+    def name() -> str:
+        return "hashed-ngram"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dim": self.dim, "ngram_range": list(self.ngram_range), "lowercase": self.lowercase}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "HashedNgramEmbedding":
+        return HashedNgramEmbedding(
+            dim=config.get("dim", 512),
+            ngram_range=tuple(config.get("ngram_range", (3, 5))),
+            lowercase=config.get("lowercase", True),
+        )
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Wrap an embedding function with an on-disk cache keyed by a hash of each text.
+
+    Keys also cover the wrapped function's name and config, so switching models or settings
+    never returns stale vectors. Texts missing from the cache are deduplicated and embedded
+    in batches of `batch_size`. The wrapper reports the wrapped function's name and config
+    to Chroma, so adding or removing the cache does not change a collection's identity.
+    """
+
+    def __init__(self, inner: EmbeddingFunction, cache_path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.inner = inner
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._namespace = f"{inner.name()}\0{json.dumps(inner.get_config(), sort_keys=True, default=str)}\0"
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key BLOB PRIMARY KEY, vector BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256((self._namespace + text).encode("utf-8")).digest()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [self._key(text) for text in input]
+        found = self._lookup(list(set(keys)))
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, input):
+            if key not in found:
+                missing.setdefault(key, text)
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            missing_keys = list(missing)
+            for i in range(0, len(missing_keys), self.batch_size):
+                chunk = missing_keys[i:i + self.batch_size]
+                vectors = self.inner([missing[key] for key in chunk])
+                found.update(zip(chunk, (np.asarray(vector, dtype=np.float32) for vector in vectors)))
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)",
+                    [(key, found[key].tobytes()) for key in missing_keys],
+                )
+                self._conn.commit()
+        return [found[key] for key in keys]
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[i:i + _LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def name(self) -> str:
+        return self.inner.name()
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.inner.get_config()
+
+    def build_from_config(self, config: Dict[str, Any]) -> EmbeddingFunction:
+        return self.inner.build_from_config(config)
+
+    def default_space(self):
+        return self.inner.default_space()
+
+    def supported_spaces(self):
+        return self.inner.supported_spaces()
+
+
+def make_embedding_function(
+    embedding: Optional[str] = None, cache_dir: Optional[str] = None
+) -> EmbeddingFunction:
+    """Build the embedding function named `embedding` (see EMBEDDINGS), cached under `cache_dir` if given."""
+    embedding = embedding or DEFAULT_EMBEDDING
+    if embedding == "local":
+        inner: EmbeddingFunction = HashedNgramEmbedding()
+    elif embedding == "default":
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+        inner = DefaultEmbeddingFunction()
+    else:
+        raise ValueError(f"embedding must be one of {EMBEDDINGS}, got {embedding!r}")
+    if cache_dir is None:
+        return inner
+    return CachedEmbeddingFunction(inner, os.path.join(cache_dir, CACHE_FILENAME))
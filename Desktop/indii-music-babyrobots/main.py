@@ -1,20 +1,37 @@
+from typing import Optional
 from fastapi import FastAPI, Form, UploadFile, File
 import uvicorn
 from memory_hub import MemoryHub
+from rush_memory import TieredMemory
 from agents.crew_runtime import LabelHead
 
 app = FastAPI()
 mem = MemoryHub()
+tiers = TieredMemory(mem)
+
+@app.on_event("shutdown")
+def flush_memory():
+    # Promote what is left in rush memory, then write out the write-behind buffer
+    tiers.close()
+    mem.close()
 
 @app.get("/")
 def health():
     return {"status": "ok"}
 
 @app.post("/chat")
-def chat(message: str = Form(...), file: UploadFile = File(...)):
-    # 1. Persist file & metadata
-    release_id = mem.save("user", "demo", {"message": message, "filename": file.filename})
+def chat(message: str = Form(...), file: UploadFile = File(...), session_id: Optional[str] = Form(None)):
+    # 1. Persist file & metadata (live sessions go to rush memory, promoted to Chroma later)
+    payload = {"message": message, "filename": file.filename}
+    if session_id:
+        release_id = tiers.remember(session_id, "user", "demo", payload)
+    else:
+        release_id = mem.save("user", "demo", payload)
     # 2. Spawn LabelHead agent
     lh = LabelHead(memory=mem)
     card = lh.handle(message, file)
     return card
+
+@app.get("/sessions/{session_id}/memory/stats")
+def session_memory_stats(session_id: str):
+    return tiers.session_stats(session_id)
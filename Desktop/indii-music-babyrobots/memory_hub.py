@@ -1,18 +1,426 @@
-import uuid
+import atexit
+import heapq
 import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
 import chromadb
-from typing import Any, Dict
+from chromadb.errors import NotFoundError
+
+from embeddings import make_embedding_function
+
+logger = logging.getLogger(__name__)
+
+# "async": save() returns as soon as the record is buffered (a crash can lose the last
+# flush_interval of saves). "sync": save() returns once the batch holding the record is written.
+DURABILITY_MODES = ("async", "sync")
+# Records fetched per `get` call when paging through a release
+DEFAULT_PAGE_SIZE = 500
+
+# "none": one collection. Otherwise records are spread over a fixed set of num_shards
+# collections by a hash of their release_id ("release"), agent ("agent") or id ("hash"). Reads
+# filtered to one release (agent) search a single shard, with the filter still applied inside
+# Chroma; other reads fan out to at most num_shards collections, however many releases exist.
+SHARDINGS = ("none", "release", "agent", "hash")
+DEFAULT_SHARDING = os.environ.get("INDII_SHARDING", "none")
+DEFAULT_NUM_SHARDS = 16
+# Threads querying shards in parallel
+DEFAULT_QUERY_WORKERS = 8
+_SHARD_KEYS = {"release": "release_id", "agent": "agent"}
+
 
 class MemoryHub:
-    def __init__(self, persist_dir: str = "./chroma_db"):
+    def __init__(
+        self,
+        persist_dir: str = "./chroma_db",
+        batch_size: int = 64,
+        flush_interval: float = 0.05,
+        durability: str = "async",
+        embedding: Optional[str] = None,
+        embedding_function: Optional[Any] = None,
+        embedding_cache: bool = True,
+        sharding: Optional[str] = None,
+        num_shards: int = DEFAULT_NUM_SHARDS,
+        query_workers: int = DEFAULT_QUERY_WORKERS,
+    ):
+        """
+        `embedding` names the embedding function ("default" for Chroma's downloaded model,
+        "local" for the offline hashed n-gram one; INDII_EMBEDDING picks when omitted), cached
+        on disk in `persist_dir` unless embedding_cache=False. `embedding_function` overrides
+        it with any Chroma embedding function, used as given.
+
+        `sharding` (see SHARDINGS; INDII_SHARDING picks when omitted) spreads records over
+        several collections; each sharding keeps its own collections, so records saved under
+        one are not visible under another.
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, got {durability!r}")
+        sharding = sharding or DEFAULT_SHARDING
+        if sharding not in SHARDINGS:
+            raise ValueError(f"sharding must be one of {SHARDINGS}, got {sharding!r}")
         self.client = chromadb.PersistentClient(path=persist_dir)
-        self.coll = self.client.get_or_create_collection("indii")
+        if embedding_function is None:
+            embedding_function = make_embedding_function(embedding, persist_dir if embedding_cache else None)
+        self.embedding_function = embedding_function
+        self.sharding = sharding
+        self.num_shards = num_shards
+        # Vectors from different embedding functions cannot share a collection
+        name = embedding_function.name()
+        self._base_name = "indii" if name == "default" else f"indii-{name}"
+        self._collections: Dict[str, Any] = {}
+        self._collections_lock = threading.Lock()
+        # The single collection when unsharded (None otherwise)
+        self.coll = self._collection(self._base_name, create=True) if sharding == "none" else None
+        self._query_pool = (
+            ThreadPoolExecutor(max_workers=query_workers, thread_name_prefix="memory-hub-query")
+            if sharding != "none" else None
+        )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+
+        # Write-behind buffer: (doc_id, document, metadata, future), drained by the flusher thread
+        self._buffer: List[tuple] = []
+        self._oldest_at = 0.0
+        self._draining = False  # Write out the whole buffer without waiting for flush_interval
+        # Futures of the batch the flusher has taken off the buffer and is writing
+        self._in_flight: List[Future] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self.flushed_batches = 0
+        self.failed_records = 0
+        self._flusher = threading.Thread(target=self._flush_loop, name="memory-hub-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def save(self, agent: str, release_id: str, payload: Dict[str, Any], durable: Optional[bool] = None) -> str:
+        """Buffer one memory and return its id.
 
-    def save(self, agent: str, release_id: str, payload: Dict[str, Any]) -> str:
+        Saves are coalesced into one `add` per batch, flushed once `batch_size` records are
+        waiting or the oldest has waited `flush_interval` seconds. With durable=True (or
+        durability="sync") the call blocks until its batch is written and re-raises a write error;
+        such saves are written without waiting out `flush_interval`, batched with whatever other
+        saves arrive while the previous batch is being written.
+        """
+        if durable is None:
+            durable = self.durability == "sync"
         doc_id = str(uuid.uuid4())
-        self.coll.add(
-            documents=[json.dumps(payload)],
-            metadatas=[{"agent": agent, "release_id": release_id}],
-            ids=[doc_id]
-        )
+        future = self._enqueue(doc_id, json.dumps(payload), {"agent": agent, "release_id": release_id}, durable)
+        if durable:
+            future.result()
         return doc_id
+
+    def save_many(self, records: Iterable[Dict[str, Any]], durable: Optional[bool] = None) -> List[str]:
+        """Buffer many memories at once and return their ids, in order.
+
+        Each record is a dict with "agent", "release_id" and "payload" keys, plus optionally an
+        "id" to store it under and extra Chroma "metadata" (scalar values only). The records
+        are buffered under a single lock acquisition and written in batches of `batch_size`;
+        durability works as in `save`, waiting for every batch the records went into.
+        """
+        if durable is None:
+            durable = self.durability == "sync"
+        entries = [
+            (
+                record.get("id") or str(uuid.uuid4()),
+                json.dumps(record["payload"]),
+                {**record.get("metadata", {}), "agent": record["agent"], "release_id": record["release_id"]},
+            )
+            for record in records
+        ]
+        futures = self._enqueue_many(entries, durable)
+        if durable:
+            for future in futures:
+                future.result()
+        return [doc_id for doc_id, _, _ in entries]
+
+    def query(
+        self, texts: List[str], where: Optional[Dict[str, Any]] = None, n_results: int = 10
+    ) -> Iterator[Iterator[Dict[str, Any]]]:
+        """Find the memories most similar to each of `texts` with one vectorized Chroma query per shard.
+
+        `where` is a Chroma metadata filter (e.g. {"agent": "user"}) applied inside Chroma; when
+        sharding by release or agent, a filter on that key also picks the shards to search.
+        Several shards are queried in parallel and their top `n_results` merged by distance.
+        Yields, per query text and in the same order, a generator of matches closest first:
+        records as from `get`, plus "distance". Payloads are decoded only as the generators
+        are consumed.
+        """
+        if not texts:
+            return
+        self.flush()  # Read our own writes
+        texts = list(texts)
+        shards = self._shards_for(where)
+        # Embedded once here rather than again by every shard
+        embeddings = self.embedding_function.embed_query(texts) if shards else []
+        results = self._map_shards(
+            lambda coll: coll.query(
+                query_embeddings=embeddings,
+                n_results=n_results,
+                where=where,
+                include=["documents", "metadatas", "distances"],
+            ),
+            shards,
+        )
+        for i in range(len(texts)):
+            candidates = [
+                (distance, shard, j)
+                for shard, result in enumerate(results)
+                for j, distance in enumerate(result["distances"][i])
+            ]
+            yield _iter_merged(results, i, heapq.nsmallest(n_results, candidates))
+
+    def get(self, ids: List[str]) -> Iterator[Dict[str, Any]]:
+        """Yield the stored memories with the given ids (missing ids are skipped).
+
+        Records are dicts with "id", "agent", "release_id", "payload" and the full Chroma "metadata".
+        """
+        if not ids:
+            return
+        self.flush()
+        if self.sharding == "hash":
+            by_shard: Dict[str, List[str]] = {}
+            for doc_id in ids:
+                by_shard.setdefault(self._shard_of(doc_id), []).append(doc_id)
+            requests = [(coll, by_shard[name]) for name in by_shard if (coll := self._collection(name)) is not None]
+        else:
+            # Release / agent shards cannot be told from an id, so every shard is asked
+            requests = [(coll, list(ids)) for coll in self._shards_for(None)]
+        pages = self._map_shards(
+            lambda request: request[0].get(ids=request[1], include=["documents", "metadatas"]), requests
+        )
+        for page in pages:
+            yield from _iter_records(page["ids"], page["documents"], page["metadatas"])
+
+    def get_by_release(
+        self, release_id: str, agent: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield every memory saved for `release_id` (optionally only `agent`'s).
+
+        The filter runs inside Chroma (and picks the one shard to read when sharding by release,
+        or by agent with `agent` given) and records are fetched `page_size` at a time, so a
+        large release is never loaded whole. Records are as from `get`.
+        """
+        self.flush()
+        where: Dict[str, Any] = {"release_id": release_id}
+        if agent is not None:
+            where = {"$and": [where, {"agent": agent}]}
+        for coll in self._shards_for(where):
+            offset = 0
+            while True:
+                page = coll.get(where=where, limit=page_size, offset=offset, include=["documents", "metadatas"])
+                yield from _iter_records(page["ids"], page["documents"], page["metadatas"])
+                if len(page["ids"]) < page_size:
+                    break
+                offset += page_size
+
+    def count(self) -> int:
+        """Number of stored memories, across all shards."""
+        self.flush()
+        return sum(self._map_shards(lambda coll: coll.count(), self._shards_for(None)))
+
+    def _collection(self, name: str, create: bool = False) -> Optional[Any]:
+        # Cached collection handle; None for a collection that does not exist unless `create`
+        with self._collections_lock:
+            coll = self._collections.get(name)
+            if coll is None:
+                try:
+                    if create:
+                        coll = self.client.get_or_create_collection(name, embedding_function=self.embedding_function)
+                    else:
+                        coll = self.client.get_collection(name, embedding_function=self.embedding_function)
+                except NotFoundError:
+                    return None
+                self._collections[name] = coll
+            return coll
+
+    def _shard_name(self, shard: int) -> str:
+        return f"{self._base_name}-{self.sharding}-{shard:03d}"
+
+    def _shard_of(self, key: Any) -> str:
+        # crc32 rather than hash(), which is salted per process
+        return self._shard_name(zlib.crc32(str(key).encode("utf-8")) % self.num_shards)
+
+    def _shard_for_record(self, doc_id: str, metadata: Dict[str, Any]) -> str:
+        if self.sharding == "none":
+            return self._base_name
+        if self.sharding == "hash":
+            return self._shard_of(doc_id)
+        return self._shard_of(metadata[_SHARD_KEYS[self.sharding]])
+
+    def _shards_for(self, where: Optional[Dict[str, Any]]) -> List[Any]:
+        """The existing collections that can hold records matching `where` (at most num_shards)."""
+        if self.sharding == "none":
+            return [self.coll]
+        values = _routed_values(where, _SHARD_KEYS[self.sharding]) if self.sharding in _SHARD_KEYS else None
+        if values is not None:
+            names = list(dict.fromkeys(self._shard_of(value) for value in values))
+        else:
+            names = [self._shard_name(shard) for shard in range(self.num_shards)]
+        return [coll for coll in map(self._collection, names) if coll is not None]
+
+    def _map_shards(self, fn, items: List[Any]) -> List[Any]:
+        # Runs `fn` over shards (or per-shard requests) in parallel when there are several
+        if len(items) <= 1 or self._query_pool is None:
+            return [fn(item) for item in items]
+        return list(self._query_pool.map(fn, items))
+
+    def _enqueue(self, doc_id: str, document: str, metadata: Dict[str, Any], urgent: bool = False) -> Future:
+        return self._enqueue_many([(doc_id, document, metadata)], urgent)[0]
+
+    def _enqueue_many(self, entries: List[tuple], urgent: bool = False) -> List[Future]:
+        futures: List[Future] = [Future() for _ in entries]
+        if not entries:
+            return futures
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MemoryHub is closed")
+            was_empty = not self._buffer
+            if was_empty:
+                self._oldest_at = time.monotonic()
+            self._buffer.extend((*entry, future) for entry, future in zip(entries, futures))
+            # A waiting caller makes the buffer due now (group commit: whatever arrives while
+            # the previous batch is being written goes out together in the next one)
+            self._draining = self._draining or urgent
+            # The first record starts the flush_interval clock; a full batch is due now
+            if urgent or was_empty or len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        return futures
+
+    def _take_batch(self) -> List[tuple]:
+        # Called with self._cond held
+        batch = self._buffer[:self.batch_size]
+        del self._buffer[:self.batch_size]
+        self._in_flight = [future for _, _, _, future in batch]
+        if self._buffer:
+            self._oldest_at = time.monotonic()
+        else:
+            self._draining = False
+        return batch
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._buffer and (
+                        self._closed
+                        or self._draining
+                        or len(self._buffer) >= self.batch_size
+                        or time.monotonic() - self._oldest_at >= self.flush_interval
+                    ):
+                        break
+                    if self._closed:
+                        return
+                    if self._buffer:
+                        self._cond.wait(self.flush_interval - (time.monotonic() - self._oldest_at))
+                    else:
+                        self._cond.wait()
+                batch = self._take_batch()
+            self._write(batch)
+            with self._cond:
+                self._in_flight = []
+
+    def _write(self, batch: List[tuple]) -> None:
+        # One add per shard the batch touches
+        by_shard: Dict[str, List[tuple]] = {}
+        for entry in batch:
+            by_shard.setdefault(self._shard_for_record(entry[0], entry[2]), []).append(entry)
+        for name, entries in by_shard.items():
+            try:
+                self._collection(name, create=True).add(
+                    ids=[doc_id for doc_id, _, _, _ in entries],
+                    documents=[document for _, document, _, _ in entries],
+                    metadatas=[metadata for _, _, metadata, _ in entries],
+                )
+            except Exception as e:
+                self.failed_records += len(entries)
+                logger.exception("MemoryHub failed to write a batch of %d records", len(entries))
+                for _, _, _, future in entries:
+                    future.set_exception(e)
+                continue
+            for _, _, _, future in entries:
+                future.set_result(None)
+        self.flushed_batches += 1
+
+    def flush(self) -> None:
+        """Block until every record saved so far has been written (or has failed).
+
+        Covers both the records still buffered and the batch the flusher is writing right now.
+        """
+        with self._cond:
+            if self._buffer:
+                self._draining = True
+                self._cond.notify()
+            pending = self._in_flight + [future for _, _, _, future in self._buffer]
+        for future in pending:
+            try:
+                future.result()
+            except Exception:
+                pass  # Already logged by the flusher
+
+    def close(self) -> None:
+        """Flush everything still buffered and stop the flusher thread; called at interpreter exit."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join()
+        if self._query_pool is not None:
+            self._query_pool.shutdown()
+        atexit.unregister(self.close)
+
+
+def _routed_values(where: Optional[Dict[str, Any]], key: str) -> Optional[List[Any]]:
+    """Values of `key` that a Chroma filter restricts records to, or None if it does not.
+
+    Understands {key: v}, {key: {"$eq": v}}, {key: {"$in": [...]}} and such clauses inside "$and".
+    """
+    if not where:
+        return None
+    if key in where:
+        condition = where[key]
+        if not isinstance(condition, dict):
+            return [condition]
+        if "$eq" in condition:
+            return [condition["$eq"]]
+        if "$in" in condition:
+            return list(condition["$in"])
+        return None
+    for clause in where.get("$and", ()):
+        values = _routed_values(clause, key)
+        if values is not None:
+            return values
+    return None
+
+
+def _record(doc_id: str, document: str, metadata: Optional[Dict[str, Any]], distance=None) -> Dict[str, Any]:
+    metadata = metadata or {}
+    record = {
+        "id": doc_id,
+        "agent": metadata.get("agent"),
+        "release_id": metadata.get("release_id"),
+        "payload": json.loads(document),
+        "metadata": metadata,
+    }
+    if distance is not None:
+        record["distance"] = distance
+    return record
+
+
+def _iter_records(ids, documents, metadatas, distances=None) -> Iterator[Dict[str, Any]]:
+    for i, doc_id in enumerate(ids):
+        yield _record(doc_id, documents[i], metadatas[i], distances[i] if distances is not None else None)
+
+
+def _iter_merged(results: List[Dict[str, Any]], i: int, top: List[tuple]) -> Iterator[Dict[str, Any]]:
+    # `top` holds (distance, shard, position) of the best matches for query text `i`
+    for distance, shard, j in top:
+        result = results[shard]
+        yield _record(result["ids"][i][j], result["documents"][i][j], result["metadatas"][i][j], distance)
@@ -0,0 +1,323 @@
+"""Rush + crash tiered memory (docs/memory_infra.md, section 5).
+
+"Rush" memory is short-lived and per session: an in-process store with a TTL and an LRU
+bound per session, mirroring src/lib/memory/rush-memory.js. "Crash" memory is the persistent
+Chroma collection behind MemoryHub. Entries are promoted from rush to crash in the
+background, and reads check rush first.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from memory_hub import MemoryHub
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 30 * 60  # seconds, as in rush-memory.js
+DEFAULT_MAX_ENTRIES = 1000  # per session
+# Entries at or above this importance are promoted to crash memory as soon as they reach it
+DEFAULT_IMPORTANCE_THRESHOLD = 0.8
+# Entries leaving rush memory (TTL expiry, LRU eviction, session end) are promoted when at or
+# above this importance; the default keeps everything, raise it to let small talk expire
+DEFAULT_EXPIRY_THRESHOLD = 0.0
+DEFAULT_SWEEP_INTERVAL = 5.0  # seconds between expiry sweeps
+
+
+@dataclass
+class RushEntry:
+    id: str
+    session_id: str
+    agent: str
+    release_id: str
+    payload: Dict[str, Any]
+    importance: float
+    expires_at: float
+    promoted: bool = False
+
+    def to_record(self) -> Dict[str, Any]:
+        # Same shape as MemoryHub records, plus the tier it was read from
+        return {
+            "id": self.id,
+            "agent": self.agent,
+            "release_id": self.release_id,
+            "payload": self.payload,
+            "metadata": _crash_metadata(self),
+            "tier": "rush",
+        }
+
+
+def _crash_metadata(entry: RushEntry) -> Dict[str, Any]:
+    return {
+        "agent": entry.agent,
+        "release_id": entry.release_id,
+        "session_id": entry.session_id,
+        "importance": entry.importance,
+    }
+
+
+class RushMemory:
+    """Per-session in-process memory with a TTL and an LRU bound on each session.
+
+    Lookups are counted per session so hit ratios can be reported. Methods that drop entries
+    return them, so the caller can decide what to keep.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._sessions: Dict[str, "OrderedDict[str, RushEntry]"] = {}
+        self._lookups: Dict[str, List[int]] = {}  # session_id -> [hits, misses]
+        self._lock = threading.Lock()
+
+    def put(self, entry: RushEntry) -> List[RushEntry]:
+        """Store `entry` as its session's most recently used; returns the entries evicted to make room."""
+        with self._lock:
+            session = self._sessions.setdefault(entry.session_id, OrderedDict())
+            session[entry.id] = entry
+            session.move_to_end(entry.id)
+            evicted = []
+            while len(session) > self.max_entries:
+                evicted.append(session.popitem(last=False)[1])
+            return evicted
+
+    def get(self, session_id: str, memory_id: str) -> Optional[RushEntry]:
+        """Return a live entry (marking it recently used), or None if it is absent or expired."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            entry = session.get(memory_id) if session else None
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            session.move_to_end(memory_id)
+            return entry
+
+    def entries(self, session_id: str) -> List[RushEntry]:
+        """Live entries of a session, most recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id) or {}
+            return [entry for entry in reversed(session.values()) if entry.expires_at > now]
+
+    def record_lookup(self, session_id: str, hit: bool) -> None:
+        with self._lock:
+            counts = self._lookups.setdefault(session_id, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def expire(self) -> List[RushEntry]:
+        """Drop every expired entry, and the lookup counts of sessions left without entries; returns the entries."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for session_id in list(self._sessions):
+                session = self._sessions[session_id]
+                for memory_id in [memory_id for memory_id, entry in session.items() if entry.expires_at <= now]:
+                    expired.append(session.pop(memory_id))
+                if not session:
+                    del self._sessions[session_id]
+            # A session's counts live as long as its rush entries, so sessions that are never
+            # ended explicitly do not pile up
+            for session_id in [session_id for session_id in self._lookups if session_id not in self._sessions]:
+                del self._lookups[session_id]
+        return expired
+
+    def drop_session(self, session_id: str) -> List[RushEntry]:
+        """Forget a session, including its lookup counts; returns its entries."""
+        with self._lock:
+            self._lookups.pop(session_id, None)
+            return list((self._sessions.pop(session_id, None) or {}).values())
+
+    def drain(self) -> List[RushEntry]:
+        """Drop every entry of every session; returns them."""
+        with self._lock:
+            entries = [entry for session in self._sessions.values() for entry in session.values()]
+            self._sessions.clear()
+            return entries
+
+    def session_stats(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self._lookups.get(session_id, (0, 0))
+            entries = len(self._sessions.get(session_id) or ())
+        total = hits + misses
+        return {"entries": entries, "hits": hits, "misses": misses, "hit_ratio": hits / total if total else 0.0}
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Stats of every session with entries or recorded lookups, keyed by session id."""
+        with self._lock:
+            session_ids = set(self._sessions) | set(self._lookups)
+        return {session_id: self.session_stats(session_id) for session_id in session_ids}
+
+
+class TieredMemory:
+    """Rush memory in front of a MemoryHub's persistent (crash) collection.
+
+    `remember` writes to rush only. A background thread promotes entries into crash memory
+    when their importance reaches `importance_threshold` (at once) or when they leave rush,
+    by TTL expiry or LRU eviction, with importance of at least `expiry_threshold`. An entry
+    counts as promoted only once its write is acknowledged; failed promotions are retried on
+    the next sweep. A promoted entry keeps its id and stays readable from rush until it expires.
+    """
+
+    def __init__(
+        self,
+        hub: MemoryHub,
+        ttl: float = DEFAULT_TTL,
+        max_entries_per_session: int = DEFAULT_MAX_ENTRIES,
+        importance_threshold: float = DEFAULT_IMPORTANCE_THRESHOLD,
+        expiry_threshold: float = DEFAULT_EXPIRY_THRESHOLD,
+        sweep_interval: float = DEFAULT_SWEEP_INTERVAL,
+    ):
+        self.hub = hub
+        self.rush = RushMemory(ttl=ttl, max_entries=max_entries_per_session)
+        self.importance_threshold = importance_threshold
+        self.expiry_threshold = expiry_threshold
+        self.sweep_interval = sweep_interval
+        self.promoted = 0
+
+        self._pending: List[RushEntry] = []
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._promoter = threading.Thread(target=self._promote_loop, name="rush-memory-promoter", daemon=True)
+        self._promoter.start()
+
+    def remember(
+        self, session_id: str, agent: str, release_id: str, payload: Dict[str, Any], importance: float = 0.0
+    ) -> str:
+        """Store a memory in the session's rush tier and return its id."""
+        entry = RushEntry(
+            id=str(uuid.uuid4()),
+            session_id=session_id,
+            agent=agent,
+            release_id=release_id,
+            payload=payload,
+            importance=importance,
+            expires_at=time.monotonic() + self.rush.ttl,
+        )
+        evicted = self.rush.put(entry)
+        self._schedule([e for e in evicted if self._keep_on_exit(e)])
+        if importance >= self.importance_threshold:
+            self._schedule([entry])
+        return entry.id
+
+    def set_importance(self, session_id: str, memory_id: str, importance: float) -> bool:
+        """Update a rush entry's importance, promoting it if it crosses the threshold; False if it is not in rush."""
+        entry = self.rush.get(session_id, memory_id)
+        if entry is None:
+            return False
+        entry.importance = importance
+        if importance >= self.importance_threshold:
+            self._schedule([entry])
+        return True
+
+    def get(self, session_id: str, memory_id: str) -> Optional[Dict[str, Any]]:
+        """Read one memory, from rush if it is there and from crash memory otherwise."""
+        entry = self.rush.get(session_id, memory_id)
+        self.rush.record_lookup(session_id, entry is not None)
+        if entry is not None:
+            return entry.to_record()
+        for record in self.hub.get([memory_id]):
+            return dict(record, tier="crash")
+        return None
+
+    def recall(self, session_id: str, text: str, n_results: int = 5) -> List[Dict[str, Any]]:
+        """Find up to `n_results` of the session's memories about `text`, rush first.
+
+        Rush entries whose payload contains `text` (case-insensitively) come first, most
+        mentions then most recently used first. Only if they are fewer than `n_results` is
+        crash memory queried (a miss), for the session's nearest neighbours of `text`.
+        """
+        needle = text.lower()
+        matches = []
+        for entry in self.rush.entries(session_id):
+            mentions = json.dumps(entry.payload).lower().count(needle)
+            if mentions:
+                matches.append((mentions, entry))
+        matches.sort(key=lambda match: match[0], reverse=True)  # Stable: ties stay most recent first
+        records = [entry.to_record() for _, entry in matches[:n_results]]
+        hit = len(records) >= n_results
+        self.rush.record_lookup(session_id, hit)
+        if not hit:
+            seen = {record["id"] for record in records}
+            for results in self.hub.query([text], where={"session_id": session_id}, n_results=n_results):
+                for record in results:
+                    if record["id"] not in seen and len(records) < n_results:
+                        records.append(dict(record, tier="crash"))
+        return records
+
+    def session_stats(self, session_id: str) -> Dict[str, Any]:
+        """Rush entry count, hits, misses and hit ratio of one session."""
+        return self.rush.session_stats(session_id)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return self.rush.stats()
+
+    def end_session(self, session_id: str) -> None:
+        """Forget a finished session's rush memory, promoting what would have been kept on expiry."""
+        self._schedule([e for e in self.rush.drop_session(session_id) if self._keep_on_exit(e)])
+
+    def close(self) -> None:
+        """Promote every rush entry that would be kept on expiry and stop the promoter thread.
+
+        Call before closing the hub, so the promoted entries are flushed with it.
+        """
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._promoter.join()
+        self._schedule([e for e in self.rush.drain() if self._keep_on_exit(e)])
+        self._promote_pending()
+        if self._pending:
+            logger.error("Lost %d rush memories that could not be promoted before close", len(self._pending))
+
+    def _keep_on_exit(self, entry: RushEntry) -> bool:
+        return not entry.promoted and entry.importance >= self.expiry_threshold
+
+    def _schedule(self, entries: List[RushEntry]) -> None:
+        if not entries:
+            return
+        with self._pending_lock:
+            self._pending.extend(entries)
+        self._wakeup.set()
+
+    def _promote_loop(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.sweep_interval)
+            self._wakeup.clear()
+            self._schedule([e for e in self.rush.expire() if self._keep_on_exit(e)])
+            self._promote_pending()
+
+    def _promote_pending(self) -> None:
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        # Deduplicated: an entry can be scheduled twice, e.g. when important and then evicted
+        entries = list({entry.id: entry for entry in pending if not entry.promoted}.values())
+        if not entries:
+            return
+        records = [
+            {
+                "id": entry.id,
+                "agent": entry.agent,
+                "release_id": entry.release_id,
+                "payload": entry.payload,
+                "metadata": _crash_metadata(entry),
+            }
+            for entry in entries
+        ]
+        try:
+            # Durable, so an entry is only marked promoted once it is really in crash memory
+            self.hub.save_many(records, durable=True)
+        except Exception:
+            # Retried on the next sweep; re-adding any that did get written is a no-op in Chroma
+            logger.exception("Failed to promote %d rush memories; will retry", len(records))
+            with self._pending_lock:
+                self._pending.extend(entries)
+            return
+        for entry in entries:
+            entry.promoted = True
+        self.promoted += len(entries)
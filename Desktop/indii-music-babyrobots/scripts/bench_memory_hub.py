@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark MemoryHub.save throughput: one `add` per save (the old behaviour) against the
+write-behind buffer in async and sync durability modes, and save_many.
+
+Uses a cheap local embedding function so the numbers measure Chroma writes, not model
+inference or network calls.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import chromadb
+from chromadb.api.types import EmbeddingFunction
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from memory_hub import MemoryHub  # noqa: E402
+
+
+class FakeEmbedding(EmbeddingFunction):
+    """Deterministic 32-dimensional embedding derived from character codes."""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float((sum(map(ord, text)) * (i + 1)) % 97) for i in range(32)] for text in input]
+
+    @staticmethod
+    def name():
+        return "bench-fake"
+
+    def get_config(self):
+        return {}
+
+    @staticmethod
+    def build_from_config(config):
+        return FakeEmbedding()
+
+
+def payload(i: int) -> dict:
+    return {"text": f"message number {i}", "reply": f"reply to message {i}"}
+
+
+def bench_unbatched(n: int, threads: int) -> float:
+    # One collection.add per save, as MemoryHub.save did before write-behind batching, from the
+    # same number of concurrent callers as the hub runs
+    with tempfile.TemporaryDirectory() as tmp:
+        coll = chromadb.PersistentClient(path=tmp).get_or_create_collection(
+            "indii", embedding_function=FakeEmbedding()
+        )
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(
+                lambda i: coll.add(
+                    ids=[str(i)], documents=[str(payload(i))], metadatas=[{"agent": "user", "release_id": "demo"}]
+                ),
+                range(n),
+            ))
+        elapsed = time.perf_counter() - start
+        assert coll.count() == n
+        return elapsed
+
+
+def bench_hub(n: int, durability: str, threads: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        hub = MemoryHub(tmp, durability=durability, embedding_function=FakeEmbedding())
+        start = time.perf_counter()
+        # Sync saves only batch when several callers are waiting at once, so spread them over threads
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda i: hub.save("user", "demo", payload(i)), range(n)))
+        hub.close()
+        elapsed = time.perf_counter() - start
+        assert hub.count() == n
+        return elapsed
+
+
+def bench_save_many(n: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        hub = MemoryHub(tmp, durability="sync", embedding_function=FakeEmbedding())
+        records = [{"agent": "user", "release_id": "demo", "payload": payload(i)} for i in range(n)]
+        start = time.perf_counter()
+        hub.save_many(records)
+        elapsed = time.perf_counter() - start
+        hub.close()
+        assert hub.count() == n
+        return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=2000, help="saves per run")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent callers")
+    args = parser.parse_args()
+
+    runs = [
+        ("unbatched add", bench_unbatched(args.n, args.threads)),
+        ("write-behind, async ack", bench_hub(args.n, "async", args.threads)),
+        ("write-behind, sync ack", bench_hub(args.n, "sync", args.threads)),
+        ("save_many, sync ack", bench_save_many(args.n)),
+    ]
+    baseline = runs[0][1]
+    for label, elapsed in runs:
+        print(f"{label:<26} {args.n / elapsed:>9.0f} saves/s  ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark MemoryHub query latency by sharding strategy as the number of releases grows.
+
+Loads `records` memories spread over `releases` releases with the local embedding, then
+times release-scoped queries (where={"release_id": ...}) and unscoped ones. Each query set
+runs twice: "cold" includes Chroma loading each shard's index on first touch, "warm" does not.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from memory_hub import MemoryHub  # noqa: E402
+
+WORDS = "tour plan mastering album artwork cover release press radio playlist vinyl merch video single".split()
+
+
+def load(hub: MemoryHub, releases: int, records: int, rng: random.Random) -> None:
+    hub.save_many(
+        {
+            "agent": f"agent-{i % 8}",
+            "release_id": f"release-{i % releases}",
+            "payload": {"text": " ".join(rng.choices(WORDS, k=12)), "n": i},
+        }
+        for i in range(records)
+    )
+    hub.flush()
+
+
+def time_queries(hub: MemoryHub, releases: int, queries: int, scoped: bool, rng: random.Random) -> tuple:
+    workload = [
+        (" ".join(rng.choices(WORDS, k=3)), {"release_id": f"release-{rng.randrange(releases)}"} if scoped else None)
+        for _ in range(queries)
+    ]
+    medians = []
+    for _ in ("cold", "warm"):
+        samples = []
+        for text, where in workload:
+            start = time.perf_counter()
+            for results in hub.query([text], where=where, n_results=5):
+                list(results)
+            samples.append(time.perf_counter() - start)
+        medians.append(statistics.median(samples) * 1000)
+    return tuple(medians)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--releases", type=int, default=200)
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{args.records} records over {args.releases} releases; median query latency (cold / warm)")
+    for sharding in ("none", "release", "hash"):
+        with tempfile.TemporaryDirectory() as tmp:
+            hub = MemoryHub(tmp, embedding="local", embedding_cache=False, sharding=sharding, batch_size=1000)
+            start = time.perf_counter()
+            load(hub, args.releases, args.records, random.Random(0))
+            load_seconds = time.perf_counter() - start
+            scoped = time_queries(hub, args.releases, args.queries, True, random.Random(1))
+            unscoped = time_queries(hub, args.releases, args.queries, False, random.Random(1))
+            hub.close()
+        print(
+            f"{sharding:<8} load {load_seconds:6.1f}s"
+            f"  release-scoped {scoped[0]:7.2f} / {scoped[1]:6.2f} ms"
+            f"  unscoped {unscoped[0]:7.2f} / {unscoped[1]:6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from embeddings import CachedEmbeddingFunction, HashedNgramEmbedding, make_embedding_function  # noqa: E402
+
+
+class CountingEmbedding(HashedNgramEmbedding):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def __call__(self, input):
+        self.calls.append(list(input))
+        return super().__call__(input)
+
+
+def test_hashed_ngram_embedding_is_deterministic_and_normalized():
+    embed = HashedNgramEmbedding(dim=64)
+    first = embed(["Tour plan NYC", "mastering the album", ""])
+    again = embed(["tour plan nyc"])  # Lowercased by default
+    assert first[0].shape == (64,) and first[0].dtype == np.float32
+    assert np.allclose(first[0], again[0])
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+    assert not first[2].any()  # Empty text has no n-grams
+
+
+def test_batched_embedding_matches_one_text_at_a_time():
+    embed = HashedNgramEmbedding()
+    texts = ["abcdef", "ghijkl", "ab", "tour plan"]
+    batched = embed(texts)
+    for text, vector in zip(texts, batched):
+        assert np.allclose(embed([text])[0], vector)
+
+
+def test_similar_texts_are_closer():
+    embed = HashedNgramEmbedding()
+    tour, tour_la, album = embed(["tour plan NYC", "tour plan LA", "mastering the album"])
+    assert np.dot(tour, tour_la) > np.dot(tour, album)
+
+
+def test_cache_embeds_each_distinct_text_once(tmp_path):
+    inner = CountingEmbedding(dim=32)
+    cached = CachedEmbeddingFunction(inner, str(tmp_path / "cache.sqlite3"), batch_size=2)
+    vectors = cached(["a b c", "d e f", "a b c", "g h i"])
+    assert inner.calls == [["a b c", "d e f"], ["g h i"]]  # Deduplicated, in batches of 2
+    assert np.array_equal(vectors[0], vectors[2])
+
+    # A new instance over the same file reads the vectors back from disk
+    reopened_inner = CountingEmbedding(dim=32)
+    reopened = CachedEmbeddingFunction(reopened_inner, str(tmp_path / "cache.sqlite3"))
+    assert all(np.array_equal(a, b) for a, b in zip(reopened(["a b c", "g h i"]), [vectors[0], vectors[3]]))
+    assert reopened_inner.calls == [] and reopened.hits == 2
+
+
+def test_cache_keys_cover_the_embedding_config(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    CachedEmbeddingFunction(HashedNgramEmbedding(dim=32), path)(["text"])
+    assert CachedEmbeddingFunction(HashedNgramEmbedding(dim=16), path)(["text"])[0].shape == (16,)
+
+
+def test_cache_reports_the_wrapped_function_to_chroma(tmp_path):
+    inner = HashedNgramEmbedding(dim=32)
+    cached = CachedEmbeddingFunction(inner, str(tmp_path / "cache.sqlite3"))
+    assert cached.name() == inner.name() == "hashed-ngram"
+    assert cached.get_config() == inner.get_config()
+
+
+def test_make_embedding_function(tmp_path):
+    assert isinstance(make_embedding_function("local"), HashedNgramEmbedding)
+    assert isinstance(make_embedding_function("local", str(tmp_path)), CachedEmbeddingFunction)
+    with pytest.raises(ValueError):
+        make_embedding_function("remote")
@@ -0,0 +1,191 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from memory_hub import MemoryHub  # noqa: E402
+
+
+@pytest.fixture
+def make_hub(tmp_path):
+    hubs = []
+
+    def make(**kwargs):
+        kwargs.setdefault("embedding", "local")
+        kwargs.setdefault("embedding_cache", False)
+        hub = MemoryHub(str(tmp_path / f"db{len(hubs)}"), **kwargs)
+        hubs.append(hub)
+        return hub
+
+    yield make
+    for hub in hubs:
+        hub.close()
+
+
+def _slow_add(coll, delay, started=None):
+    add = coll.add
+
+    def slow(**kwargs):
+        if started is not None:
+            started.set()
+        time.sleep(delay)
+        return add(**kwargs)
+
+    coll.add = slow
+
+
+def test_save_returns_before_write_and_flush_makes_it_visible(make_hub):
+    hub = make_hub(flush_interval=10)
+    doc_id = hub.save("user", "r1", {"message": "hello"})
+    assert hub.coll.count() == 0  # Still buffered
+    hub.flush()
+    assert hub.coll.count() == 1
+    assert [record["id"] for record in hub.get([doc_id])] == [doc_id]
+
+
+def test_flush_waits_for_batch_being_written(make_hub):
+    hub = make_hub(flush_interval=0.01)
+    started = threading.Event()
+    _slow_add(hub.coll, 0.3, started)
+    hub.save("user", "r1", {"message": "hello"})
+    assert started.wait(5)  # The flusher has taken the batch off the buffer
+    hub.flush()
+    assert hub.coll.count() == 1
+    assert len(list(hub.get_by_release("r1"))) == 1
+
+
+def test_sync_ack_waits_for_write(make_hub):
+    hub = make_hub(durability="sync", flush_interval=10)
+    hub.save("user", "r1", {"message": "hello"})
+    assert hub.coll.count() == 1
+    # Per-call override of an async hub
+    async_hub = make_hub(flush_interval=10)
+    async_hub.save("user", "r1", {"message": "hello"}, durable=True)
+    assert async_hub.coll.count() == 1
+
+
+def test_full_batches_are_written_without_waiting(make_hub):
+    hub = make_hub(batch_size=10, flush_interval=10)
+    for i in range(25):
+        hub.save("user", "r1", {"n": i})
+    deadline = time.monotonic() + 5
+    while hub.coll.count() < 20 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert hub.coll.count() == 20  # Two full batches; the last 5 wait for flush_interval
+    hub.flush()
+    assert hub.coll.count() == 25
+
+
+def test_close_flushes_and_rejects_new_saves(make_hub):
+    hub = make_hub(flush_interval=10)
+    hub.save_many([{"agent": "user", "release_id": "r1", "payload": {"n": i}} for i in range(5)])
+    hub.close()
+    hub.close()  # Idempotent
+    assert hub.coll.count() == 5
+    with pytest.raises(RuntimeError):
+        hub.save("user", "r1", {})
+
+
+def test_write_errors_reach_sync_callers_and_are_counted(make_hub):
+    hub = make_hub(flush_interval=0.01)
+
+    def failing_add(**kwargs):
+        raise ValueError("disk full")
+
+    hub.coll.add = failing_add
+    with pytest.raises(ValueError, match="disk full"):
+        hub.save("user", "r1", {}, durable=True)
+    hub.save("user", "r1", {})  # Async saves only log the failure
+    hub.flush()
+    assert hub.failed_records == 2
+
+
+def test_invalid_durability_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        MemoryHub(str(tmp_path), embedding="local", durability="eventually")
+
+
+def _records(n, releases=3):
+    return [
+        {"agent": f"agent{i % 2}", "release_id": f"r{i % releases}", "payload": {"n": i, "text": f"note {i}"}}
+        for i in range(n)
+    ]
+
+
+def test_save_many_returns_ids_in_order(make_hub):
+    hub = make_hub()
+    records = _records(5)
+    records[2]["id"] = "fixed-id"
+    ids = hub.save_many(records, durable=True)
+    assert len(ids) == 5 and ids[2] == "fixed-id"
+    stored = {record["id"]: record["payload"]["n"] for record in hub.get(ids)}
+    assert stored == {doc_id: i for i, doc_id in enumerate(ids)}
+
+
+def test_query_yields_one_ranked_result_set_per_text(make_hub):
+    hub = make_hub()
+    hub.save_many([
+        {"agent": "user", "release_id": "r1", "payload": {"text": "tour dates in Tokyo"}},
+        {"agent": "user", "release_id": "r1", "payload": {"text": "mastering notes for the album"}},
+        {"agent": "label", "release_id": "r2", "payload": {"text": "tour poster artwork"}},
+    ])
+    tour, mastering = [list(results) for results in hub.query(["tour dates", "mastering"], n_results=2)]
+    assert tour[0]["payload"]["text"] == "tour dates in Tokyo"
+    assert mastering[0]["payload"]["text"] == "mastering notes for the album"
+    assert all(a["distance"] <= b["distance"] for a, b in zip(tour, tour[1:]))
+
+    filtered = list(next(hub.query(["tour"], where={"agent": "label"}, n_results=5)))
+    assert [record["release_id"] for record in filtered] == ["r2"]
+    assert list(hub.query([])) == []
+
+
+def test_get_by_release_pages_through_filtered_records(make_hub):
+    hub = make_hub()
+    hub.save_many(_records(30))
+    records = list(hub.get_by_release("r1", page_size=4))
+    assert len(records) == 10
+    assert {record["release_id"] for record in records} == {"r1"}
+    assert len({record["id"] for record in records}) == 10
+    by_agent = list(hub.get_by_release("r1", agent="agent0"))
+    assert by_agent and {record["agent"] for record in by_agent} == {"agent0"}
+
+
+@pytest.mark.parametrize("sharding", ["release", "agent", "hash"])
+def test_sharded_hub_matches_unsharded_results(make_hub, sharding):
+    records = _records(60, releases=12)
+    for i, record in enumerate(records):
+        record["id"] = f"id{i}"
+    plain, sharded = make_hub(), make_hub(sharding=sharding, num_shards=4)
+    plain.save_many(records)
+    sharded.save_many(records)
+
+    assert sharded.count() == 60
+    assert len(sharded.client.list_collections()) <= 4
+    assert sorted(r["id"] for r in sharded.get(["id3", "id40", "missing"])) == ["id3", "id40"]
+    assert sorted(r["id"] for r in sharded.get_by_release("r5")) == sorted(r["id"] for r in plain.get_by_release("r5"))
+    for where in (None, {"release_id": "r5"}, {"$and": [{"release_id": {"$in": ["r1", "r2"]}}, {"agent": "agent1"}]}):
+        expected = [(r["id"], round(r["distance"], 4)) for r in next(plain.query(["note 1"], where=where, n_results=5))]
+        got = [(r["id"], round(r["distance"], 4)) for r in next(sharded.query(["note 1"], where=where, n_results=5))]
+        assert sorted(got, key=lambda hit: hit[1]) == sorted(expected, key=lambda hit: hit[1])
+
+
+def test_release_sharding_routes_scoped_reads_to_one_shard(make_hub):
+    hub = make_hub(sharding="release", num_shards=8)
+    hub.save_many(_records(200, releases=100), durable=True)
+    assert len(hub.client.list_collections()) <= 8  # Bounded, however many releases exist
+    assert len(hub._shards_for({"release_id": "r7"})) == 1
+    assert len(hub._shards_for({"$and": [{"release_id": "r7"}, {"agent": "agent0"}]})) == 1
+    assert len(hub._shards_for({"release_id": {"$in": ["r1", "r2", "r3"]}})) <= 3
+    assert len(hub._shards_for({"agent": "agent0"})) <= 8
+    # Records of other releases in the same shard are filtered out inside Chroma
+    assert {r["release_id"] for r in hub.get_by_release("r7")} == {"r7"}
+    assert {r["release_id"] for r in next(hub.query(["note"], where={"release_id": "r7"}, n_results=10))} == {"r7"}
+
+
+def test_invalid_sharding_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        MemoryHub(str(tmp_path), embedding="local", sharding="by-moon-phase")
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from memory_hub import MemoryHub  # noqa: E402
+from rush_memory import TieredMemory  # noqa: E402
+
+
+@pytest.fixture
+def hub(tmp_path):
+    hub = MemoryHub(str(tmp_path), embedding="local", embedding_cache=False, flush_interval=0.01)
+    yield hub
+    hub.close()
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_reads_hit_rush_first_and_report_per_session_ratio(hub):
+    tiers = TieredMemory(hub, sweep_interval=0.05)
+    memory_id = tiers.remember("s1", "user", "r1", {"text": "tour plan"})
+    assert tiers.get("s1", memory_id)["tier"] == "rush"
+    assert tiers.get("s1", "unknown") is None
+    assert tiers.session_stats("s1") == {"entries": 1, "hits": 1, "misses": 1, "hit_ratio": 0.5}
+    assert tiers.session_stats("s2")["hit_ratio"] == 0.0
+    tiers.close()
+
+
+def test_important_entries_are_promoted_and_readable_from_crash(hub):
+    tiers = TieredMemory(hub, sweep_interval=0.05)
+    memory_id = tiers.remember("s1", "user", "r1", {"text": "tour locations: NYC, LA"}, importance=0.9)
+    assert _wait_for(lambda: tiers.promoted == 1)
+    tiers.rush.drop_session("s1")
+    record = tiers.get("s1", memory_id)
+    assert record["tier"] == "crash" and record["metadata"]["session_id"] == "s1"
+    recalled = tiers.recall("s1", "tour", n_results=3)
+    assert [record["id"] for record in recalled] == [memory_id]
+    tiers.close()
+
+
+def test_expired_entries_are_promoted_and_their_counts_dropped(hub):
+    tiers = TieredMemory(hub, ttl=0.1, sweep_interval=0.05, expiry_threshold=0.5)
+    kept = tiers.remember("s1", "user", "r1", {"text": "decision"}, importance=0.6)
+    tiers.remember("s1", "user", "r1", {"text": "small talk"}, importance=0.1)
+    tiers.get("s1", kept)
+    assert _wait_for(lambda: "s1" not in tiers.stats())
+    assert _wait_for(lambda: hub.count() == 1)
+    assert [record["payload"]["text"] for record in hub.get([kept])] == ["decision"]
+    tiers.close()
+
+
+def test_lru_eviction_promotes_evicted_entries(hub):
+    tiers = TieredMemory(hub, max_entries_per_session=2, sweep_interval=0.05)
+    first = tiers.remember("s1", "user", "r1", {"n": 1})
+    tiers.remember("s1", "user", "r1", {"n": 2})
+    tiers.remember("s1", "user", "r1", {"n": 3})
+    assert tiers.rush.get("s1", first) is None
+    assert _wait_for(lambda: hub.count() == 1)
+    assert tiers.get("s1", first)["tier"] == "crash"
+    tiers.close()
+
+
+def test_failed_promotions_are_retried(hub):
+    add = hub.coll.add
+    failures = []
+
+    def flaky_add(**kwargs):
+        if len(failures) < 2:
+            failures.append(1)
+            raise RuntimeError("chroma unavailable")
+        return add(**kwargs)
+
+    hub.coll.add = flaky_add
+    tiers = TieredMemory(hub, sweep_interval=0.05)
+    memory_id = tiers.remember("s1", "user", "r1", {"text": "keep me"}, importance=1.0)
+    assert _wait_for(lambda: tiers.promoted == 1)
+    assert len(failures) == 2
+    assert tiers.rush.get("s1", memory_id).promoted
+    assert [record["id"] for record in hub.get([memory_id])] == [memory_id]
+    tiers.close()
+
+
+def test_close_promotes_remaining_entries(hub):
+    tiers = TieredMemory(hub, sweep_interval=60)
+    tiers.remember("s1", "user", "r1", {"n": 1})
+    tiers.remember("s2", "user", "r1", {"n": 2})
+    tiers.close()
+    assert hub.count() == 2
+
@@ -0,0 +1,77 @@
+"""
+Benchmark for processor.extract_plain_text on large article pages.
+
+Compares the original implementation (BeautifulSoup with html.parser and one find_all
+traversal per content tag) with the single-pass lxml extractor on a synthetic page.
+The comparison needs beautifulsoup4, which the app itself no longer uses.
+
+Usage (from the project root):
+    python benchmarks/bench_extract_text.py [--sections 2000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from knowledge_reinforcer.processor import extract_plain_text
+
+WORDS = ("design pattern cache latency throughput index query python service request "
+         "response memory process thread queue storage network parser article").split()
+
+
+def legacy_extract_plain_text(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    content_tags = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']
+    extracted_texts = []
+    for tag in content_tags:
+        for element in soup.find_all(tag):
+            extracted_texts.append(element.get_text())
+    return " ".join(extracted_texts)
+
+
+def make_page(sections, seed=0):
+    rng = random.Random(seed)
+
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+
+    parts = ["<html><head><title>Benchmark</title></head><body><div class='article'>"]
+    for i in range(sections):
+        parts.append(f"<h2>Section {i}</h2>")
+        for _ in range(3):
+            parts.append(f"<p>{sentence()} <a href='#'>{sentence()}</a> <em>{sentence()}</em></p>")
+        parts.append("<ul>" + "".join(f"<li>{sentence()}</li>" for _ in range(4)) + "</ul>")
+        parts.append(f"<div class='aside'><span>{sentence()}</span></div>")
+    parts.append("</div></body></html>")
+    return "".join(parts)
+
+
+def best_of(fn, html, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sections", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    html = make_page(args.sections)
+    legacy = best_of(legacy_extract_plain_text, html, args.repeat)
+    current = best_of(extract_plain_text, html, args.repeat)
+    print(f"page size: {len(html) / 1e6:.1f} MB, {args.sections} sections")
+    print(f"  bs4 html.parser + 8x find_all : {legacy * 1000:9.1f} ms")
+    print(f"  lxml single pass              : {current * 1000:9.1f} ms  ({legacy / current:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark for sequential adds to the kb_utils index.
+
+Times N sequential `add_to_index` calls against the append-only JSONL store, with and without
+fsync per add, followed by a cold `read_index` and an incremental one. For comparison it also
+times the previous implementation (read the whole JSON array, append, rewrite with indent=2),
+which writes O(N^2) bytes, so it runs on a smaller N by default.
+
+Usage (from the project root):
+    python benchmarks/bench_kb_index.py [--adds 100000] [--legacy-adds 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from knowledge_reinforcer import kb_utils
+
+
+def make_item(i):
+    return {
+        "seq_no": i,
+        "filename": f"{i:06d}-benchmark-item.md",
+        "title": f"Benchmark Item {i}",
+        "tags": ["benchmark", "index"],
+        "purpose": "Index benchmark.",
+        "source_type": "direct-text",
+        "source_url": "N/A",
+    }
+
+
+def legacy_add(index_file, item):
+    # The previous add_to_index: full read, append, full rewrite
+    with open(index_file, 'r', encoding='utf-8') as f:
+        content = f.read().strip()
+    all_items = json.loads(content) if content else []
+    all_items.append(item)
+    with open(index_file, 'w', encoding='utf-8') as f:
+        json.dump(all_items, f, indent=2)
+
+
+def bench_legacy(directory, adds):
+    index_file = os.path.join(directory, 'kb_index.json')
+    with open(index_file, 'w', encoding='utf-8') as f:
+        json.dump([], f)
+    start = time.perf_counter()
+    for i in range(adds):
+        legacy_add(index_file, make_item(i))
+    return time.perf_counter() - start
+
+
+def bench_store(directory, adds, fsync):
+    kb_utils.INDEX_LOG_FILE = os.path.join(directory, f'kb_index_{int(fsync)}.jsonl')
+    kb_utils.INDEX_FILE = os.path.join(directory, 'absent.json')
+    kb_utils.INDEX_FSYNC = fsync
+    start = time.perf_counter()
+    for i in range(adds):
+        kb_utils.add_to_index(make_item(i))
+    add_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assert len(kb_utils.read_index()) == adds
+    cold_read = time.perf_counter() - start
+    kb_utils.add_to_index(make_item(adds))
+    start = time.perf_counter()
+    assert len(kb_utils.read_index()) == adds + 1
+    incremental_read = time.perf_counter() - start
+    return add_time, cold_read, incremental_read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--adds", type=int, default=100000)
+    parser.add_argument("--legacy-adds", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = bench_legacy(directory, args.legacy_adds)
+        print(f"legacy JSON rewrite : {args.legacy_adds:>7} adds in {legacy:8.2f}s "
+              f"({args.legacy_adds / legacy:10.0f} adds/s)")
+        for fsync in (False, True):
+            add_time, cold_read, incremental_read = bench_store(directory, args.adds, fsync)
+            label = "JSONL, fsync" if fsync else "JSONL, no fsync"
+            print(f"{label:<20}: {args.adds:>7} adds in {add_time:8.2f}s ({args.adds / add_time:10.0f} adds/s); "
+                  f"cold read {cold_read * 1000:.0f} ms, incremental read {incremental_read * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
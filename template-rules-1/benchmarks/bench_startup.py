@@ -0,0 +1,47 @@
+"""
+Startup benchmark for the Knowledge Reinforcer entry points.
+
+Times, in fresh interpreters, `python -m knowledge_reinforcer.main --help` and
+importing the Flask app module (`knowledge_reinforcer.web_app`). Run it on two
+checkouts to compare before/after.
+
+Usage (from the project root):
+    python benchmarks/bench_startup.py [--repeat 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+COMMANDS = {
+    "main --help": [sys.executable, "-m", "knowledge_reinforcer.main", "--help"],
+    "import web_app": [sys.executable, "-c", "import knowledge_reinforcer.web_app"],
+    "bare interpreter": [sys.executable, "-c", "pass"],
+}
+
+
+def time_command(command, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings), sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"best / median of {args.repeat} runs")
+    for label, command in COMMANDS.items():
+        best, median = time_command(command, args.repeat)
+        print(f"  {label:<18}: {best * 1000:8.1f} ms / {median * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
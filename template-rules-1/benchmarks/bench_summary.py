@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for processor._generate_summary.
+
+Compares the original implementation (whole-text tokenization, per-sentence
+re-tokenization and dict-based scoring) with the vectorized single-pass one on a
+synthetic document of 10k sentences.
+
+Usage (from the project root):
+    python benchmarks/bench_summary.py [--sentences 10000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize, sent_tokenize
+
+from knowledge_reinforcer.processor import _generate_summary
+
+
+def legacy_generate_summary(text, num_sentences=1):
+    if not text:
+        return ""
+    sentences = sent_tokenize(text)
+    if len(sentences) <= num_sentences:
+        return " ".join(sentences)
+    words = word_tokenize(text.lower())
+    stop_words = set(stopwords.words('english'))
+    filtered_words = [word for word in words if word.isalnum() and word not in stop_words]
+    word_freq = defaultdict(int)
+    for word in filtered_words:
+        word_freq[word] += 1
+    sentence_scores = defaultdict(int)
+    for i, sentence in enumerate(sentences):
+        for word in word_tokenize(sentence.lower()):
+            if word in word_freq:
+                sentence_scores[i] += word_freq[word]
+    ranked_sentences = sorted(sentence_scores.items(), key=lambda x: x[1], reverse=True)
+    summary_sentences_indices = sorted([idx for idx, _ in ranked_sentences[:num_sentences]])
+    return " ".join([sentences[idx] for idx in summary_sentences_indices])
+
+
+def make_document(num_sentences, seed=42):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(2000)] + ["the", "and", "of", "to", "is", "in", "for", "with"]
+    sentences = []
+    for _ in range(num_sentences):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(8, 24))]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def best_of(fn, text, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(text, num_sentences=3)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sentences", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = make_document(args.sentences)
+    legacy_time, legacy_summary = best_of(legacy_generate_summary, text, args.repeat)
+    new_time, new_summary = best_of(_generate_summary, text, args.repeat)
+
+    print(f"{args.sentences} sentences, best of {args.repeat}")
+    print(f"  legacy     : {legacy_time * 1000:9.1f} ms")
+    print(f"  vectorized : {new_time * 1000:9.1f} ms")
+    print(f"  speedup    : {legacy_time / new_time:9.2f}x")
+    print(f"  same top-N : {legacy_summary == new_summary}")
+
+
+if __name__ == "__main__":
+    main()
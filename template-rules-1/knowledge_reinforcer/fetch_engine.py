@@ -0,0 +1,256 @@
+import asyncio
+import codecs
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from .http_cache import HttpCache, DEFAULT_CACHE_DIR
+
+# Result of a single HTTP fetch. `status` is one of 'ok', 'too_large', 'wrong_type' or 'error';
+# `error` holds a human-readable reason whenever `status` is not 'ok'.
+# `from_cache` is True when the body was served from the HTTP cache after a 304 revalidation.
+FetchResult = namedtuple('FetchResult', ['url', 'status', 'status_code', 'text', 'error', 'from_cache'])
+
+DEFAULT_MAX_BYTES = int(os.environ.get('KR_FETCH_MAX_BYTES', 10 * 1024 * 1024))
+DEFAULT_ALLOWED_TYPES = frozenset({'text/html', 'application/xhtml+xml', 'text/plain', 'text/xml', 'application/xml'})
+CHUNK_SIZE = 64 * 1024
+# Hosts whose semaphore and token bucket are kept; idle hosts beyond this are forgotten, least recently used first
+MAX_TRACKED_HOSTS = 1024
+# Leading bytes of common binary formats that are sometimes served as text/html
+BINARY_SIGNATURES = (b'%PDF', b'\x89PNG', b'GIF8', b'\xff\xd8\xff', b'PK\x03\x04', b'\x1f\x8b', b'ID3', b'OggS', b'RIFF')
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket used to rate-limit requests to a single host.
+
+    Holds up to `capacity` tokens and refills at `rate` tokens per second. Must only be
+    used from the event loop that owns it.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class FetchEngine:
+    """
+    Asyncio-based HTTP fetcher that keeps connections alive across calls.
+
+    All requests go through one pooled `requests.Session` and are scheduled on a private
+    event loop running in a daemon thread, so the same pools, concurrency caps and rate
+    limits apply whether callers are synchronous (`fetch`) or fetching in bulk
+    (`fetch_many`). Concurrency is capped globally and per host, and each host is
+    rate-limited with its own token bucket; idle hosts beyond `max_tracked_hosts` are
+    forgotten, least recently used first. With an HttpCache attached, repeat fetches are
+    sent as conditional GETs and a 304 is answered from the cached body.
+
+    Bodies are streamed and decoded incrementally. A response whose declared type is not in
+    `allowed_types`, or whose first chunk looks binary, comes back as 'wrong_type'; one that
+    declares or streams more than `max_bytes` is aborted as 'too_large'.
+    """
+
+    def __init__(self, max_concurrency=32, per_host_concurrency=4, rate_per_host=5.0, burst=5, timeout=10, cache=None,
+                 max_bytes=DEFAULT_MAX_BYTES, allowed_types=DEFAULT_ALLOWED_TYPES, max_tracked_hosts=MAX_TRACKED_HOSTS):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.timeout = timeout
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.allowed_types = allowed_types
+        self.max_tracked_hosts = max_tracked_hosts
+
+        # requests is imported here rather than at module level so importing the web app stays cheap
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='fetch-engine')
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='fetch-engine-loop', daemon=True)
+        self._thread.start()
+        self._global_limit = None
+        # host -> [semaphore, token bucket, requests in flight], least recently used first
+        self._hosts = OrderedDict()
+
+    def _host_state(self, host):
+        # Only called on the engine loop, so no locking is needed around self._hosts
+        if self._global_limit is None:
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        state = self._hosts.get(host)
+        if state is None:
+            self._evict_idle_hosts()
+            state = self._hosts[host] = [asyncio.Semaphore(self.per_host_concurrency), TokenBucket(self.rate_per_host, self.burst), 0]
+        self._hosts.move_to_end(host)
+        return state
+
+    def _evict_idle_hosts(self):
+        # Hosts with requests in flight are kept so their concurrency cap still holds; a host
+        # that is forgotten and seen again just starts with a full token bucket
+        excess = len(self._hosts) + 1 - self.max_tracked_hosts
+        idle = []
+        for host, state in self._hosts.items():
+            if len(idle) >= excess:
+                break
+            if state[2] == 0:
+                idle.append(host)
+        for host in idle:
+            del self._hosts[host]
+
+    def _sniff_binary(self, chunk):
+        head = chunk[:512]
+        return b'\x00' in head or any(head.startswith(magic) for magic in BINARY_SIGNATURES)
+
+    def _read_body(self, url, response):
+        content_type = response.headers.get('Content-Type', '')
+        mime_type = content_type.split(';', 1)[0].strip().lower()
+        if mime_type and mime_type not in self.allowed_types:
+            response.close()
+            return FetchResult(url, 'wrong_type', response.status_code, None, f"Unsupported content type: {mime_type}", False)
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response.close()
+            return FetchResult(url, 'too_large', response.status_code, None, f"Body of {content_length} bytes exceeds {self.max_bytes} bytes", False)
+
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        parts = []
+        received = 0
+        try:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if not chunk:
+                    continue
+                if received == 0 and self._sniff_binary(chunk):
+                    return FetchResult(url, 'wrong_type', response.status_code, None, "Body looks like binary data", False)
+                received += len(chunk)
+                if received > self.max_bytes:
+                    return FetchResult(url, 'too_large', response.status_code, None, f"Body exceeds {self.max_bytes} bytes", False)
+                parts.append(decoder.decode(chunk))
+            parts.append(decoder.decode(b'', final=True))
+        finally:
+            response.close()
+        return FetchResult(url, 'ok', response.status_code, ''.join(parts), None, False)
+
+    def _get(self, url, timeout):
+        import requests
+        headers = self.cache.validators(url) if self.cache is not None else {}
+        try:
+            response = self.session.get(url, timeout=timeout, headers=headers, stream=True)
+            if response.status_code == 304 and self.cache is not None:
+                response.close()
+                body = self.cache.get(url)
+                if body is not None:
+                    return FetchResult(url, 'ok', 304, body, None, True)
+                # The cached body disappeared under us; fall back to a full download
+                response = self.session.get(url, timeout=timeout, stream=True)
+            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+            result = self._read_body(url, response)
+            if result.status == 'ok' and self.cache is not None:
+                try:
+                    self.cache.store(url, result.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                except (OSError, sqlite3.Error) as e:
+                    # The body was fetched fine; failing to cache it only costs a full download next time
+                    print(f"Warning: could not cache response for {url}: {e}")
+            return result
+        except requests.exceptions.RequestException as e:
+            status_code = e.response.status_code if getattr(e, 'response', None) is not None else None
+            return FetchResult(url, 'error', status_code, None, str(e), False)
+
+    async def fetch_async(self, url, timeout=None):
+        """
+        Fetch one URL on the engine loop, honouring the global and per-host limits.
+
+        Returns:
+            FetchResult: The outcome of the request; never raises for HTTP or network errors.
+        """
+        host = urlparse(url).hostname or ''
+        state = self._host_state(host)
+        host_limit, bucket = state[0], state[1]
+        state[2] += 1
+        try:
+            async with self._global_limit, host_limit:
+                await bucket.acquire()
+                return await self._loop.run_in_executor(self._executor, self._get, url, timeout or self.timeout)
+        finally:
+            state[2] -= 1
+
+    def fetch(self, url, timeout=None):
+        """
+        Synchronously fetch one URL through the engine.
+
+        Returns:
+            FetchResult: The outcome of the request.
+        """
+        return asyncio.run_coroutine_threadsafe(self.fetch_async(url, timeout), self._loop).result()
+
+    def fetch_many(self, urls, timeout=None):
+        """
+        Fetch many URLs concurrently, yielding each FetchResult as soon as it completes.
+
+        Results arrive in completion order, not input order; use `FetchResult.url` to match them up.
+        """
+        results = queue.Queue()
+        count = 0
+        for url in urls:
+            future = asyncio.run_coroutine_threadsafe(self.fetch_async(url, timeout), self._loop)
+            future.add_done_callback(results.put)
+            count += 1
+        for _ in range(count):
+            yield results.get().result()
+
+    def close(self):
+        """Stop the engine loop and release pooled connections."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_default_engine():
+    """
+    Return the process-wide FetchEngine, creating it on first use.
+
+    The engine caches responses under DEFAULT_CACHE_DIR; set KR_HTTP_CACHE_DIR to an empty
+    string to disable the HTTP cache.
+    """
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = FetchEngine(cache=HttpCache(DEFAULT_CACHE_DIR) if DEFAULT_CACHE_DIR else None)
+        return _default_engine
+
+
+def fetch_many(urls, timeout=None):
+    """Fetch `urls` concurrently on the default engine, yielding results as they complete."""
+    return get_default_engine().fetch_many(urls, timeout)
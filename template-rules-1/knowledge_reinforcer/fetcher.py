@@ -1,7 +1,15 @@
-import requests
-from readability import Document
-from youtube_transcript_api import YouTubeTranscriptApi
+import sqlite3
+import threading
+from collections import namedtuple
 from urllib.parse import urlparse, parse_qs
+from .fetch_engine import get_default_engine
+
+# Outcome of fetching a source: `status` is 'ok' or the reason nothing usable came back
+SourceResult = namedtuple('SourceResult', ['status', 'content', 'title', 'error'])
+
+_YOUTUBE_TITLE_CACHE_SIZE = 1024
+_youtube_titles = {}
+_youtube_titles_lock = threading.Lock()
 
 def _get_youtube_video_id(url):
     parsed_url = urlparse(url)
@@ -13,34 +21,73 @@ def _get_youtube_video_id(url):
         return parsed_url.path[1:]
     return None
 
-def fetch_content(url, content_type):
-    if content_type == "web-article":
+def _get_youtube_title(video_id):
+    # YouTubeTranscriptApi doesn't directly provide video title, so we'll try to fetch it
+    # This is a best-effort attempt and might not always work reliably without YouTube Data API
+    # Successful lookups are cached so re-fetching a video never scrapes its page twice
+    with _youtube_titles_lock:
+        if video_id in _youtube_titles:
+            return _youtube_titles[video_id]
+    result = get_default_engine().fetch(f"https://www.youtube.com/watch?v={video_id}", timeout=5)
+    if result.status != 'ok':
+        return None
+    from readability import Document
+    title = Document(result.text).title()
+    with _youtube_titles_lock:
+        if len(_youtube_titles) >= _YOUTUBE_TITLE_CACHE_SIZE:
+            _youtube_titles.pop(next(iter(_youtube_titles)))
+        _youtube_titles[video_id] = title
+    return title
+
+def _parse_article(engine, url, result):
+    # A revalidated cache hit reuses the readability parse stored with the cached body
+    if result.from_cache:
+        parsed = engine.cache.get_derived(url)
+        if parsed:
+            return parsed['content'], parsed['title']
+    from readability import Document
+    doc = Document(result.text)
+    content, title = doc.content(), doc.title()
+    if engine.cache is not None:
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-            doc = Document(response.text)
-            return doc.content(), doc.title()
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching web article from {url}: {e}")
-            return None, None
+            engine.cache.set_derived(url, {'content': content, 'title': title})
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: could not cache parsed article for {url}: {e}")
+    return content, title
+
+def fetch_source(url, content_type):
+    """
+    Fetch and extract content from a URL, reporting the outcome as a structured result.
+
+    Returns:
+        SourceResult: `status` is 'ok' with `content` and `title` set, or one of 'too_large',
+        'wrong_type', 'invalid_url', 'unsupported' or 'error' with `error` describing why.
+    """
+    if content_type == "web-article":
+        engine = get_default_engine()
+        result = engine.fetch(url)
+        if result.status != 'ok':
+            return SourceResult(result.status, None, None, result.error)
+        content, title = _parse_article(engine, url, result)
+        return SourceResult('ok', content, title, None)
     elif content_type == "youtube-video":
         video_id = _get_youtube_video_id(url)
         if not video_id:
-            print(f"Invalid YouTube URL: {url}")
-            return None, None
+            return SourceResult('invalid_url', None, None, f"Invalid YouTube URL: {url}")
         try:
+            from youtube_transcript_api import YouTubeTranscriptApi
             transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
             transcript_text = " ".join([entry['text'] for entry in transcript_list])
-            # YouTubeTranscriptApi doesn't directly provide video title, so we'll try to fetch it
-            # This is a best-effort attempt and might not always work reliably without YouTube Data API
-            try:
-                video_response = requests.get(f"https://www.youtube.com/watch?v={video_id}", timeout=5)
-                video_response.raise_for_status()
-                doc = Document(video_response.text)
-                return transcript_text, doc.title()
-            except requests.exceptions.RequestException:
-                return transcript_text, f"YouTube Video Transcript ({video_id})"
+            title = _get_youtube_title(video_id) or f"YouTube Video Transcript ({video_id})"
+            return SourceResult('ok', transcript_text, title, None)
         except Exception as e:
-            print(f"Error fetching YouTube transcript for {url}: {e}")
-            return None, None
-    return None, None
+            return SourceResult('error', None, None, f"Error fetching YouTube transcript: {e}")
+    return SourceResult('unsupported', None, None, f"Unsupported content type: {content_type}")
+
+def fetch_content(url, content_type):
+    result = fetch_source(url, content_type)
+    if result.status != 'ok':
+        if result.error:
+            print(f"Error fetching {content_type} from {url}: {result.error}")
+        return None, None
+    return result.content, result.title
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'KR_HTTP_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'http')
+)
+DEFAULT_MAX_BYTES = int(os.environ.get('KR_HTTP_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+class HttpCache:
+    """
+    On-disk HTTP response cache keyed by URL, used for conditional re-fetches.
+
+    Each entry stores the response body together with its ETag/Last-Modified validators,
+    plus an optional "derived" payload (e.g. the readability parse of the body) so that a
+    revalidated hit skips both the download and the parse. Entry metadata lives in a small
+    SQLite table; bodies live in one file per entry. When the total size exceeds
+    `max_bytes`, least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite3'), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, url TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.body")
+
+    def _derived_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.derived.json")
+
+    def _write_atomically(self, path, write):
+        # A unique temp file per writer, so concurrent stores of the same URL cannot clobber each other
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def validators(self, url):
+        """
+        Return the conditional request headers for a cached URL.
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since headers, or an empty dict if `url` is not cached.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM entries WHERE key = ?", (self._key(url),)
+            ).fetchone()
+        if row is None:
+            return {}
+        headers = {}
+        if row[0]:
+            headers['If-None-Match'] = row[0]
+        if row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def get(self, url):
+        """
+        Return the cached body for `url` and mark it as recently used.
+
+        Returns:
+            str or None: The cached body, or None if the entry is missing.
+        """
+        key = self._key(url)
+        try:
+            with open(self._body_path(key), 'r', encoding='utf-8') as f:
+                body = f.read()
+        except OSError:
+            self.delete(url)
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return body
+
+    def store(self, url, body, etag=None, last_modified=None):
+        """
+        Cache `body` for `url` with its validators, replacing any previous entry and derived payload.
+
+        Responses without an ETag or Last-Modified header cannot be revalidated and are not stored.
+        """
+        if not etag and not last_modified:
+            return
+        key = self._key(url)
+        body_path = self._body_path(key)
+        self._write_atomically(body_path, lambda f: f.write(body))
+        try:
+            os.remove(self._derived_path(key))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, url, etag, last_modified, size, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, os.path.getsize(body_path), time.time()),
+            )
+            self._conn.commit()
+        self._evict()
+
+    def get_derived(self, url):
+        """Return the derived payload cached for `url`, or None."""
+        try:
+            with open(self._derived_path(self._key(url)), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set_derived(self, url, payload):
+        """Attach a JSON-serializable derived payload to an existing cache entry."""
+        key = self._key(url)
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+        if not exists:
+            return
+        derived_path = self._derived_path(key)
+        self._write_atomically(derived_path, lambda f: json.dump(payload, f))
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entries SET size = ? WHERE key = ?",
+                (os.path.getsize(self._body_path(key)) + os.path.getsize(derived_path), key),
+            )
+            self._conn.commit()
+        self._evict()
+
+    def delete(self, url):
+        """Remove the cache entry for `url`, if any."""
+        self._delete_key(self._key(url))
+
+    def _delete_key(self, key):
+        for path in (self._body_path(key), self._derived_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def total_size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self):
+        total = self.total_size()
+        while total > self.max_bytes:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT key, size FROM entries ORDER BY last_access ASC LIMIT 1"
+                ).fetchone()
+            if row is None:
+                return
+            self._delete_key(row[0])
+            total -= row[1]
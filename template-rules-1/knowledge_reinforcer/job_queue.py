@@ -0,0 +1,269 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+# SQLite file holding the queue; lives next to the other local caches (gitignored)
+DEFAULT_DB_PATH = os.environ.get(
+    'KR_JOB_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'jobs.sqlite3')
+)
+DEFAULT_WORKERS = int(os.environ.get('KR_JOB_WORKERS', 2))
+# A claimed job whose lease runs out (its worker hung or died) is handed to another worker; see requeue_orphaned
+# for jobs whose process is known to be gone
+DEFAULT_LEASE_SECONDS = float(os.environ.get('KR_JOB_LEASE_SECONDS', 300))
+# Claims per job before it is given up on, so a job that keeps killing its worker cannot loop forever
+MAX_ATTEMPTS = 3
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+def _owner_id():
+    # Identifies the process holding a claim; computed per call so a forked child gets its own
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid):
+    if os.name == 'nt':
+        return True  # os.kill would terminate the process on Windows; such jobs wait out their lease
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, but belongs to another user
+    return True
+
+
+class JobQueue:
+    """
+    Durable job queue in a SQLite table.
+
+    A job is claimed by setting it to 'running' under a lease and a random claim token in a
+    single write transaction, so two workers can never claim the same job. Only the holder of
+    the current token can complete or fail it. Jobs left 'running' by a crashed or restarted
+    process become claimable again once their lease expires, so no job is lost; handlers
+    should be idempotent because such a job runs again. Each claim records the claiming
+    process, and opening the queue requeues at once the running jobs of processes on this
+    host that no longer exist, so a restart does not wait out their leases.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, result TEXT, error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0, claim_token TEXT, lease_expires_at REAL,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        if 'owner' not in {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")  # Queues created before owners were recorded
+        self.requeue_orphaned()
+
+    def requeue_orphaned(self):
+        """
+        Put running jobs whose claiming process on this host has exited back in the queue.
+
+        Returns:
+            int: The number of jobs requeued.
+        """
+        host = socket.gethostname()
+        with self._lock:
+            running = self._conn.execute("SELECT id, owner FROM jobs WHERE status = 'running'").fetchall()
+        orphaned = []
+        for row in running:
+            owner_host, _, pid = (row['owner'] or '').rpartition(':')
+            if owner_host == host and pid.isdigit() and not _process_alive(int(pid)):
+                orphaned.append((row['id'], row['owner']))
+        requeued = 0
+        with self._lock:
+            for job_id, owner in orphaned:
+                # Matching on the owner too leaves alone a job another process has reclaimed meanwhile
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', claim_token = NULL, lease_expires_at = NULL, owner = NULL,"
+                    " updated_at = ? WHERE id = ? AND status = 'running' AND owner = ?",
+                    (time.time(), job_id, owner),
+                )
+                requeued += cursor.rowcount
+        return requeued
+
+    def enqueue(self, payload):
+        """
+        Durably add a job; `payload` must be JSON-serializable.
+
+        Returns:
+            str: The job id.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, payload, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(payload), now, now),
+            )
+        return job_id
+
+    def claim(self):
+        """
+        Claim the oldest runnable job: queued, or running with an expired lease.
+
+        Returns:
+            dict or None: The job (see `get`) plus its 'claim_token', or None if there is nothing to run.
+        """
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_expires_at < ?)"
+                    " ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None and row['attempts'] >= MAX_ATTEMPTS:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, claim_token = NULL, updated_at = ? WHERE id = ?",
+                        (f"Gave up after {row['attempts']} attempts", now, row['id']),
+                    )
+                    row = None
+                elif row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, claim_token = ?, owner = ?,"
+                        " lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                        (token, _owner_id(), now + self.lease_seconds, now, row['id']),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._job_from_row(row)
+        job.update(status='running', attempts=row['attempts'] + 1, claim_token=token)
+        return job
+
+    def renew(self, job_id, claim_token):
+        """Extend the lease of a job that is still being worked on; returns False if the claim was lost."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = 'running' AND claim_token = ?",
+                (now + self.lease_seconds, job_id, claim_token),
+            )
+        return cursor.rowcount == 1
+
+    def _finish(self, job_id, claim_token, status, result=None, error=None):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, claim_token = NULL, lease_expires_at = NULL,"
+                " updated_at = ? WHERE id = ? AND status = 'running' AND claim_token = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, claim_token),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, claim_token, result):
+        """Mark a claimed job done; returns False (and changes nothing) if the claim was lost."""
+        return self._finish(job_id, claim_token, 'done', result=result)
+
+    def fail(self, job_id, claim_token, error):
+        """Mark a claimed job failed; returns False (and changes nothing) if the claim was lost."""
+        return self._finish(job_id, claim_token, 'failed', error=error)
+
+    def get(self, job_id):
+        """
+        Returns:
+            dict or None: 'id', 'status', 'payload', 'result', 'error', 'attempts', 'created_at' and
+                          'updated_at' of the job, or None if there is no such job.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job_from_row(row) if row else None
+
+    @staticmethod
+    def _job_from_row(row):
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'payload': json.loads(row['payload']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'attempts': row['attempts'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+
+class JobWorkers:
+    """
+    Consumer threads that claim jobs from a JobQueue and run `handler(job)` on them.
+
+    `handler` returns a JSON-serializable result, or raises to fail the job (the exception
+    message becomes the job's error). Leases of in-flight jobs are renewed while they run.
+    """
+
+    def __init__(self, queue, handler, workers=DEFAULT_WORKERS, poll_interval=0.5):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._renew_leases, name="job-lease-renewal", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def notify(self):
+        """Wake idle workers after a job was enqueued, instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            with self._in_flight_lock:
+                self._in_flight[job['id']] = job['claim_token']
+            try:
+                result = self.handler(job)
+            except Exception as e:
+                print(f"Job {job['id']} failed: {e}")
+                self.queue.fail(job['id'], job['claim_token'], str(e))
+            else:
+                self.queue.complete(job['id'], job['claim_token'], result)
+            finally:
+                with self._in_flight_lock:
+                    self._in_flight.pop(job['id'], None)
+
+    def _renew_leases(self):
+        while not self._stopping.wait(self.queue.lease_seconds / 3):
+            with self._in_flight_lock:
+                in_flight = list(self._in_flight.items())
+            for job_id, claim_token in in_flight:
+                self.queue.renew(job_id, claim_token)
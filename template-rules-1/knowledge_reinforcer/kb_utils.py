@@ -1,7 +1,15 @@
 import os
 import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 # Determine paths relative to this file's location
 # Assumes kb_utils.py is in knowledge_reinforcer/
 # and knowledge_base/ is a sibling to knowledge_reinforcer/
@@ -23,102 +31,388 @@ PROJECT_ROOT = os.path.dirname(CURRENT_SCRIPT_DIR)
 # Paths to knowledge_base files
 KB_BASE_DIR = os.path.join(PROJECT_ROOT, 'knowledge_base')
 COUNTER_FILE = os.path.join(KB_BASE_DIR, 'kb_counter.txt')
+# Legacy JSON array index; imported into INDEX_LOG_FILE the first time the log is opened
 INDEX_FILE = os.path.join(KB_BASE_DIR, 'kb_index.json')
+# Append-only index: one JSON object per line
+INDEX_LOG_FILE = os.path.join(KB_BASE_DIR, 'kb_index.jsonl')
+# fsync after every append so an acknowledged add survives a power loss; KR_INDEX_FSYNC=0 trades that for speed
+INDEX_FSYNC = os.environ.get('KR_INDEX_FSYNC', '1') != '0'
+# Corrupt lines the index log may collect before readers compact it automatically
+INDEX_COMPACT_THRESHOLD = int(os.environ.get('KR_INDEX_COMPACT_THRESHOLD', 100))
+_MSVCRT_LOCK_OFFSET = 2 ** 31 - 2
+
+
+def _lock_fd(fd):
+    """Take an exclusive cross-process lock on an open file descriptor, waiting as long as needed."""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    # msvcrt locks a byte range from the current position, and the range is mandatory: lock a
+    # byte far past the end of the data so readers of the file are never blocked
+    while True:
+        os.lseek(fd, _MSVCRT_LOCK_OFFSET, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass  # LK_LOCK gives up after about 10 seconds; keep waiting
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, _MSVCRT_LOCK_OFFSET, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def _locked(fd):
+    """Hold an exclusive cross-process lock (flock, or msvcrt.locking on Windows) on an open file descriptor."""
+    _lock_fd(fd)
+    try:
+        yield
+    finally:
+        _unlock_fd(fd)
+
+
+def _pread(fd, n, offset):
+    if hasattr(os, 'pread'):
+        return os.pread(fd, n, offset)
+    os.lseek(fd, offset, os.SEEK_SET)  # Windows has no pread; the descriptor is locked, so seeking is safe
+    return os.read(fd, n)
+
+
+def _fsync_directory(path):
+    # Makes a rename or file creation in `path` durable
+    if os.name == 'nt':
+        return  # Directories cannot be opened or fsynced on Windows
+    dir_fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class SequenceAllocator:
+    """
+    Cross-process allocator of knowledge base sequence numbers.
+
+    The counter file holds the highest number ever handed out. `reserve(n)` takes an flock on
+    a sibling lock file, advances that high-water mark by `n` and durably replaces the counter
+    file (temp file, fsync, rename) before returning, so a crash can leave gaps but a number is
+    never handed out twice. Reserving a block costs one lock acquisition however large it is.
+    """
+
+    def __init__(self, counter_path):
+        self.counter_path = counter_path
+        self.lock_path = counter_path + '.lock'
+
+    def _read_high_water_mark(self):
+        if not os.path.exists(self.counter_path):
+            return 0
+        with open(self.counter_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        return int(content) if content else 0
+
+    def _write_high_water_mark(self, value):
+        temp_path = f"{self.counter_path}.tmp.{os.getpid()}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(str(value))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.counter_path)
+        _fsync_directory(os.path.dirname(self.counter_path))
+
+    def reserve(self, n=1):
+        """
+        Reserve `n` consecutive sequence numbers.
+
+        Returns:
+            range: The reserved numbers.
+        """
+        if n < 1:
+            raise ValueError("n must be at least 1.")
+        counter_dir = os.path.dirname(self.counter_path)
+        if not os.path.exists(counter_dir):
+            os.makedirs(counter_dir, exist_ok=True)
+            print(f"Warning: Knowledge base directory created at {counter_dir}")
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with _locked(fd):
+                start = self._read_high_water_mark() + 1
+                self._write_high_water_mark(start + n - 1)
+        finally:
+            os.close(fd)
+        return range(start, start + n)
 
 
 def get_next_sequence_number():
     """
     Generates and returns the next unique sequence number for the knowledge base.
-    
-    Reads the current value from the counter file, increments it by one, updates the file, and returns the new value. Initializes the counter file and directory if they do not exist. Not intended for concurrent access.
-     
+
+    Safe to call from several processes at once; see SequenceAllocator. Use `reserve_sequence_numbers` to take a whole block for a batch.
+
     Returns:
         int: The next sequence number.
     """
-    try:
-        if not os.path.exists(KB_BASE_DIR):
-            os.makedirs(KB_BASE_DIR)
-            print(f"Warning: Knowledge base directory created at {KB_BASE_DIR}")
-
-        if not os.path.exists(COUNTER_FILE):
-            # Initialize counter file if it doesn't exist
-            with open(COUNTER_FILE, 'w', encoding='utf-8') as f:
-                f.write('0')
-            current_number = 0
-        else:
-            with open(COUNTER_FILE, 'r+', encoding='utf-8') as f:
-                content = f.read().strip()
-                current_number = int(content) if content else 0
+    return reserve_sequence_numbers(1)[0]
 
-        next_number = current_number + 1
 
-        # Re-open in write mode to overwrite, or seek and truncate
-        with open(COUNTER_FILE, 'w', encoding='utf-8') as f:
-            f.write(str(next_number))
+def reserve_sequence_numbers(n):
+    """
+    Reserve a block of `n` consecutive sequence numbers with a single lock acquisition.
 
-        return next_number
-    except Exception as e:
+    Returns:
+        range: The reserved numbers.
+    """
+    try:
+        return SequenceAllocator(COUNTER_FILE).reserve(n)
+    except (OSError, ValueError) as e:
         print(f"Error managing sequence counter: {e}")
-        # Fallback or re-raise, for now, let's return a timestamp-based fallback for uniqueness if critical
-        # Or simply re-raise after logging. For this app, erroring out might be better.
         raise Exception(f"Critical error in get_next_sequence_number: {e}")
 
 
+class IndexStore:
+    """
+    Append-only JSONL log of knowledge base index items with an in-memory view.
+
+    `append` writes one line with a single write() under an flock, so concurrent writers never
+    interleave and a crash can at worst leave a torn last line. Torn lines are ignored by
+    readers and cut off before the next append. Readers keep the parsed items in memory and
+    only parse the bytes appended since the last refresh (tracked by file offset). `compact`
+    rewrites the log without corrupt lines and atomically swaps it in; a refresh that finds
+    `compact_threshold` or more corrupt lines does so automatically.
+    """
+
+    def __init__(self, log_path, legacy_path=None, fsync=INDEX_FSYNC, compact_threshold=INDEX_COMPACT_THRESHOLD):
+        self.log_path = log_path
+        self.legacy_path = legacy_path
+        self.fsync = fsync
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._items = []
+        self._offset = 0
+        self._inode = None
+        self._compacted_inode = None
+        self.corrupt_lines = 0
+
+    def _open_log(self):
+        log_dir = os.path.dirname(self.log_path)
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+            print(f"Warning: Knowledge base directory created at {log_dir}")
+        created = not os.path.exists(self.log_path)
+        fd = os.open(self.log_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        if created and self.legacy_path and os.path.exists(self.legacy_path):
+            with _locked(fd):
+                # Another process may have created the log (and imported) first
+                if os.fstat(fd).st_size == 0:
+                    self._import_legacy(fd)
+        return fd
+
+    @contextmanager
+    def _locked_log(self):
+        """Open the current log file and hold its lock, even if compaction replaces it meanwhile."""
+        while True:
+            fd = self._open_log()
+            _lock_fd(fd)
+            try:
+                current = os.stat(self.log_path).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                break
+            # Locked a log that was replaced while waiting; writing to it would lose data
+            _unlock_fd(fd)
+            os.close(fd)
+        try:
+            yield fd
+        finally:
+            _unlock_fd(fd)
+            os.close(fd)
+
+    def _import_legacy(self, fd):
+        # One-time migration from the kb_index.json array, done while holding the log lock
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            items = json.loads(content) if content else []
+        except json.JSONDecodeError:
+            print(f"Warning: {self.legacy_path} contains invalid JSON. It was not imported into {self.log_path}.")
+            return
+        data = ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in items).encode('utf-8')
+        os.write(fd, data)
+        os.fsync(fd)
+        print(f"Imported {len(items)} items from {self.legacy_path} into {self.log_path}.")
+
+    @staticmethod
+    def _truncate_torn_tail(fd):
+        # A crash mid-append can leave a last line without its newline; drop it so the next
+        # record starts on a fresh line
+        size = os.fstat(fd).st_size
+        if size == 0 or _pread(fd, 1, size - 1) == b'\n':
+            return
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            newline = _pread(fd, end - start, start).rfind(b'\n')
+            if newline != -1:
+                os.ftruncate(fd, start + newline + 1)
+                return
+            end = start
+        os.ftruncate(fd, 0)
+
+    def append(self, item):
+        """Durably append one item to the log."""
+        data = (json.dumps(item, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._locked_log() as fd:
+            self._truncate_torn_tail(fd)
+            os.write(fd, data)
+            if self.fsync:
+                os.fsync(fd)
+
+    def refresh(self):
+        """Parse whatever was appended to the log since the last refresh."""
+        with self._lock:
+            if not os.path.exists(self.log_path):
+                os.close(self._open_log())
+            with open(self.log_path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    # First read, or the log was replaced by compaction: start over
+                    self._items = []
+                    self._offset = 0
+                    self._inode = inode
+                    self.corrupt_lines = 0
+                f.seek(self._offset)
+                data = f.read()
+            # Only complete lines are consumed; a torn or in-flight last line is read next time
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    self._items.append(json.loads(line))
+                except ValueError:
+                    self.corrupt_lines += 1
+                    print(f"Warning: skipping corrupt line in {self.log_path}.")
+            self._offset += end
+            # At most one attempt per log file, so a compaction that keeps failing is not retried on every read
+            compact = self.corrupt_lines >= self.compact_threshold and self._compacted_inode != self._inode
+            if compact:
+                self._compacted_inode = self._inode
+        if compact:
+            try:
+                kept = self.compact()
+                print(f"Compacted {self.log_path}: dropped {self.corrupt_lines} corrupt lines, kept {kept} items.")
+            except OSError as e:
+                print(f"Warning: could not compact {self.log_path}: {e}")
+                return
+            self.refresh()  # Re-read the compacted log
+
+    def items(self):
+        """
+        Return the current index items, oldest first.
+
+        Returns:
+            list: A copy of the in-memory view after refreshing it from the log.
+        """
+        self.refresh()
+        with self._lock:
+            return list(self._items)
+
+    def compact(self):
+        """
+        Rewrite the log without torn or corrupt lines and atomically replace it.
+
+        Returns:
+            int: The number of items in the compacted log.
+        """
+        with self._locked_log() as fd:
+            self._truncate_torn_tail(fd)
+            kept = 0
+            temp_path = f"{self.log_path}.compact.{os.getpid()}"
+            # Streams line by line, so compaction never holds the whole log in memory
+            with open(self.log_path, 'rb') as source, open(temp_path, 'wb') as target:
+                for line in source:
+                    if not line.strip():
+                        continue
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        continue
+                    target.write(line)
+                    kept += 1
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(temp_path, self.log_path)
+            _fsync_directory(os.path.dirname(self.log_path))
+        return kept
+
+
+_index_stores = {}
+_index_stores_lock = threading.Lock()
+
+
+def _get_index_store():
+    # One store (and in-memory view) per log path, so tests can point INDEX_LOG_FILE elsewhere
+    with _index_stores_lock:
+        if INDEX_LOG_FILE not in _index_stores:
+            _index_stores[INDEX_LOG_FILE] = IndexStore(
+                INDEX_LOG_FILE, legacy_path=INDEX_FILE, compact_threshold=INDEX_COMPACT_THRESHOLD
+            )
+        return _index_stores[INDEX_LOG_FILE]
+
+
 def read_index():
     """
-    Read and return the list of metadata items from the knowledge base index file.
-    
+    Read and return the list of metadata items from the knowledge base index.
+
+    Served from an in-memory view that only parses the lines appended since the previous call.
+    Corrupt lines are skipped with a warning instead of discarding the whole index.
+
     Returns:
-        list: A list of metadata dictionaries from the index file. Returns an empty list if the file does not exist, is empty, or contains invalid JSON.
+        list: A list of metadata dictionaries, oldest first. Returns an empty list if nothing was indexed yet.
     """
     try:
-        if not os.path.exists(INDEX_FILE):
-            # Initialize index file if it doesn't exist
-            with open(INDEX_FILE, 'w', encoding='utf-8') as f:
-                json.dump([], f)
-            return []
-
-        with open(INDEX_FILE, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            if not content: # File is empty
-                return []
-            return json.loads(content)
-    except json.JSONDecodeError:
-        print(f"Warning: {INDEX_FILE} contains invalid JSON. Returning empty list.")
-        return [] # Or handle error more gracefully, maybe backup old file
-    except Exception as e:
+        return _get_index_store().items()
+    except OSError as e:
         print(f"Error reading index file: {e}")
         raise Exception(f"Critical error in read_index: {e}")
 
 def add_to_index(item_metadata):
     """
-    Add a metadata dictionary to the knowledge base index file.
-    
-    Appends the provided metadata dictionary to the JSON index file, adding a 'date_saved' timestamp if not present. Raises a ValueError if the input is not a dictionary. On write failure, raises an exception.
+    Add a metadata dictionary to the knowledge base index.
+
+    Appends the provided metadata dictionary as one line of the JSONL index log, adding a 'date_saved' timestamp if not present. Raises a ValueError if the input is not a dictionary. On write failure, raises an exception.
     """
     if not isinstance(item_metadata, dict):
         raise ValueError("item_metadata must be a dictionary.")
 
-    all_items = read_index() # Handles file creation and empty cases
-
     # Add a 'date_saved' timestamp if not already present
     if 'date_saved' not in item_metadata:
         item_metadata['date_saved'] = datetime.now().isoformat()
 
-    all_items.append(item_metadata)
-
     try:
-        with open(INDEX_FILE, 'w', encoding='utf-8') as f:
-            json.dump(all_items, f, indent=2) # indent for human readability
-    except Exception as e:
+        _get_index_store().append(item_metadata)
+    except (OSError, TypeError, ValueError) as e:
         print(f"Error writing to index file: {e}")
-        # Consider how to handle this - rollback?
         raise Exception(f"Critical error in add_to_index: {e}")
 
+def compact_index():
+    """
+    Rewrite the index log without torn or corrupt lines.
+
+    Returns:
+        int: The number of items kept.
+    """
+    return _get_index_store().compact()
+
 if __name__ == '__main__':
     # Simple test cases (run this file directly to test)
     print(f"Counter file: {COUNTER_FILE}")
-    print(f"Index file: {INDEX_FILE}")
+    print(f"Index file: {INDEX_LOG_FILE}")
 
     # Ensure knowledge_base directory exists for testing
     if not os.path.exists(KB_BASE_DIR):
@@ -133,6 +427,8 @@ if __name__ == '__main__':
     print(f"Next sequence number: {num1}")
     num2 = get_next_sequence_number()
     print(f"Next sequence number: {num2}")
+    block = reserve_sequence_numbers(3)
+    print(f"Reserved block: {list(block)}")
 
     # Reset counter for consistent testing if needed (manual step or add function)
     # with open(COUNTER_FILE, 'w') as f:
@@ -143,8 +439,8 @@ if __name__ == '__main__':
     # Test index
     print("\nTesting index functions...")
     # Clear index for clean test
-    with open(INDEX_FILE, 'w') as f:
-        json.dump([], f)
+    if os.path.exists(INDEX_LOG_FILE):
+        os.remove(INDEX_LOG_FILE)
     print("Cleared index file for test.")
 
     print(f"Initial index: {read_index()}")
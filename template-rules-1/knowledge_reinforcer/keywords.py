@@ -0,0 +1,104 @@
+import heapq
+import re
+import threading
+from collections import defaultdict
+from .nltk_setup import english_stopwords
+
+# Runs of punctuation, the non-word tokens of nltk's wordpunct_tokenize
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+
+
+class KeywordExtractor:
+    """
+    RAKE (Rapid Automatic Keyword Extraction) keyword extractor meant to live for the whole process.
+
+    Approximates `rake_nltk.Rake` with its default degree-to-frequency metric: phrases are
+    runs of words between stopwords and punctuation, each word scores degree / frequency,
+    and a phrase scores the sum over its words. Unlike rake_nltk there is no sentence
+    tokenization, and every run of punctuation splits phrases; rake_nltk only splits on
+    single punctuation characters and keeps runs such as "..." or ")," inside a phrase. On
+    text whose punctuation comes one character at a time the rankings are identical. The
+    stopword set and punctuation regex are built once.
+    """
+
+    def __init__(self, stopwords=None, min_length=1, max_length=100000):
+        self.stopwords = frozenset(stopwords) if stopwords is not None else english_stopwords()
+        self.min_length = min_length
+        self.max_length = max_length
+
+    def _phrases(self, text):
+        stopwords = self.stopwords
+        phrases = []
+        # Punctuation always ends a phrase; what is left between it is plain whitespace-separated words
+        for chunk in _PUNCTUATION_RE.split(text.lower()):
+            current = []
+            for word in chunk.split():
+                if word not in stopwords:
+                    current.append(word)
+                elif current:
+                    phrases.append(current)
+                    current = []
+            if current:
+                phrases.append(current)
+        return [phrase for phrase in phrases if self.min_length <= len(phrase) <= self.max_length]
+
+    def ranked_phrases(self, text, limit=None):
+        """
+        Return candidate phrases in `text` with their RAKE scores.
+
+        Returns:
+            list: (score, phrase) tuples sorted best first, ties broken like rake_nltk.
+            Only the best `limit` are returned when `limit` is given.
+        """
+        phrases = self._phrases(text)
+        frequency = defaultdict(int)
+        degree = defaultdict(int)
+        for phrase in phrases:
+            length = len(phrase)
+            for word in phrase:
+                frequency[word] += 1
+                degree[word] += length
+        word_scores = {word: 1.0 * degree[word] / count for word, count in frequency.items()}
+        rank_list = [(sum(word_scores[word] for word in phrase), ' '.join(phrase)) for phrase in phrases]
+        if limit is None:
+            rank_list.sort(reverse=True)
+            return rank_list
+        return heapq.nlargest(limit, rank_list)
+
+    def extract_keywords(self, text, num_keywords=3):
+        if not text:
+            return []
+        return [phrase for _, phrase in self.ranked_phrases(text, num_keywords)]
+
+    def extract_keywords_batch(self, texts, num_keywords=3):
+        """
+        Extract keywords from many texts, skipping repeated ones.
+
+        Returns:
+            list: One keyword list per input text, in input order.
+        """
+        seen = {}
+        results = []
+        for text in texts:
+            if text not in seen:
+                seen[text] = self.extract_keywords(text, num_keywords)
+            results.append(list(seen[text]))
+        return results
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_keyword_extractor():
+    """Return the process-wide KeywordExtractor, creating it on first use."""
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None:
+            _extractor = KeywordExtractor()
+        return _extractor
+
+
+def extract_keywords_batch(texts, k=3):
+    """Extract the top `k` keywords from each of `texts` with the process-wide extractor."""
+    return get_keyword_extractor().extract_keywords_batch(texts, k)
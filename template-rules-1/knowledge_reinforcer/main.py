@@ -1,34 +1,205 @@
 import argparse
+import multiprocessing
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from urllib.parse import urlparse
 import re
 
-from .fetcher import fetch_content
+from .fetcher import fetch_content, fetch_source
 from .processor import process_content_to_markdown
-from .storage import save_to_knowledge_base
+from .storage import save_to_knowledge_base, find_saved_source, reconcile_indexes, BASE_KNOWLEDGE_DIR
 from .nltk_setup import ensure_nltk_resources
 
-def main():
-    # Ensure NLTK resources are available
-    ensure_nltk_resources()
+def _detect_content_type(url):
+    if "youtube.com/watch" in url or "youtu.be/" in url:
+        return "youtube-video"
+    return "web-article"
+
+def _build_filename(title, suffix=""):
+    # Sanitize filename: replace non-alphanumeric with underscores, limit length
+    filename_base = re.sub(r'[^a-zA-Z0-9_]', '', title.replace(' ', '_'))[:50] or "untitled"
+    return f"{filename_base}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}.md"
+
+def _read_batch_urls(batch_path):
+    """
+    Read URLs for batch ingestion, one per line, from a file or stdin ('-').
+
+    Blank lines and lines starting with '#' are skipped.
+
+    Returns:
+        list: The URLs in input order.
+    """
+    if batch_path == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(batch_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+def _fetch_item(url):
+    content_type = _detect_content_type(url)
+    return content_type, fetch_source(url, content_type)
+
+def run_batch(urls, tags, purpose, fetch_workers=16, process_workers=None):
+    """
+    Ingest many URLs concurrently and save each result to the knowledge base.
+
+    Fetching runs on a bounded thread pool, markdown processing on a process pool
+    (spawned, not forked, since the fetch threads are already running; each worker verifies
+    NLTK resources once), and saving happens in this process.
+    At most ``fetch_workers * 2`` fetches are in flight, so fetched bodies never pile up
+    faster than they can be processed. Filenames are suffixed with sequence numbers reserved
+    as one block for the whole batch, so concurrent batches never collide. URLs already in the
+    knowledge base (content-addressed mode only) are not fetched again.
+
+    Returns:
+        dict: Counts of 'saved', 'failed' and 'existing' (skipped as already stored) items,
+        plus 'elapsed' seconds.
+    """
+    # Only batches need the sequence counter; importing it lazily keeps the other commands light
+    from .kb_utils import reserve_sequence_numbers
+
+    total = len(urls)
+    stats = {'saved': 0, 'failed': 0, 'existing': 0, 'elapsed': 0.0}
+    start = time.monotonic()
+    max_in_flight = max(1, fetch_workers * 2)
+    sequence_numbers = reserve_sequence_numbers(total) if total else range(0)
+    reconcile_indexes()  # Up front, rather than inside the first duplicate lookup or save
+
+    def report(index, status, url, detail=""):
+        print(f"[{index + 1}/{total}] {status:<6} {url}{' - ' + detail if detail else ''}")
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+            ProcessPoolExecutor(max_workers=process_workers, mp_context=multiprocessing.get_context('spawn'),
+                                initializer=ensure_nltk_resources) as process_pool:
+        pending_fetches = {}
+        pending_processing = {}
+        next_index = 0
+
+        while next_index < total or pending_fetches or pending_processing:
+            while next_index < total and len(pending_fetches) + len(pending_processing) < max_in_flight:
+                url = urls[next_index]
+                existing = find_saved_source(url)
+                if existing is not None:
+                    stats['existing'] += 1
+                    report(next_index, "EXISTS", url, os.path.basename(existing.path))
+                else:
+                    pending_fetches[fetch_pool.submit(_fetch_item, url)] = (next_index, url)
+                next_index += 1
+
+            done, _ = wait(list(pending_fetches) + list(pending_processing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in pending_fetches:
+                    index, url = pending_fetches.pop(future)
+                    try:
+                        content_type, result = future.result()
+                    except Exception as e:
+                        stats['failed'] += 1
+                        report(index, "FAILED", url, str(e))
+                        continue
+                    if result.status != 'ok' or not result.content:
+                        stats['failed'] += 1
+                        report(index, "FAILED", url, f"{result.status}: {result.error or 'no content'}")
+                        continue
+                    title = result.title or "Untitled"
+                    processing = process_pool.submit(
+                        process_content_to_markdown, result.content, content_type, url, title, tags, purpose
+                    )
+                    pending_processing[processing] = (index, url, content_type, title)
+                else:
+                    index, url, content_type, title = pending_processing.pop(future)
+                    try:
+                        markdown_content = future.result()
+                    except Exception as e:
+                        stats['failed'] += 1
+                        report(index, "FAILED", url, str(e))
+                        continue
+                    if not markdown_content:
+                        stats['failed'] += 1
+                        report(index, "FAILED", url, "could not process content to markdown")
+                        continue
+                    filename = _build_filename(title, suffix=f"_{sequence_numbers[index]:05d}")
+                    saved = save_to_knowledge_base(filename, markdown_content, content_type)
+                    if saved is None:
+                        stats['failed'] += 1
+                        report(index, "FAILED", url, "could not write to the knowledge base")
+                        continue
+                    stats['saved'] += 1
+                    report(index, "EXISTS" if saved.duplicate else "SAVED", url, os.path.basename(saved.path))
+
+    stats['elapsed'] = time.monotonic() - start
+    rate = total / stats['elapsed'] if stats['elapsed'] else 0.0
+    print(f"Batch complete: {stats['saved']} saved, {stats['failed']} failed, {stats['existing']} already stored, "
+          f"{total} total in {stats['elapsed']:.1f}s ({rate:.2f} items/s).")
+    return stats
 
+def run_search(query, limit=10):
+    """
+    Print the best full-text matches for `query`.
+
+    Returns:
+        list: The search results, as returned by SearchIndex.search.
+    """
+    from .search_index import get_search_index
+    results = get_search_index(BASE_KNOWLEDGE_DIR).search(query, limit=limit)
+    if not results:
+        print(f"No results for '{query}'.")
+    for rank, result in enumerate(results, 1):
+        print(f"{rank}. {result['title']} ({result['filename']})")
+        print(f"   {' '.join(result['snippet'].split())}")
+    return results
+
+def main():
+    # NLTK resources are verified lazily the first time content is processed, so --help
+    # and --web start without loading NLTK
     parser = argparse.ArgumentParser(description="Knowledge Reinforcer: Extracts content from various sources and stores it as structured markdown.")
     parser.add_argument("--url", type=str, help="The URL (web page or YouTube video) to extract content from.")
     parser.add_argument("--text", type=str, help="Direct text content to store (optional).")
+    parser.add_argument("--batch", type=str, metavar="FILE", help="File with one URL per line to ingest concurrently ('-' reads from stdin).")
+    parser.add_argument("--fetch-workers", type=int, default=16, help="Number of concurrent fetches in --batch mode.")
+    parser.add_argument("--process-workers", type=int, default=None, help="Number of processes for markdown processing in --batch mode (defaults to the CPU count).")
     parser.add_argument("--tags", type=str, default="", help="Comma-separated tags for the content (e.g., 'AI,NLP,Design Patterns').")
     parser.add_argument("--purpose", type=str, default="", help="A brief statement on why this information is relevant for AI coding (e.g., 'New design pattern', 'Best practice for secure APIs').")
     parser.add_argument("--web", action="store_true", help="Run the web interface.")
+    parser.add_argument("--search", type=str, metavar="QUERY", help="Full-text search the knowledge base and print the best matches.")
+    parser.add_argument("--search-limit", type=int, default=10, help="Number of results printed by --search.")
+    parser.add_argument("--rebuild-search-index", action="store_true", help="Rebuild the full-text search index from the knowledge base files.")
 
     args = parser.parse_args()
 
     if args.web:
+        # The reloader's watcher process imports the app too; run_dev_server starts the workers in the serving child
+        os.environ['KR_START_WORKERS'] = '0'
         from . import web_app
-        web_app.app.run(debug=True, port=3005)
+        web_app.run_dev_server(3005)
+        return
+
+    if args.rebuild_search_index:
+        from .search_index import get_search_index
+        indexed = get_search_index(BASE_KNOWLEDGE_DIR).rebuild()
+        print(f"Search index rebuilt: {indexed} documents indexed.")
+        return
+
+    if args.search:
+        run_search(args.search, limit=args.search_limit)
+        return
+
+    if args.batch:
+        urls = _read_batch_urls(args.batch)
+        run_batch(
+            urls,
+            args.tags.split(',') if args.tags else [],
+            args.purpose,
+            fetch_workers=args.fetch_workers,
+            process_workers=args.process_workers,
+        )
         return
 
     if not args.url and not args.text:
-        parser.error("Either --url or --text must be provided.")
+        parser.error("Either --url, --text, --batch or --search must be provided.")
 
     content_type = None
     raw_content = None
@@ -36,17 +207,18 @@ def main():
     title = "Untitled"
 
     if args.url:
+        existing = find_saved_source(args.url)
+        if existing is not None:
+            print(f"Content already in knowledge base as {existing.path}.")
+            return
         source_url = args.url
-        if "youtube.com/watch" in args.url or "youtu.be/" in args.url:
-            content_type = "youtube-video"
-        else:
-            content_type = "web-article"
-        
+        content_type = _detect_content_type(args.url)
+
         print(f"Fetching content from: {args.url}")
         raw_content, fetched_title = fetch_content(args.url, content_type)
         if fetched_title: # Use fetched title if available
             title = fetched_title
-        
+
         if not raw_content:
             print(f"Could not fetch content from {args.url}.")
             return
@@ -67,11 +239,14 @@ def main():
             args.purpose
         )
         if markdown_content:
-            # Sanitize filename: replace non-alphanumeric with underscores, limit length
-            filename_base = re.sub(r'[^a-zA-Z0-9_]', '', title.replace(' ', '_'))[:50] or "untitled"
-            filename = f"{filename_base}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-            save_to_knowledge_base(filename, markdown_content, content_type)
-            print(f"Content saved to knowledge base as {filename}.")
+            filename = _build_filename(title)
+            saved = save_to_knowledge_base(filename, markdown_content, content_type)
+            if saved is None:
+                print(f"Could not save content to the knowledge base.")
+            elif saved.duplicate:
+                print(f"Content already in knowledge base as {saved.path}.")
+            else:
+                print(f"Content saved to knowledge base as {os.path.basename(saved.path)}.")
         else:
             print(f"Could not process content to markdown.")
 
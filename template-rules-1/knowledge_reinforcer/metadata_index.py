@@ -0,0 +1,299 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+
+from .storage import read_front_matter, is_item_file, item_stem, OBJECTS_DIR
+
+# Listing index, stored next to the items so it moves with the knowledge base
+INDEX_FILENAME = '.kb_metadata.sqlite3'
+# Kept in PRAGMA user_version; on a mismatch items and item_tags are dropped and refilled by reconcile
+SCHEMA_VERSION = 3
+
+# Columns `query_items` can sort on; each has a (column, path) index so pages are index range scans
+SORT_COLUMNS = ('date', 'title')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _normalize_date(value):
+    # yaml.safe_load turns unquoted timestamps into datetime objects; store everything as ISO strings.
+    # Undated items get '' so they sort after every dated item in the default newest-first order.
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value) if value else ''
+
+
+def _encode_cursor(sort_value, path):
+    return base64.urlsafe_b64encode(json.dumps([sort_value, path]).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        sort_value, path = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    if not isinstance(sort_value, str) or not isinstance(path, str):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return sort_value, path
+
+
+def _date_bound(value, end_of_day):
+    # Validates a date range bound; a bare date as the upper bound covers that whole day
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}'. Expected an ISO date such as 2024-01-31")
+    if end_of_day and len(value) == 10:
+        return value + 'T23:59:59.999999'
+    return value
+
+
+class MetadataIndex:
+    """
+    SQLite index of the front matter of every markdown item in a knowledge base directory.
+
+    Stores title, date, tags, source type, relative path, size and mtime per item so that
+    listing the knowledge base never opens the markdown files. `upsert_file` keeps it
+    current when items are saved; `reconcile` catches up with changes made behind its back
+    by re-reading only files whose size or mtime changed.
+    """
+
+    def __init__(self, base_dir, db_path=None):
+        self.base_dir = base_dir
+        self.db_path = db_path or os.path.join(base_dir, INDEX_FILENAME)
+        os.makedirs(base_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS item_tags")
+            self._conn.execute("DROP TABLE IF EXISTS items")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " path TEXT PRIMARY KEY, title TEXT NOT NULL, date TEXT NOT NULL, tags TEXT NOT NULL,"
+            " source_type TEXT, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " source_url TEXT, content_hash TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_date ON items (date, path)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_title ON items (title, path)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_source_type ON items (source_type, date, path)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_source_url ON items (source_url)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_content_hash ON items (content_hash)")
+        # One row per (tag, item) so tag filters are an index lookup instead of a JSON scan
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS item_tags ("
+            " tag TEXT NOT NULL, path TEXT NOT NULL, PRIMARY KEY (tag, path)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS item_tags_path ON item_tags (path)")
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+
+    def _relative_path(self, file_path):
+        return os.path.relpath(file_path, self.base_dir).replace(os.sep, '/')
+
+    def _row_for_file(self, file_path, stat):
+        metadata = read_front_matter(file_path)
+        relative_path = self._relative_path(file_path)
+        default_title = item_stem(file_path)
+        # Content-addressed items are named by their hash; other layouts have none
+        digest = default_title if relative_path.startswith(OBJECTS_DIR + '/') else None
+        source_url = metadata.get('source_url')
+        return (
+            relative_path,
+            str(metadata.get('title') or default_title),
+            _normalize_date(metadata.get('date_extracted')),
+            json.dumps([str(tag) for tag in metadata.get('user_tags') or []]),
+            metadata.get('source_type'),
+            stat.st_size,
+            stat.st_mtime_ns,
+            source_url if source_url and source_url != 'N/A' else None,
+            digest,
+        )
+
+    def upsert_file(self, file_path):
+        """Index (or re-index) a single markdown file."""
+        row = self._row_for_file(file_path, os.stat(file_path))
+        with self._lock:
+            self._write_rows([row])
+            self._conn.commit()
+
+    def remove(self, relative_path):
+        with self._lock:
+            self._delete_paths([relative_path])
+            self._conn.commit()
+
+    def _write_rows(self, rows):
+        self._conn.executemany("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._conn.executemany("DELETE FROM item_tags WHERE path = ?", [(row[0],) for row in rows])
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO item_tags VALUES (?, ?)",
+            [(tag, row[0]) for row in rows for tag in json.loads(row[3])],
+        )
+
+    def _delete_paths(self, paths):
+        self._conn.executemany("DELETE FROM items WHERE path = ?", [(path,) for path in paths])
+        self._conn.executemany("DELETE FROM item_tags WHERE path = ?", [(path,) for path in paths])
+
+    def reconcile(self):
+        """
+        Bring the index in line with the files on disk.
+
+        Only files whose size or mtime differ from the indexed values are parsed again;
+        entries for files that no longer exist are dropped.
+
+        Returns:
+            dict: Counts of 'updated' and 'removed' entries.
+        """
+        with self._lock:
+            known = {
+                row['path']: (row['size'], row['mtime_ns'])
+                for row in self._conn.execute("SELECT path, size, mtime_ns FROM items")
+            }
+        changed_rows = []
+        seen = set()
+        for root, _, files in os.walk(self.base_dir):
+            for file in files:
+                if not is_item_file(file):
+                    continue
+                file_path = os.path.join(root, file)
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                relative_path = self._relative_path(file_path)
+                seen.add(relative_path)
+                if known.get(relative_path) != (stat.st_size, stat.st_mtime_ns):
+                    changed_rows.append(self._row_for_file(file_path, stat))
+        removed = [path for path in known if path not in seen]
+        with self._lock:
+            self._write_rows(changed_rows)
+            self._delete_paths(removed)
+            self._conn.commit()
+        return {'updated': len(changed_rows), 'removed': len(removed)}
+
+    def list_items(self):
+        """
+        Return all indexed items, newest first; items without a date sort last.
+
+        Returns:
+            list: Dicts with 'filename', 'title', 'date', 'tags', 'source_type', 'size', 'mtime_ns',
+                  'source_url' and 'content_hash'.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM items ORDER BY date DESC, path DESC").fetchall()
+        return [self._item_from_row(row) for row in rows]
+
+    def query_items(self, tag=None, source_type=None, date_from=None, date_to=None,
+                    sort='date', descending=True, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """
+        Return one page of items matching the filters.
+
+        Pages use keyset pagination on (sort column, path): `cursor` is the `next_cursor`
+        of the previous page, so each page costs O(limit) no matter how deep it is.
+        `date_from` and `date_to` are inclusive ISO dates (a bare `date_to` covers the whole
+        day); undated items are left out when either is given.
+
+        Raises:
+            ValueError: For an unknown sort column, a bad date or an invalid cursor.
+
+        Returns:
+            tuple: (items, next_cursor). `items` is a list of dicts as returned by `list_items`;
+                   `next_cursor` is None on the last page.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column '{sort}'. Available: {', '.join(SORT_COLUMNS)}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        conditions = []
+        params = []
+        if tag:
+            conditions.append("path IN (SELECT path FROM item_tags WHERE tag = ?)")
+            params.append(tag)
+        if source_type:
+            conditions.append("source_type = ?")
+            params.append(source_type)
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(_date_bound(date_from, end_of_day=False))
+        if date_to:
+            conditions.append("date <= ? AND date != ''")
+            params.append(_date_bound(date_to, end_of_day=True))
+        if cursor:
+            conditions.append(f"({sort}, path) {'<' if descending else '>'} (?, ?)")
+            params.extend(_decode_cursor(cursor))
+
+        direction = 'DESC' if descending else 'ASC'
+        sql = "SELECT * FROM items"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        # Fetch one extra row to learn whether another page follows
+        sql += f" ORDER BY {sort} {direction}, path {direction} LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][sort], rows[-1]['path'])
+        return [self._item_from_row(row) for row in rows], next_cursor
+
+    def _find(self, column, value):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM items WHERE {column} = ? ORDER BY date DESC, path DESC", (value,)
+            ).fetchall()
+        return [self._item_from_row(row) for row in rows]
+
+    def find_by_source_url(self, source_url):
+        """Return the items saved from `source_url`, newest first; each carries its 'content_hash'."""
+        return self._find('source_url', source_url)
+
+    def find_by_title(self, title):
+        """Return the items titled exactly `title`, newest first; each carries its 'content_hash'."""
+        return self._find('title', title)
+
+    def find_by_hash(self, digest):
+        """Return the content-addressed item stored under `digest` (a list of at most one item)."""
+        return self._find('content_hash', digest)
+
+    @staticmethod
+    def _item_from_row(row):
+        return {
+            'filename': row['path'],
+            'title': row['title'],
+            'date': row['date'],
+            'tags': json.loads(row['tags']),
+            'source_type': row['source_type'],
+            'size': row['size'],
+            'mtime_ns': row['mtime_ns'],
+            'source_url': row['source_url'],
+            'content_hash': row['content_hash'],
+        }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_metadata_index(base_dir):
+    """
+    Return the process-wide MetadataIndex of `base_dir`.
+
+    The first call in a process opens the index and catches up with items added, changed or
+    removed on disk since it last ran; later calls return it as is.
+    """
+    base_dir = os.path.abspath(base_dir)
+    with _indexes_lock:
+        if base_dir not in _indexes:
+            index = MetadataIndex(base_dir)
+            index.reconcile()
+            _indexes[base_dir] = index
+        return _indexes[base_dir]
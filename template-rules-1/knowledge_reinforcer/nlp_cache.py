@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('KR_NLP_CACHE_SIZE', 4096))
+# Optional path of a SQLite file that keeps results across processes and restarts
+DEFAULT_DB_PATH = os.environ.get('KR_NLP_CACHE_DB') or None
+
+
+def normalize_text(text):
+    """Collapse runs of whitespace so trivially reformatted copies of a text share a cache key."""
+    return " ".join(text.split())
+
+
+class NlpCache:
+    """
+    Memoizes NLP results by a hash of the normalized input text plus the engine parameters.
+
+    Results are kept in a bounded in-memory LRU and, when `db_path` is given, in a SQLite
+    table shared by every process that points at the same file. Values must be
+    JSON-serializable; both tiers hold them serialized, so every lookup returns a fresh
+    copy that callers may mutate freely.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, db_path=DEFAULT_DB_PATH):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS nlp_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(namespace, text, params):
+        digest = hashlib.sha256()
+        digest.update(namespace.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(normalize_text(text).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached value, checking memory first and then the SQLite tier.
+
+        Returns:
+            tuple: (found, value).
+        """
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+            elif self._conn is not None:
+                row = self._conn.execute("SELECT value FROM nlp_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    encoded = row[0]
+                    self._remember(key, encoded)
+        if encoded is None:
+            return False, None
+        return True, json.loads(encoded)
+
+    def set(self, key, value):
+        encoded = json.dumps(value)
+        with self._lock:
+            self._remember(key, encoded)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO nlp_cache (key, value) VALUES (?, ?)", (key, encoded))
+                self._conn.commit()
+
+    def _remember(self, key, encoded):
+        # Caller holds self._lock
+        self._entries[key] = encoded
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def memoize(self, namespace, text, params, compute):
+        """
+        Return the cached result for (`namespace`, `text`, `params`), calling `compute()` on a miss.
+        """
+        key = self.make_key(namespace, text, params)
+        found, value = self.get(key)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if found:
+            return value
+        value = compute()
+        self.set(key, value)
+        return value
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_nlp_cache():
+    """Return the process-wide NlpCache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = NlpCache()
+        return _cache
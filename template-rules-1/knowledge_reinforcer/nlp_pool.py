@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+DEFAULT_WORKERS = int(os.environ.get('KR_NLP_WORKERS', min(4, os.cpu_count() or 1)))
+DEFAULT_TASK_TIMEOUT = float(os.environ.get('KR_NLP_TASK_TIMEOUT', 60))
+
+
+class NlpTaskTimeout(Exception):
+    """Raised when an NLP task does not finish within the pool's per-task timeout."""
+
+
+def _warm_worker():
+    # Runs once in every worker process: verify NLTK data and load the stopwords,
+    # tokenizers and NumPy/SciPy so the first real task does not pay for them
+    from .nltk_setup import ensure_nltk_resources, english_stopwords
+    from . import summarizers  # noqa: F401
+    from .keywords import get_keyword_extractor
+    ensure_nltk_resources()
+    try:
+        english_stopwords()
+        get_keyword_extractor()
+    except LookupError as e:
+        print(f"Warning: NLP worker {os.getpid()} could not load NLTK data: {e}")
+
+
+def _ping():
+    return os.getpid()
+
+
+class NlpPool:
+    """
+    Managed process pool for the CPU-heavy processing stages of the web app.
+
+    Workers are started with the 'spawn' method (the web app runs threads, which do not
+    mix well with fork) and warmed by `_warm_worker`, so NLTK data is loaded once per
+    worker. `run` waits at most `task_timeout` seconds for a result. A running task cannot
+    be cancelled, so on a timeout the pool's workers are terminated and replaced with fresh
+    ones; other tasks that were running on them are resubmitted to the new workers.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, task_timeout=DEFAULT_TASK_TIMEOUT):
+        self.workers = workers
+        self.task_timeout = task_timeout
+        self.recycled = 0
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_warm_worker,
+        )
+
+    def _recycle(self, executor):
+        # Replace `executor` unless another timed-out task already did
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = self._new_executor()
+            self.recycled += 1
+        # Start and warm the replacement workers now rather than on the next task's clock
+        for _ in range(self.workers):
+            self._executor.submit(_ping)
+        # ProcessPoolExecutor has no public way to stop a running task, so terminate its workers
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self):
+        """Start worker processes (and run their warm-up) ahead of the first requests."""
+        futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` in a worker process and return its result.
+
+        `fn` and its arguments must be picklable (module-level functions and plain data).
+
+        Raises:
+            NlpTaskTimeout: If the task does not finish within `task_timeout` seconds.
+        """
+        while True:
+            executor = self._executor
+            try:
+                future = executor.submit(fn, *args, **kwargs)
+            except (BrokenProcessPool, RuntimeError):
+                if self._executor is executor:
+                    raise
+                continue  # Recycled between reading self._executor and submitting
+            try:
+                return future.result(timeout=self.task_timeout)
+            except FutureTimeoutError:
+                self._recycle(executor)
+                raise NlpTaskTimeout(f"{getattr(fn, '__name__', fn)} did not finish within {self.task_timeout}s")
+            except BrokenProcessPool:
+                # Another task's timeout recycled the workers under this one; run it on the replacement
+                if self._executor is executor:
+                    raise
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_nlp_pool(workers=DEFAULT_WORKERS, task_timeout=DEFAULT_TASK_TIMEOUT, warm=True):
+    """
+    Return the shared NlpPool for this configuration, creating (and warming) it on first use.
+
+    Returns:
+        NlpPool or None: None when `workers` is 0, meaning tasks should run inline.
+    """
+    if not workers:
+        return None
+    key = (workers, task_timeout)
+    with _pools_lock:
+        if key not in _pools:
+            pool = NlpPool(workers, task_timeout)
+            if warm:
+                pool.warm()
+            _pools[key] = pool
+        return _pools[key]
+
+
+def run_nlp_task(workers, task_timeout, fn, *args, **kwargs):
+    """Run `fn` on the shared pool for this configuration, or inline when `workers` is 0."""
+    pool = get_nlp_pool(workers, task_timeout)
+    if pool is None:
+        return fn(*args, **kwargs)
+    return pool.run(fn, *args, **kwargs)
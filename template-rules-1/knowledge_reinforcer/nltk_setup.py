@@ -1,40 +1,98 @@
-import nltk
+import json
 import os
 import ssl
+import threading
+from functools import lru_cache
+
+# Define a consistent download directory within the project
+NLTK_DATA_DIR = os.path.join(os.path.dirname(__file__), 'nltk_data')
+# Written once every resource has been verified, so later processes can skip nltk.data.find
+MARKER_FILE = os.path.join(NLTK_DATA_DIR, '.resources_verified')
+
+RESOURCES = {
+    "punkt_tab": "tokenizers/punkt_tab",
+    "stopwords": "corpora/stopwords"
+}
+
+_verified = False
+_verify_lock = threading.Lock()
+
+def _download_with_unverified_ssl(resource_id, download_dir):
+    import nltk
+    # --- SSL Certificate Workaround (for macOS and other systems) ---
+    # Only applied for the duration of the download instead of patching the process-wide default
+    original_context = ssl._create_default_https_context
+    try:
+        ssl._create_default_https_context = ssl._create_unverified_context
+    except AttributeError:
+        pass
+    try:
+        return nltk.download(resource_id, download_dir=download_dir)
+    finally:
+        ssl._create_default_https_context = original_context
 
 def ensure_nltk_resources():
     """
     Ensures that the required NLTK data packages are downloaded and accessible.
     This version specifically targets 'punkt_tab' as requested by the application's traceback.
+
+    Verification succeeds at most once per process. Once every resource has been found, a marker
+    file in the download directory records it so later processes skip the lookups entirely.
     """
-    # Define a consistent download directory within the project
-    download_dir = os.path.join(os.path.dirname(__file__), 'nltk_data')
-    if not os.path.exists(download_dir):
-        os.makedirs(download_dir)
+    global _verified
+    if _verified:
+        return
+    with _verify_lock:
+        if _verified:
+            return
+        import nltk
 
-    # Add the custom download directory to NLTK's data path
-    if download_dir not in nltk.data.path:
-        nltk.data.path.insert(0, download_dir)
+        if not os.path.exists(NLTK_DATA_DIR):
+            os.makedirs(NLTK_DATA_DIR)
 
-    # --- SSL Certificate Workaround (for macOS and other systems) ---
+        # Add the custom download directory to NLTK's data path
+        if NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+        if _read_marker() == sorted(RESOURCES):
+            _verified = True
+            return
+
+        # --- Resource Verification and Download ---
+        all_found = True
+        for resource_id, resource_path in RESOURCES.items():
+            try:
+                nltk.data.find(resource_path)
+            except LookupError:
+                print(f"NLTK '{resource_id}' resource not found. Downloading to {NLTK_DATA_DIR}...")
+                if _download_with_unverified_ssl(resource_id, NLTK_DATA_DIR):
+                    print(f"NLTK '{resource_id}' downloaded successfully.")
+                else:
+                    print(f"NLTK '{resource_id}' could not be downloaded.")
+                    all_found = False
+
+        # A failed download is retried on the next call rather than remembered as verified
+        if all_found:
+            _write_marker()
+            _verified = True
+
+def _read_marker():
     try:
-        _create_unverified_https_context = ssl._create_unverified_context
-    except AttributeError:
-        pass
-    else:
-        ssl._create_default_https_context = _create_unverified_https_context
-
-    # --- Resource Verification and Download ---
-    resources = {
-        "punkt_tab": "tokenizers/punkt_tab",
-        "stopwords": "corpora/stopwords"
-    }
-
-    for resource_id, resource_path in resources.items():
-        try:
-            nltk.data.find(resource_path)
-            print(f"NLTK '{resource_id}' resource found at {nltk.data.find(resource_path)}.")
-        except LookupError:
-            print(f"NLTK '{resource_id}' resource not found. Downloading to {download_dir}...")
-            nltk.download(resource_id, download_dir=download_dir)
-            print(f"NLTK '{resource_id}' downloaded successfully.")
+        with open(MARKER_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_marker():
+    try:
+        with open(MARKER_FILE, 'w', encoding='utf-8') as f:
+            json.dump(sorted(RESOURCES), f)
+    except OSError as e:
+        print(f"Warning: could not write NLTK marker file {MARKER_FILE}: {e}")
+
+@lru_cache(maxsize=None)
+def english_stopwords():
+    """Return the NLTK English stopword list as a frozenset, loading the corpus once per process."""
+    ensure_nltk_resources()
+    import nltk
+    return frozenset(nltk.corpus.stopwords.words('english'))
@@ -1,16 +1,11 @@
-import markdownify
-import yaml
 from datetime import datetime
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
-from collections import defaultdict
-from bs4 import BeautifulSoup
-from rake_nltk import Rake
 import re
-from .nltk_setup import ensure_nltk_resources
+from .keywords import get_keyword_extractor
+from .nlp_cache import get_nlp_cache
 
-ensure_nltk_resources()
+# NLTK, NumPy/SciPy, markdownify and yaml are imported on first use rather than at module
+# import, so importing the web app or the CLI stays cheap; NLTK resources are verified
+# lazily by the summarizer and keyword extractor.
 
 def _clean_text(text):
     # Remove URLs
@@ -23,48 +18,80 @@ def _clean_text(text):
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-def _generate_summary(text, num_sentences=1):
+def _generate_summary(text, num_sentences=1, engine=None):
     if not text:
         return ""
-
-    # Tokenize sentences
-    sentences = sent_tokenize(text)
-    if len(sentences) <= num_sentences:
-        return " ".join(sentences) # Return all sentences if fewer than num_sentences
-
-    # Tokenize words and remove stopwords
-    words = word_tokenize(text.lower())
-    stop_words = set(stopwords.words('english'))
-    filtered_words = [word for word in words if word.isalnum() and word not in stop_words]
-
-    # Calculate word frequencies
-    word_freq = defaultdict(int)
-    for word in filtered_words:
-        word_freq[word] += 1
-
-    # Score sentences based on word frequencies
-    sentence_scores = defaultdict(int)
-    for i, sentence in enumerate(sentences):
-        for word in word_tokenize(sentence.lower()):
-            if word in word_freq:
-                sentence_scores[i] += word_freq[word]
-
-    # Get top sentences
-    ranked_sentences = sorted(sentence_scores.items(), key=lambda x: x[1], reverse=True)
-    summary_sentences_indices = sorted([idx for idx, _ in ranked_sentences[:num_sentences]])
-
-    summary = " ".join([sentences[idx] for idx in summary_sentences_indices])
-    return summary
+    from .summarizers import get_summarizer
+    summarizer = get_summarizer(engine)
+    return get_nlp_cache().memoize(
+        'summary', text, {'engine': summarizer.name, 'num_sentences': num_sentences},
+        lambda: summarizer.summarize(text, num_sentences),
+    )
 
 def _extract_keywords(text, num_keywords=3):
     if not text:
         return []
-    r = Rake(stopwords=nltk.corpus.stopwords.words('english'))
-    r.extract_keywords_from_text(text)
-    ranked_phrases = r.get_ranked_phrases()
-    return ranked_phrases[:num_keywords]
+    return get_nlp_cache().memoize(
+        'keywords', text, {'engine': 'rake', 'num_keywords': num_keywords},
+        lambda: get_keyword_extractor().extract_keywords(text, num_keywords),
+    )
+
+# Tags whose text is kept when reducing article HTML to plain text
+CONTENT_TAGS = ('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li')
+
+def extract_plain_text(html):
+    """
+    Reduce article HTML to the text of its paragraphs, headings and list items.
+
+    Parses once with lxml's C parser and walks the tree once, so text comes out in document
+    order; an element nested in another content element (a <p> inside an <li>) contributes
+    its text once, through the outer element.
+
+    Returns:
+        str: The texts joined with spaces, or an empty string if there is none.
+    """
+    if not html or not html.strip():
+        return ""
+    import lxml.html
+    from lxml import etree
+    try:
+        try:
+            root = lxml.html.fromstring(html)
+        except ValueError:
+            # lxml refuses str input that carries an XML encoding declaration
+            root = lxml.html.fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        return ""
+    extracted_texts = []
+    for element in root.iter(*CONTENT_TAGS):
+        if next(element.iterancestors(*CONTENT_TAGS), None) is None:
+            extracted_texts.append(element.text_content())
+    return " ".join(extracted_texts)
+
+def suggest_purpose_and_tags(raw_content, content_type):
+    """
+    Suggest a purpose statement and tags for content that is about to be submitted.
+
+    HTML from web articles is reduced to its text first; transcripts and direct text are used as is.
+
+    Returns:
+        tuple: (purpose, tags) where tags is a comma-separated string; both are empty if no text was found.
+    """
+    plain_text_content = extract_plain_text(raw_content) if content_type == "web-article" else raw_content
+    if not plain_text_content:
+        return "", ""
+    plain_text_content = _clean_text(plain_text_content)
+    # Generate summary (purpose) and keywords (tags)
+    auto_purpose = _generate_summary(plain_text_content)
+    if auto_purpose:
+        auto_purpose = "Relevant for AI coding: " + auto_purpose
+    auto_tags = ', '.join(_extract_keywords(plain_text_content))
+    return auto_purpose, auto_tags
+
+def process_content_to_markdown(raw_content, content_type, source_url, title, tags, purpose, summary_engine=None):
+    import markdownify
+    import yaml
 
-def process_content_to_markdown(raw_content, content_type, source_url, title, tags, purpose):
     markdown_body = ""
     text_for_processing = "" # Use a consistent variable name for text used in summarization/keyword extraction
 
@@ -79,7 +106,7 @@ def process_content_to_markdown(raw_content, content_type, source_url, title, ta
         text_for_processing = _clean_text(raw_content)
 
     # Generate summary
-    summary = _generate_summary(text_for_processing)
+    summary = _generate_summary(text_for_processing, engine=summary_engine)
 
     # Extract keywords
     extracted_keywords = _extract_keywords(text_for_processing)
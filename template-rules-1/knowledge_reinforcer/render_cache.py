@@ -0,0 +1,82 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from .storage import read_markdown_file
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('KR_RENDER_CACHE_SIZE', 256))
+
+
+def file_validators(stat):
+    """
+    Build HTTP validators for a knowledge base item from its stat result.
+
+    Returns:
+        tuple: (etag, last_modified). The ETag changes whenever the file's mtime or size does;
+               last_modified is a UTC datetime truncated to whole seconds, as HTTP dates are.
+    """
+    last_modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc).replace(microsecond=0)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}", last_modified
+
+
+class RenderCache:
+    """
+    LRU cache of knowledge base items rendered to HTML, for /view.
+
+    Entries are keyed by (path, mtime, size), so an item that changes on disk is rendered
+    again on its next view and the stale entry simply ages out of the LRU.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path, stat):
+        """
+        Return the rendered item at `file_path`, rendering it on a cache miss.
+
+        Returns:
+            tuple: (metadata, html_content).
+        """
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        rendered = self._render(file_path)
+        with self._lock:
+            self._entries[key] = rendered
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+    @staticmethod
+    def _render(file_path):
+        import markdown
+        metadata, markdown_body = read_markdown_file(file_path)
+        return metadata, markdown.markdown(markdown_body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """Return the process-wide RenderCache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache()
+        return _cache
@@ -0,0 +1,259 @@
+import os
+import re
+import sqlite3
+import threading
+
+from .storage import read_markdown_file, is_item_file, item_stem
+
+# FTS5 database in the knowledge base root; not an item file, so scans of the items skip it
+INDEX_FILENAME = '.kb_search.sqlite3'
+# Compared with PRAGMA user_version on open; any other value drops the tables so every file is reindexed
+SCHEMA_VERSION = 1
+# Files indexed per transaction by `rebuild`, bounding how much of the corpus is held in memory
+REBUILD_BATCH_SIZE = 200
+
+# BM25 column weights, in table column order: title, summary, keywords, tags, body
+COLUMN_WEIGHTS = (10.0, 5.0, 5.0, 5.0, 1.0)
+SNIPPET_TOKENS = 16
+
+_TERM_RE = re.compile(r"\w+\*?")
+
+
+def _to_fts_query(query):
+    """
+    Turn free text into an FTS5 query that matches documents containing every term.
+
+    Each term is quoted, so FTS5 operators and punctuation in user input can never cause a
+    syntax error; a trailing '*' on a term is kept as a prefix search.
+
+    Returns:
+        str: The FTS5 query, or an empty string if `query` contains no terms.
+    """
+    terms = []
+    for term in _TERM_RE.findall(query or ''):
+        if term.endswith('*'):
+            terms.append(f'"{term[:-1]}"*')
+        else:
+            terms.append(f'"{term}"')
+    return ' '.join(terms)
+
+
+def _as_text(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(item) for item in value)
+    return str(value) if value else ''
+
+
+class SearchIndex:
+    """
+    Full-text index (SQLite FTS5, BM25 ranking) over every markdown item in a knowledge base directory.
+
+    Indexes the title, summary, extracted keywords and user tags from the front matter plus the
+    markdown body. Like MetadataIndex, it is kept current by `index_file` on save and by
+    `reconcile`, which only re-reads files whose size or mtime changed.
+    """
+
+    def __init__(self, base_dir, db_path=None):
+        self.base_dir = base_dir
+        self.db_path = db_path or os.path.join(base_dir, INDEX_FILENAME)
+        os.makedirs(base_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS documents")
+            self._conn.execute("DROP TABLE IF EXISTS documents_fts")
+        # Size and mtime of every indexed file, for incremental reconciliation. `id` is also the
+        # rowid of the file's full-text row, so updates and deletes never scan the FTS table.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+            " title, summary, keywords, tags, body, tokenize='porter unicode61')"
+        )
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+
+    def _relative_path(self, file_path):
+        return os.path.relpath(file_path, self.base_dir).replace(os.sep, '/')
+
+    def _document_for_file(self, file_path, stat):
+        metadata, body = read_markdown_file(file_path)
+        relative_path = self._relative_path(file_path)
+        return (
+            relative_path,
+            stat.st_size,
+            stat.st_mtime_ns,
+            (
+                str(metadata.get('title') or item_stem(file_path)),
+                _as_text(metadata.get('summary')),
+                _as_text(metadata.get('extracted_keywords')),
+                _as_text(metadata.get('user_tags')),
+                body,
+            ),
+        )
+
+    def _write_documents(self, documents):
+        for path, size, mtime_ns, fields in documents:
+            row = self._conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+            if row:
+                document_id = row['id']
+                self._conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (document_id,))
+                self._conn.execute(
+                    "UPDATE documents SET size = ?, mtime_ns = ? WHERE id = ?", (size, mtime_ns, document_id)
+                )
+            else:
+                document_id = self._conn.execute(
+                    "INSERT INTO documents (path, size, mtime_ns) VALUES (?, ?, ?)", (path, size, mtime_ns)
+                ).lastrowid
+            self._conn.execute(
+                "INSERT INTO documents_fts (rowid, title, summary, keywords, tags, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (document_id, *fields),
+            )
+
+    def _delete_paths(self, paths):
+        for path in paths:
+            row = self._conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row['id'],))
+                self._conn.execute("DELETE FROM documents WHERE id = ?", (row['id'],))
+
+    def _markdown_files(self):
+        for root, _, files in os.walk(self.base_dir):
+            for file in files:
+                if is_item_file(file):
+                    yield os.path.join(root, file)
+
+    def index_file(self, file_path):
+        """Index (or re-index) a single markdown file."""
+        document = self._document_for_file(file_path, os.stat(file_path))
+        with self._lock:
+            self._write_documents([document])
+            self._conn.commit()
+
+    def remove(self, relative_path):
+        with self._lock:
+            self._delete_paths([relative_path])
+            self._conn.commit()
+
+    def reconcile(self):
+        """
+        Bring the index in line with the files on disk.
+
+        Only files whose size or mtime differ from the indexed values are read again;
+        entries for files that no longer exist are dropped.
+
+        Returns:
+            dict: Counts of 'updated' and 'removed' documents.
+        """
+        with self._lock:
+            known = {
+                row['path']: (row['size'], row['mtime_ns'])
+                for row in self._conn.execute("SELECT path, size, mtime_ns FROM documents")
+            }
+        updated = 0
+        batch = []
+        seen = set()
+        for file_path in self._markdown_files():
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            relative_path = self._relative_path(file_path)
+            seen.add(relative_path)
+            if known.get(relative_path) != (stat.st_size, stat.st_mtime_ns):
+                batch.append(self._document_for_file(file_path, stat))
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    updated += self._flush(batch)
+        updated += self._flush(batch)
+        removed = [path for path in known if path not in seen]
+        with self._lock:
+            self._delete_paths(removed)
+            self._conn.commit()
+        return {'updated': updated, 'removed': len(removed)}
+
+    def rebuild(self):
+        """
+        Drop the index and re-index every file, streaming the corpus in batches of REBUILD_BATCH_SIZE.
+
+        Returns:
+            int: The number of documents indexed.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM documents_fts")
+            self._conn.execute("DELETE FROM documents")
+            self._conn.commit()
+        indexed = 0
+        batch = []
+        for file_path in self._markdown_files():
+            try:
+                batch.append(self._document_for_file(file_path, os.stat(file_path)))
+            except FileNotFoundError:
+                continue
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                indexed += self._flush(batch)
+        indexed += self._flush(batch)
+        with self._lock:
+            self._conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+            self._conn.commit()
+        return indexed
+
+    def _flush(self, batch):
+        # Writes and clears `batch`, returning how many documents it held
+        count = len(batch)
+        if count:
+            with self._lock:
+                self._write_documents(batch)
+                self._conn.commit()
+            batch.clear()
+        return count
+
+    def search(self, query, limit=20, offset=0, highlight=('**', '**')):
+        """
+        Rank documents matching every term of `query` by BM25.
+
+        Args:
+            highlight (tuple): Strings placed before and after each matched term in snippets.
+
+        Returns:
+            list: Best matches first, as dicts with 'filename', 'title', 'snippet' and 'score'
+                  (higher is better). Empty if `query` contains no searchable terms.
+        """
+        fts_query = _to_fts_query(query)
+        if not fts_query:
+            return []
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        sql = (
+            f"SELECT documents.path, documents_fts.title,"
+            f" snippet(documents_fts, -1, ?, ?, '...', {SNIPPET_TOKENS}) AS snippet,"
+            f" bm25(documents_fts, {weights}) AS rank"
+            " FROM documents_fts JOIN documents ON documents.id = documents_fts.rowid"
+            " WHERE documents_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, (highlight[0], highlight[1], fts_query, limit, offset)).fetchall()
+        return [
+            {'filename': row['path'], 'title': row['title'], 'snippet': row['snippet'].strip(), 'score': -row['rank']}
+            for row in rows
+        ]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(base_dir):
+    """Return the shared SearchIndex of `base_dir`; it is reconciled when first opened in a process."""
+    base_dir = os.path.abspath(base_dir)
+    with _indexes_lock:
+        if base_dir not in _indexes:
+            index = SearchIndex(base_dir)
+            index.reconcile()
+            _indexes[base_dir] = index
+        return _indexes[base_dir]
@@ -1,24 +1,285 @@
+import gzip
+import hashlib
 import os
+import threading
+from collections import namedtuple
 
 BASE_KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'knowledge_base')
 
-def save_to_knowledge_base(filename, content, content_type):
-    target_dir = ""
-    if content_type == "web-article":
-        target_dir = os.path.join(BASE_KNOWLEDGE_DIR, 'articles')
-    elif content_type == "youtube-video":
-        target_dir = os.path.join(BASE_KNOWLEDGE_DIR, 'videos')
-    elif content_type == "direct-text":
-        target_dir = os.path.join(BASE_KNOWLEDGE_DIR, 'direct_text')
+# 'files' writes one timestamped file per save under a directory per content type;
+# 'content-addressed' stores each distinct body once under objects/, named by its hash
+STORAGE_MODES = ('files', 'content-addressed')
+STORAGE_MODE = os.environ.get('KR_STORAGE_MODE', 'files')
+OBJECTS_DIR = 'objects'
+
+# 'none' writes plain markdown (.md). 'gzip' and 'zstd' write .mdz items: the YAML front matter
+# as a plain-text header, then a line naming the codec, then the compressed markdown body.
+# zstd needs the optional 'zstandard' package and falls back to gzip without it.
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+COMPRESSION = os.environ.get('KR_STORAGE_COMPRESSION', 'none')
+MARKDOWN_EXTENSION = '.md'
+COMPRESSED_EXTENSION = '.mdz'
+ITEM_EXTENSIONS = (MARKDOWN_EXTENSION, COMPRESSED_EXTENSION)
+
+# path: where the item is stored; duplicate: True if identical content was already stored there
+SaveResult = namedtuple('SaveResult', ['path', 'duplicate'])
+
+def is_item_file(filename):
+    """True for knowledge base items in any on-disk format."""
+    return filename.endswith(ITEM_EXTENSIONS)
+
+def item_stem(filename):
+    """Return the base name of an item file without its item extension."""
+    name = os.path.basename(filename)
+    for extension in ITEM_EXTENSIONS:
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+def _is_delimiter(line):
+    return line.rstrip(b'\r\n') == b'---'
+
+def _read_header(f):
+    # Reads the front matter lines from a binary file positioned at its start. Returns the raw
+    # YAML text (None without front matter); leaves `f` positioned just after the header.
+    first = f.readline()
+    if not _is_delimiter(first):
+        f.seek(0)
+        return None
+    lines = []
+    for line in f:
+        if _is_delimiter(line):
+            return b''.join(lines).decode('utf-8')
+        lines.append(line)
+    f.seek(0)
+    return None # Unterminated front matter
+
+def _parse_front_matter(front_matter, file_path):
+    import yaml
+    try:
+        metadata = yaml.safe_load(front_matter)
+    except yaml.YAMLError as e:
+        print(f"Error parsing YAML in {file_path}: {e}")
+        return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+def _compress(body, compression):
+    if compression == 'zstd':
+        zstandard = _zstandard()
+        if zstandard is not None:
+            return 'zstd', zstandard.ZstdCompressor(level=10).compress(body)
+        print("Warning: the 'zstandard' package is not installed; compressing with gzip instead.")
+    return 'gzip', gzip.compress(body, mtime=0)
+
+def _decompress(codec, data):
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    if codec == 'zstd':
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise ValueError("reading zstd-compressed items requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"unknown compression codec '{codec}'")
+
+def encode_item(content, compression):
+    """
+    Encode markdown content (front matter plus body) in the on-disk format for `compression`.
+
+    Returns:
+        bytes: The file contents.
+    """
+    if compression == 'none':
+        return content.encode('utf-8')
+    front_matter, markdown_body = split_front_matter(content)
+    codec, compressed = _compress(markdown_body.encode('utf-8'), compression)
+    header = f"---\n{front_matter or ''}---\n{codec}\n"
+    return header.encode('utf-8') + compressed
+
+def read_front_matter(file_path):
+    """
+    Read only the YAML front matter of a knowledge base item, in either on-disk format.
+
+    Stops at the closing '---' line, so the markdown body is never read (or decompressed).
+
+    Returns:
+        dict: The parsed metadata, or an empty dict if the file has no (valid) front matter.
+    """
+    with open(file_path, 'rb') as f:
+        front_matter = _read_header(f)
+    if front_matter is None:
+        return {}
+    return _parse_front_matter(front_matter, file_path)
+
+def read_markdown_file(file_path):
+    """
+    Read a knowledge base item and split it into front matter and body, decompressing .mdz items.
+
+    Returns:
+        tuple: (metadata, markdown_body). metadata is an empty dict if the file has no (valid) front matter.
+    """
+    with open(file_path, 'rb') as f:
+        front_matter = _read_header(f)
+        if file_path.endswith(COMPRESSED_EXTENSION):
+            codec = f.readline().strip().decode('ascii', 'replace')
+            try:
+                markdown_body = _decompress(codec, f.read()).decode('utf-8')
+            except (OSError, EOFError, ValueError) as e:
+                print(f"Error reading compressed item {file_path}: {e}")
+                markdown_body = ""
+        else:
+            markdown_body = f.read().decode('utf-8')
+    if front_matter is None:
+        return {}, markdown_body
+    return _parse_front_matter(front_matter, file_path), markdown_body
+
+def write_atomically(file_path, data):
+    """
+    Write `data` (bytes) to `file_path` so that readers see either the old file or the complete new one.
+
+    The data goes to a temporary file in the same directory, is fsynced, and is renamed over
+    `file_path`; a crash at any point leaves no truncated item behind.
+    """
+    directory = os.path.dirname(file_path)
+    # Leading dot and no item extension, so indexers never pick up a leftover temp file
+    temp_path = os.path.join(directory, f".{os.path.basename(file_path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if os.name == 'nt':
+        return  # Directories cannot be opened or fsynced on Windows
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def split_front_matter(content):
+    """
+    Split markdown content into its raw YAML front matter and body.
+
+    Returns:
+        tuple: (front_matter, markdown_body). front_matter is None if the content has none.
+    """
+    parts = content.split('---\n', 2)
+    if len(parts) > 2 and parts[0] == '':
+        return parts[1], parts[2]
+    return None, content
+
+def content_hash(content):
+    """
+    Hash the markdown body of `content`, ignoring the front matter and whitespace differences.
+
+    The front matter carries per-save values such as date_extracted, so it is left out to let
+    re-submissions of the same article hash identically.
+
+    Returns:
+        str: The SHA-256 hex digest.
+    """
+    from .nlp_cache import normalize_text
+    _, markdown_body = split_front_matter(content)
+    return hashlib.sha256(normalize_text(markdown_body).encode('utf-8')).hexdigest()
+
+def object_path(base_dir, digest, extension=MARKDOWN_EXTENSION):
+    """Path of the content-addressed item with hash `digest`, sharded by its first two bytes."""
+    return os.path.join(base_dir, OBJECTS_DIR, digest[:2], digest[2:4], f"{digest}{extension}")
+
+def reconcile_indexes():
+    """
+    Open the metadata and search indexes of the knowledge base, reconciling them with the files.
+
+    Call once at startup so that the first browse, search, save or duplicate lookup does not
+    pay for the directory walk; later calls are cheap.
+    """
+    from .metadata_index import get_metadata_index
+    from .search_index import get_search_index
+    get_metadata_index(BASE_KNOWLEDGE_DIR)
+    get_search_index(BASE_KNOWLEDGE_DIR)
+
+def find_saved_source(source_url, mode=None):
+    """
+    Look up an item already saved from `source_url`, so it does not have to be fetched again.
+
+    Only the 'content-addressed' mode treats a URL as saved once; in 'files' mode every
+    submission is fetched and stored anew, so updated pages can be ingested again.
+
+    Returns:
+        SaveResult or None: The newest item saved from `source_url` (marked duplicate), or None.
+    """
+    if (mode or STORAGE_MODE) != 'content-addressed':
+        return None
+    from .metadata_index import get_metadata_index
+    for item in get_metadata_index(BASE_KNOWLEDGE_DIR).find_by_source_url(source_url):
+        path = os.path.join(BASE_KNOWLEDGE_DIR, item['filename'])
+        if os.path.exists(path):
+            return SaveResult(path, True)
+    return None
+
+def save_to_knowledge_base(filename, content, content_type, mode=None, compression=None):
+    """
+    Save a markdown item to the knowledge base and update the metadata and search indexes.
+
+    In 'content-addressed' mode `filename` is ignored: the item is stored under its content
+    hash, and saving content that is already stored is a single existence check that returns
+    the existing item without writing anything. With compression other than 'none' the item
+    is written as a .mdz file instead of .md. Items are always written atomically.
+
+    Returns:
+        SaveResult or None: Where the item is stored, or None if it could not be written.
+    """
+    mode = mode or STORAGE_MODE
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode '{mode}'. Available: {', '.join(STORAGE_MODES)}")
+    compression = compression or COMPRESSION
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}'. Available: {', '.join(COMPRESSIONS)}")
+    extension = MARKDOWN_EXTENSION if compression == 'none' else COMPRESSED_EXTENSION
+
+    if mode == 'content-addressed':
+        digest = content_hash(content)
+        # The same content may have been stored in the other format before
+        for existing_extension in ITEM_EXTENSIONS:
+            existing_path = object_path(BASE_KNOWLEDGE_DIR, digest, existing_extension)
+            if os.path.exists(existing_path):
+                print(f"Duplicate content, already stored as: {existing_path}")
+                return SaveResult(existing_path, True)
+        file_path = object_path(BASE_KNOWLEDGE_DIR, digest, extension)
+        target_dir = os.path.dirname(file_path)
     else:
-        target_dir = BASE_KNOWLEDGE_DIR # Fallback
+        if content_type == "web-article":
+            target_dir = os.path.join(BASE_KNOWLEDGE_DIR, 'articles')
+        elif content_type == "youtube-video":
+            target_dir = os.path.join(BASE_KNOWLEDGE_DIR, 'videos')
+        elif content_type == "direct-text":
+            target_dir = os.path.join(BASE_KNOWLEDGE_DIR, 'direct_text')
+        else:
+            target_dir = BASE_KNOWLEDGE_DIR # Fallback
+        file_path = os.path.join(target_dir, item_stem(filename) + extension)
 
     os.makedirs(target_dir, exist_ok=True)
-    file_path = os.path.join(target_dir, filename)
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_atomically(file_path, encode_item(content, compression))
         print(f"Saved: {file_path}")
-    except IOError as e:
+    except OSError as e:
         print(f"Error saving file {file_path}: {e}")
+        return None
 
+    # Keep the /browse metadata index and the search index current without a directory walk
+    from .metadata_index import get_metadata_index
+    from .search_index import get_search_index
+    get_metadata_index(BASE_KNOWLEDGE_DIR).upsert_file(file_path)
+    get_search_index(BASE_KNOWLEDGE_DIR).index_file(file_path)
+    return SaveResult(file_path, False)
@@ -0,0 +1,172 @@
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+from scipy import sparse
+from nltk.tokenize import word_tokenize, sent_tokenize
+from .nltk_setup import ensure_nltk_resources, english_stopwords
+
+# Engine used when a caller does not ask for one explicitly
+DEFAULT_SUMMARIZER = os.environ.get('KR_SUMMARIZER', 'frequency')
+
+
+def sentence_term_matrix(sentences):
+    """
+    Tokenize each sentence exactly once and count its non-stopword terms.
+
+    Returns:
+        scipy.sparse.csr_matrix: A (sentences x vocabulary) matrix of term counts.
+    """
+    stop_words = english_stopwords()
+    vocabulary = {}
+    rows = []
+    cols = []
+    for i, sentence in enumerate(sentences):
+        for word in word_tokenize(sentence.lower(), preserve_line=True):
+            if word.isalnum() and word not in stop_words:
+                cols.append(vocabulary.setdefault(word, len(vocabulary)))
+                rows.append(i)
+    data = np.ones(len(cols), dtype=np.float64)
+    # Duplicate (row, col) pairs are summed, giving per-sentence term counts
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(sentences), len(vocabulary)))
+
+
+class Summarizer(ABC):
+    """
+    Base class for extractive summarizers.
+
+    Subclasses implement `score_sentences`, mapping a sentence-term count matrix to one
+    score per sentence. `summarize` picks the `num_sentences` best-scoring sentences
+    (ties in document order, non-positive scores never picked) and returns them in
+    document order.
+    """
+
+    name = None
+
+    @abstractmethod
+    def score_sentences(self, term_counts):
+        """
+        Score every sentence of a document.
+
+        Returns:
+            numpy.ndarray: One score per row of `term_counts`; higher is more summary-worthy.
+        """
+
+    def summarize(self, text, num_sentences=1):
+        if not text:
+            return ""
+
+        ensure_nltk_resources()
+        sentences = sent_tokenize(text)
+        if len(sentences) <= num_sentences:
+            return " ".join(sentences) # Return all sentences if fewer than num_sentences
+
+        term_counts = sentence_term_matrix(sentences)
+        if term_counts.nnz == 0:
+            return ""
+
+        sentence_scores = self.score_sentences(term_counts)
+        candidates = np.flatnonzero(sentence_scores > 0)
+        ranked = candidates[np.argsort(-sentence_scores[candidates], kind='stable')]
+        summary_sentences_indices = np.sort(ranked[:num_sentences])
+        return " ".join([sentences[idx] for idx in summary_sentences_indices])
+
+
+class FrequencySummarizer(Summarizer):
+    """Scores a sentence by the summed document-wide frequency of its words."""
+
+    name = 'frequency'
+
+    def score_sentences(self, term_counts):
+        word_freq = np.asarray(term_counts.sum(axis=0)).ravel()
+        return term_counts @ word_freq
+
+
+class TextRankSummarizer(Summarizer):
+    """
+    TextRank over a sparse cosine-similarity graph of sentences.
+
+    Documents of up to `window_size` sentences use the full similarity graph. Longer ones
+    only link sentences at most `window_size` positions apart, so building the graph costs
+    O(sentences * window_size) instead of O(sentences ** 2). Scores are computed with
+    damped power iteration until the L1 change drops below `tol`.
+    """
+
+    name = 'textrank'
+
+    def __init__(self, damping=0.85, tol=1e-6, max_iter=100, window_size=200):
+        self.damping = damping
+        self.tol = tol
+        self.max_iter = max_iter
+        self.window_size = window_size
+
+    def similarity_graph(self, term_counts):
+        norms = np.sqrt(np.asarray(term_counts.multiply(term_counts).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        vectors = sparse.diags(1.0 / norms) @ term_counts
+        n = vectors.shape[0]
+
+        if n <= self.window_size:
+            graph = (vectors @ vectors.T).tocsr()
+            graph.setdiag(0)
+            graph.eliminate_zeros()
+            return graph
+
+        rows = []
+        cols = []
+        weights = []
+        for offset in range(1, self.window_size + 1):
+            similarities = np.asarray(vectors[:-offset].multiply(vectors[offset:]).sum(axis=1)).ravel()
+            linked = np.flatnonzero(similarities)
+            rows.append(linked)
+            cols.append(linked + offset)
+            weights.append(similarities[linked])
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        weights = np.concatenate(weights)
+        # Similarity is symmetric, so add each band edge in both directions
+        return sparse.csr_matrix(
+            (np.concatenate([weights, weights]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+            shape=(n, n),
+        )
+
+    def score_sentences(self, term_counts):
+        graph = self.similarity_graph(term_counts)
+        n = graph.shape[0]
+        out_weight = np.asarray(graph.sum(axis=1)).ravel()
+        dangling = out_weight == 0
+        out_weight[dangling] = 1.0
+        # Column-stochastic transition matrix: transition[j, i] = P(i -> j)
+        transition = (sparse.diags(1.0 / out_weight) @ graph).T.tocsr()
+
+        scores = np.full(n, 1.0 / n)
+        for _ in range(self.max_iter):
+            dangling_mass = scores[dangling].sum() / n
+            updated = (1 - self.damping) / n + self.damping * (transition @ scores + dangling_mass)
+            converged = np.abs(updated - scores).sum() < self.tol
+            scores = updated
+            if converged:
+                break
+        return scores
+
+
+SUMMARIZERS = {
+    FrequencySummarizer.name: FrequencySummarizer,
+    TextRankSummarizer.name: TextRankSummarizer,
+}
+
+_instances = {}
+
+
+def get_summarizer(name=None):
+    """
+    Return the summarizer registered under `name` (or DEFAULT_SUMMARIZER), reusing one instance per engine.
+
+    Raises:
+        ValueError: If no summarizer is registered under that name.
+    """
+    name = name or DEFAULT_SUMMARIZER
+    if name not in SUMMARIZERS:
+        raise ValueError(f"Unknown summarizer '{name}'. Available: {', '.join(sorted(SUMMARIZERS))}")
+    if name not in _instances:
+        _instances[name] = SUMMARIZERS[name]()
+    return _instances[name]
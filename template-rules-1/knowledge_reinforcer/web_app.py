@@ -1,38 +1,62 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, make_response
+from werkzeug.http import is_resource_modified
+from markupsafe import escape, Markup
 from datetime import datetime
-from bs4 import BeautifulSoup
 import os
 import sys
-import yaml
 import re
+import threading
 
 # Add the parent directory to the sys.path to allow relative imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from knowledge_reinforcer.fetcher import fetch_content
-from knowledge_reinforcer.processor import process_content_to_markdown
-from knowledge_reinforcer.storage import save_to_knowledge_base, BASE_KNOWLEDGE_DIR
+from knowledge_reinforcer.processor import process_content_to_markdown, suggest_purpose_and_tags
+from knowledge_reinforcer.nlp_pool import NlpTaskTimeout, get_nlp_pool, run_nlp_task, DEFAULT_WORKERS, DEFAULT_TASK_TIMEOUT
+from knowledge_reinforcer.storage import save_to_knowledge_base, find_saved_source, reconcile_indexes, BASE_KNOWLEDGE_DIR
+from knowledge_reinforcer.render_cache import get_render_cache, file_validators
+from knowledge_reinforcer.metadata_index import get_metadata_index, DEFAULT_PAGE_SIZE
+from knowledge_reinforcer.search_index import get_search_index
+from knowledge_reinforcer.job_queue import JobQueue, JobWorkers, DEFAULT_WORKERS as DEFAULT_JOB_WORKERS, DEFAULT_DB_PATH as DEFAULT_JOB_DB
 
 app = Flask(__name__, template_folder='templates')
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'a_very_dev_default_secret_key_for_flask_app_kb_project_v2') # Unique default key
+# CPU-heavy processing runs on a process pool; set NLP_WORKERS to 0 to run it inline in the request thread
+app.config.setdefault('NLP_WORKERS', DEFAULT_WORKERS)
+app.config.setdefault('NLP_TASK_TIMEOUT', DEFAULT_TASK_TIMEOUT)
+# Submissions are queued and processed by JOB_WORKERS background threads; set it to 0 to process them in the request
+app.config.setdefault('JOB_WORKERS', DEFAULT_JOB_WORKERS)
+app.config.setdefault('JOB_DB', DEFAULT_JOB_DB)
+# Background workers start as soon as the app is created, so jobs recovered from a previous run are
+# processed under any WSGI server; KR_START_WORKERS=0 defers them to start_background_workers()
+START_WORKERS = os.environ.get('KR_START_WORKERS', '1') != '0'
+
+def _run_nlp(fn, *args):
+    return run_nlp_task(app.config['NLP_WORKERS'], app.config['NLP_TASK_TIMEOUT'], fn, *args)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/process_input', methods=['POST'])
-def process_input():
-    url = request.form.get('url')
-    text = request.form.get('text')
-    tags = request.form.get('tags', '')
-    purpose = request.form.get('purpose', '')
+def _ingest(url, text, tags, purpose, submitted_at, filename_suffix=""):
+    """
+    Fetch (for URLs), process and save one submission.
 
+    Used by /process_input directly and by the job workers. The title of direct text and the
+    filename depend only on the arguments, so running the same job twice overwrites one file.
+
+    Returns:
+        tuple: (http_status, message, saved). saved is the SaveResult on success, else None.
+    """
     content_type = None
     raw_content = None
     source_url = None
     title = "Untitled"
 
     if url:
+        existing = find_saved_source(url)
+        if existing is not None:
+            return 200, "This content is already in the knowledge base.", existing
         source_url = url
         if "youtube.com/watch" in url or "youtu.be/" in url:
             content_type = "youtube-video"
@@ -44,15 +68,19 @@ def process_input():
             title = fetched_title
         
         if not raw_content:
-            return f"Error: Could not fetch content from {url}.", 400
+            return 400, f"Error: Could not fetch content from {url}.", None
 
     elif text:
         content_type = "direct-text"
         raw_content = text
-        title = f"Direct Text - {datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        title = f"Direct Text - {submitted_at.strftime('%Y%m%d_%H%M%S')}"
 
-    if raw_content:
-        markdown_content = process_content_to_markdown(
+    if not raw_content:
+        return 400, "Error: No content provided.", None
+
+    try:
+        markdown_content = _run_nlp(
+            process_content_to_markdown,
             raw_content,
             content_type,
             source_url,
@@ -60,74 +88,187 @@ def process_input():
             tags.split(',') if tags else [],
             purpose
         )
-        if markdown_content:
-            filename_base = re.sub(r'[^a-zA-Z0-9_]', '', title.replace(' ', '_'))[:50] or "untitled"
-            filename = f"{filename_base}_{datetime.now().strftime('%Y%m%2d_%H%M%S')}.md"
-            save_to_knowledge_base(filename, markdown_content, content_type)
-            flash("Content saved successfully!", 'success')
-            return redirect(url_for('index'))
-        else:
-            return "Error: Could not process content to markdown.", 400
-    return "Error: No content provided.", 400
+    except NlpTaskTimeout:
+        return 504, "Error: Processing the content timed out.", None
+    if not markdown_content:
+        return 400, "Error: Could not process content to markdown.", None
+
+    filename_base = re.sub(r'[^a-zA-Z0-9_]', '', title.replace(' ', '_'))[:50] or "untitled"
+    filename = f"{filename_base}_{submitted_at.strftime('%Y%m%d_%H%M%S')}{filename_suffix}.md"
+    saved = save_to_knowledge_base(filename, markdown_content, content_type)
+    if saved is None:
+        return 500, "Error: Could not save content to the knowledge base.", None
+    if saved.duplicate:
+        return 200, "This content is already in the knowledge base.", saved
+    return 200, "Content saved successfully!", saved
+
+_job_queue = None
+_job_workers = None
+_jobs_lock = threading.Lock()
+
+def _process_job(job):
+    payload = job['payload']
+    status, message, saved = _ingest(
+        payload['url'], payload['text'], payload['tags'], payload['purpose'],
+        datetime.fromtimestamp(job['created_at']),
+        filename_suffix=f"_{job['id'][:8]}"
+    )
+    if saved is None:
+        raise RuntimeError(message.replace("Error: ", "", 1))
+    return {
+        'message': message,
+        'filename': os.path.relpath(saved.path, BASE_KNOWLEDGE_DIR).replace(os.sep, '/'),
+        'duplicate': saved.duplicate,
+    }
+
+def _get_job_queue():
+    """Return the job queue, opening it and starting JOB_WORKERS consumer threads if that has not happened yet."""
+    global _job_queue, _job_workers
+    with _jobs_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(app.config['JOB_DB'])
+            _job_workers = JobWorkers(_job_queue, _process_job, workers=app.config['JOB_WORKERS'])
+            _job_workers.start()
+        return _job_queue
+
+@app.route('/process_input', methods=['POST'])
+def process_input():
+    url = request.form.get('url')
+    text = request.form.get('text')
+    tags = request.form.get('tags', '')
+    purpose = request.form.get('purpose', '')
+
+    if not app.config['JOB_WORKERS']:
+        status, message, saved = _ingest(url, text, tags, purpose, datetime.now())
+        if saved is None:
+            return message, status
+        flash(message, 'info' if saved.duplicate else 'success')
+        return redirect(url_for('index'))
+
+    if not url and not text:
+        return "Error: No content provided.", 400
+    job_id = _get_job_queue().enqueue({'url': url, 'text': text, 'tags': tags, 'purpose': purpose})
+    _job_workers.notify()
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+    flash(f"Submission queued as job {job_id}.", 'success')
+    return redirect(url_for('index'))
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = _get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+    del job['payload']
+    return jsonify(job)
+
+# Query string parameters accepted by /browse and /api/browse
+BROWSE_FILTERS = ('tag', 'source_type', 'date_from', 'date_to')
+
+def _browse_page():
+    # Raises ValueError for bad sort, limit, date or cursor parameters
+    filters = {name: request.args.get(name) or None for name in BROWSE_FILTERS}
+    return get_metadata_index(BASE_KNOWLEDGE_DIR).query_items(
+        sort=request.args.get('sort', 'date'),
+        descending=request.args.get('order', 'desc') != 'asc',
+        limit=request.args.get('limit', DEFAULT_PAGE_SIZE),
+        cursor=request.args.get('cursor') or None,
+        **filters
+    )
 
 @app.route('/browse')
 def browse():
+    # Served one page at a time from the metadata index; markdown files are never read here
+    try:
+        items, next_cursor = _browse_page()
+    except ValueError as e:
+        return f"Error: {e}", 400
+
     knowledge_items = []
-    for root, _, files in os.walk(BASE_KNOWLEDGE_DIR):
-        for file in files:
-            if file.endswith('.md'):
-                file_path = os.path.join(root, file)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                metadata = {}
-                parts = content.split('---\n', 2)
-                if len(parts) > 1:
-                    try:
-                        metadata = yaml.safe_load(parts[1])
-                    except yaml.YAMLError as e:
-                        print(f"Error parsing YAML in {file}: {e}")
-
-                title = metadata.get('title', file.replace('.md', ''))
-                date_extracted_str = metadata.get('date_extracted')
-                date_extracted = datetime.fromisoformat(date_extracted_str) if date_extracted_str else datetime.min
-
-                relative_path = os.path.relpath(file_path, BASE_KNOWLEDGE_DIR)
-                knowledge_items.append({
-                    'filename': relative_path,
-                    'title': title,
-                    'date': date_extracted
-                })
-    
-    # Sort by date, newest first
-    knowledge_items.sort(key=lambda x: x['date'], reverse=True)
-
-    return render_template('browse.html', items=knowledge_items)
+    for item in items:
+        knowledge_items.append({
+            'filename': item['filename'],
+            'title': item['title'],
+            'date': datetime.fromisoformat(item['date']) if item['date'] else datetime.min
+        })
+
+    next_url = None
+    if next_cursor:
+        next_url = url_for('browse', **{**request.args.to_dict(), 'cursor': next_cursor})
+    return render_template('browse.html', items=knowledge_items, next_url=next_url, args=request.args)
+
+@app.route('/api/browse')
+def browse_api():
+    try:
+        items, next_cursor = _browse_page()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': items, 'next_cursor': next_cursor})
+
+# Control characters never occur in indexed text, so they can mark matches before HTML escaping
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_END = '\x03'
+SEARCH_PAGE_SIZE = 20
+
+def _search_results():
+    query = request.args.get('q', '').strip()
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = max(1, min(int(request.args.get('limit', SEARCH_PAGE_SIZE)), 100))
+    except ValueError:
+        raise ValueError("offset and limit must be integers")
+    results = get_search_index(BASE_KNOWLEDGE_DIR).search(
+        query, limit=limit, offset=offset, highlight=(_HIGHLIGHT_START, _HIGHLIGHT_END)
+    )
+    return query, offset, limit, results
+
+def _highlight(snippet, start, end):
+    return str(escape(snippet)).replace(_HIGHLIGHT_START, start).replace(_HIGHLIGHT_END, end)
+
+@app.route('/search')
+def search():
+    try:
+        query, offset, limit, results = _search_results()
+    except ValueError as e:
+        return f"Error: {e}", 400
+    for result in results:
+        result['snippet'] = Markup(_highlight(result['snippet'], '<mark>', '</mark>'))
+
+    next_url = None
+    if len(results) == limit:
+        next_url = url_for('search', q=query, offset=offset + limit, limit=limit)
+    return render_template('search.html', query=query, results=results, next_url=next_url)
+
+@app.route('/api/search')
+def search_api():
+    try:
+        query, _, _, results = _search_results()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    for result in results:
+        result['snippet'] = _highlight(result['snippet'], '<mark>', '</mark>')
+    return jsonify({'query': query, 'results': results})
 
 @app.route('/view/<path:filename>')
 def view_file(filename):
     file_path = os.path.join(BASE_KNOWLEDGE_DIR, filename)
-    if not os.path.exists(file_path):
+    try:
+        stat = os.stat(file_path)
+    except (FileNotFoundError, NotADirectoryError):
         return "File not found", 404
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Separate YAML front matter from content
-    parts = content.split('---\n', 2)
-    if len(parts) > 2:
-        front_matter_str = parts[1]
-        markdown_body = parts[2]
-        metadata = yaml.safe_load(front_matter_str)
-    else:
-        markdown_body = content
-        metadata = {}
-
-    # Convert markdown body to HTML for display
-    import markdown # This will need to be installed
-    html_content = markdown.markdown(markdown_body)
 
-    return render_template('view.html', content=html_content, metadata=metadata, filename=filename)
+    # Answer revalidations from the file's stat alone, before reading or rendering anything
+    etag, last_modified = file_validators(stat)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = app.response_class(status=304)
+    else:
+        # Front matter split and markdown rendering are cached per (path, mtime, size)
+        metadata, html_content = get_render_cache().get(file_path, stat)
+        response = make_response(render_template('view.html', content=html_content, metadata=metadata, filename=filename))
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True # Browsers revalidate, and unchanged items cost a 304
+    return response
 
 @app.route('/analyze_content', methods=['POST'])
 def analyze_content():
@@ -135,45 +276,49 @@ def analyze_content():
     text = request.json.get('text')
 
     raw_content = None
-    plain_text_content = ""
+    content_type = None
 
     if url:
-        content_type = None
         if "youtube.com/watch" in url or "youtu.be/" in url:
             content_type = "youtube-video"
         else:
             content_type = "web-article"
-        
+
         raw_content, _ = fetch_content(url, content_type)
-        if raw_content:
-            if content_type == "web-article":
-                soup = BeautifulSoup(raw_content, 'html.parser')
-                # Extract text from common content tags
-                content_tags = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']
-                extracted_texts = []
-                for tag in content_tags:
-                    for element in soup.find_all(tag):
-                        extracted_texts.append(element.get_text())
-                plain_text_content = " ".join(extracted_texts)
-            elif content_type == "youtube-video":
-                plain_text_content = raw_content # Transcript is already plain text
     elif text:
-        plain_text_content = text
-
-    if plain_text_content:
-        from .processor import _clean_text
-        plain_text_content = _clean_text(plain_text_content)
-        # Generate summary (purpose) and keywords (tags)
-        from .processor import _generate_summary, _extract_keywords
-        auto_purpose = _generate_summary(plain_text_content)
-        if auto_purpose:
-            auto_purpose = "Relevant for AI coding: " + auto_purpose
-        auto_tags = ', '.join(_extract_keywords(plain_text_content))
+        content_type = "direct-text"
+        raw_content = text
+
+    if raw_content:
+        try:
+            auto_purpose, auto_tags = _run_nlp(suggest_purpose_and_tags, raw_content, content_type)
+        except NlpTaskTimeout:
+            return jsonify({'purpose': '', 'tags': '', 'error': 'Analysis timed out.'}), 504
         print(f"Generated Purpose: {auto_purpose}")
         print(f"Generated Tags: {auto_tags}")
         return jsonify({'purpose': auto_purpose, 'tags': auto_tags})
-    
+
     return jsonify({'purpose': '', 'tags': ''})
 
+def start_background_workers():
+    """Reconcile the indexes, warm the NLP pool and start the job workers, which resume any jobs left from a previous run."""
+    reconcile_indexes()
+    get_nlp_pool(app.config['NLP_WORKERS'], app.config['NLP_TASK_TIMEOUT'])
+    if app.config['JOB_WORKERS']:
+        _get_job_queue()
+
+def run_dev_server(port):
+    """
+    Run the debug server with its reloader.
+
+    The reloader keeps a parent process that only watches files and serves nothing, so the
+    background workers are started in the child that serves requests (WERKZEUG_RUN_MAIN set).
+    """
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
+    app.run(debug=True, port=port)
+
 if __name__ == '__main__':
-    app.run(debug=True, port=3000)
\ No newline at end of file
+    run_dev_server(3000)
+elif START_WORKERS:
+    start_background_workers()
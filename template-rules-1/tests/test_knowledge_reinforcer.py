@@ -4,19 +4,52 @@ import os
 from unittest.mock import Mock
 import requests # Added import
 import tempfile
+import time
+import json
+from concurrent.futures import ThreadPoolExecutor
 import shutil
 
 # Add the parent directory to the sys.path to allow imports from knowledge_reinforcer
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
-from knowledge_reinforcer.processor import _generate_summary, _extract_keywords
-from knowledge_reinforcer.fetcher import fetch_content
+# Tests configure the app before starting anything in the background
+os.environ['KR_START_WORKERS'] = '0'
+
+import knowledge_reinforcer.fetch_engine
+import knowledge_reinforcer.metadata_index
+import knowledge_reinforcer.storage
+from knowledge_reinforcer.processor import _generate_summary, _extract_keywords, extract_plain_text
+from knowledge_reinforcer.summarizers import TextRankSummarizer, get_summarizer
+from knowledge_reinforcer.keywords import KeywordExtractor
+from knowledge_reinforcer.nlp_cache import NlpCache
+from knowledge_reinforcer.nlp_pool import NlpPool, NlpTaskTimeout
+from knowledge_reinforcer.fetcher import fetch_content, fetch_source, SourceResult
+from knowledge_reinforcer.fetch_engine import FetchEngine
+from knowledge_reinforcer.http_cache import HttpCache
 from knowledge_reinforcer.web_app import app # Import the Flask app
-from knowledge_reinforcer.storage import BASE_KNOWLEDGE_DIR, save_to_knowledge_base
+from knowledge_reinforcer.storage import BASE_KNOWLEDGE_DIR, save_to_knowledge_base, SaveResult, content_hash, read_front_matter, read_markdown_file
+from knowledge_reinforcer.metadata_index import MetadataIndex
+from knowledge_reinforcer.search_index import SearchIndex
+from knowledge_reinforcer.render_cache import RenderCache
+from knowledge_reinforcer.job_queue import JobQueue
+import knowledge_reinforcer.web_app as web_app
+from knowledge_reinforcer import kb_utils
+from knowledge_reinforcer.main import _read_batch_urls, run_batch, run_search
+
+@pytest.fixture(autouse=True)
+def temp_http_cache(mocker, tmp_path):
+    # The default FetchEngine caches under the package directory; give each test its own engine and cache
+    mocker.patch('knowledge_reinforcer.fetch_engine.DEFAULT_CACHE_DIR', str(tmp_path / 'http_cache'))
+    mocker.patch('knowledge_reinforcer.fetch_engine._default_engine', None)
+    yield
+    engine = knowledge_reinforcer.fetch_engine._default_engine
+    if engine is not None:
+        engine.close()
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
+    app.config['NLP_WORKERS'] = 0 # Run processing inline so it can be mocked
+    app.config['JOB_WORKERS'] = 0 # Process submissions in the request unless a test enables the queue
     with app.test_client() as client:
         yield client
 
@@ -60,6 +93,30 @@ def test_generate_summary_fewer_sentences_than_requested():
     summary = _generate_summary(text, num_sentences=3)
     assert summary == "Only one sentence."
 
+def test_textrank_scores_the_most_connected_sentence_highest():
+    from scipy import sparse
+    # Sentence 1 shares a term with every other sentence; sentences 0, 2 and 3 share nothing with each other
+    term_counts = sparse.csr_matrix([
+        [1, 0, 0, 1, 0],
+        [1, 1, 1, 0, 0],
+        [0, 1, 0, 0, 0],
+        [0, 0, 1, 0, 1],
+    ], dtype=float)
+    scores = TextRankSummarizer().score_sentences(term_counts)
+    assert scores.argmax() == 1
+    assert abs(scores.sum() - 1.0) < 1e-6
+
+def test_textrank_windowed_graph_matches_full_graph_when_window_covers_document():
+    from scipy import sparse
+    term_counts = sparse.random(40, 60, density=0.1, format='csr', random_state=7)
+    full = TextRankSummarizer(window_size=40).score_sentences(term_counts)
+    windowed = TextRankSummarizer(window_size=39).score_sentences(term_counts)
+    assert abs(full - windowed).max() < 1e-6
+
+def test_get_summarizer_rejects_unknown_engine():
+    with pytest.raises(ValueError):
+        get_summarizer("does-not-exist")
+
 # Tests for _extract_keywords
 def test_extract_keywords_basic():
     text = "Python is a high-level, interpreted programming language. It is widely used for web development and data analysis."
@@ -78,25 +135,98 @@ def test_extract_keywords_fewer_than_requested():
     assert len(keywords) <= 5
     assert "simple text" in keywords
 
+def test_keyword_extractor_batch_ranks_phrases_per_text():
+    extractor = KeywordExtractor(stopwords={"is", "a", "for", "and", "it", "the"})
+    texts = [
+        "Python is a programming language. It is used for web development and data analysis.",
+        "Simple text.",
+        "Python is a programming language. It is used for web development and data analysis.",
+    ]
+    results = extractor.extract_keywords_batch(texts, 2)
+    assert results[0] == ["web development", "programming language"] # Ties break like rake_nltk: reverse alphabetical
+    assert results[1] == ["simple text"]
+    assert results[2] == results[0]
+
+def test_keyword_extractor_approximates_rake_nltk():
+    from rake_nltk import Rake
+    stopwords = {"a", "and", "are", "for", "in", "is", "of", "the", "to", "with"}
+    rake = Rake(stopwords=stopwords, sentence_tokenizer=lambda text: [text])
+    extractor = KeywordExtractor(stopwords=stopwords)
+
+    text = ("Keyword extraction is a core step in text mining. Rapid automatic keyword extraction "
+            "scores candidate phrases with word degree and frequency; the best phrases are kept for indexing, "
+            "search and summaries of long articles.")
+    rake.extract_keywords_from_text(text)
+    assert extractor.ranked_phrases(text) == rake.get_ranked_phrases_with_scores()
+
+    # Runs of punctuation split phrases here, while rake_nltk keeps them as part of the phrase
+    rake.extract_keywords_from_text("fast parsing... slow rendering")
+    assert rake.get_ranked_phrases() == ["fast parsing ... slow rendering"]
+    assert [phrase for _, phrase in extractor.ranked_phrases("fast parsing... slow rendering")] == ["slow rendering", "fast parsing"]
+
+def test_generate_summary_is_memoized_by_normalized_text(mocker):
+    summarizer = Mock()
+    summarizer.name = 'frequency'
+    summarizer.summarize.return_value = "Cached summary."
+    mocker.patch('knowledge_reinforcer.summarizers.get_summarizer', return_value=summarizer)
+    mocker.patch('knowledge_reinforcer.processor.get_nlp_cache', return_value=NlpCache(max_entries=8))
+
+    first = _generate_summary("An identical   article.\nSecond sentence.", num_sentences=1)
+    second = _generate_summary("An identical article. Second sentence.", num_sentences=1)
+    _generate_summary("An identical article. Second sentence.", num_sentences=2)
+
+    assert first == second == "Cached summary."
+    assert summarizer.summarize.call_count == 2 # Different parameters get their own entry
+
+def test_nlp_cache_persists_results_in_sqlite_tier(tmp_path):
+    db_path = str(tmp_path / "nlp_cache.sqlite3")
+    NlpCache(db_path=db_path).memoize('keywords', "some text", {'k': 3}, lambda: ["some text"])
+
+    fresh = NlpCache(db_path=db_path)
+    assert fresh.memoize('keywords', "some text", {'k': 3}, lambda: ["recomputed"]) == ["some text"]
+    assert fresh.hits == 1
+
+def test_nlp_cache_evicts_least_recently_used_entries():
+    cache = NlpCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+
+def test_nlp_cache_hits_return_copies_and_count_every_lookup():
+    cache = NlpCache()
+    keywords = cache.memoize('keywords', "text", {}, lambda: ["one", "two"])
+    keywords.append("mutated by caller")
+    assert cache.memoize('keywords', "text", {}, lambda: []) == ["one", "two"]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: cache.memoize('keywords', "text", {}, lambda: []), range(400)))
+    assert (cache.hits, cache.misses) == (401, 1)
+
 # Tests for fetch_content
 def test_fetch_content_web_article_success(mocker):
     mock_response = Mock()
-    mock_response.text = "<html><body><h1>Test Title</h1><p>Test content.</p></body></html>"
+    mock_response.iter_content.return_value = [b"<html><body><h1>Test Title</h1><p>Test content.</p></body></html>"]
     mock_response.raise_for_status.return_value = None
-    mocker.patch('requests.get', return_value=mock_response)
+    mock_response.status_code = 200
+    mock_response.headers = {'Content-Type': 'text/html; charset=utf-8'}
+    mock_response.encoding = 'utf-8'
+    mocker.patch('requests.Session.get', return_value=mock_response)
     
     # Mock the Document and its title method
     mock_document = Mock()
     mock_document.content.return_value = "Test content."
     mock_document.title.return_value = "Test Title"
-    mocker.patch('knowledge_reinforcer.fetcher.Document', return_value=mock_document)
+    mocker.patch('readability.Document', return_value=mock_document)
 
     content, title = fetch_content("http://example.com", "web-article")
     assert "Test content" in content
     assert title == "Test Title"
 
 def test_fetch_content_web_article_failure(mocker):
-    mocker.patch('requests.get', side_effect=requests.exceptions.RequestException)
+    mocker.patch('requests.Session.get', side_effect=requests.exceptions.RequestException)
 
     content, title = fetch_content("http://example.com", "web-article")
     assert content is None
@@ -105,9 +235,12 @@ def test_fetch_content_web_article_failure(mocker):
 def test_fetch_content_youtube_success(mocker):
     mocker.patch('youtube_transcript_api.YouTubeTranscriptApi.get_transcript', return_value=[{'text': 'video transcript'}])
     mock_response = Mock()
-    mock_response.text = "<html><body><title>YouTube Video Title</title></body></html>"
+    mock_response.iter_content.return_value = [b"<html><body><title>YouTube Video Title</title></body></html>"]
     mock_response.raise_for_status.return_value = None
-    mocker.patch('requests.get', return_value=mock_response)
+    mock_response.status_code = 200
+    mock_response.headers = {'Content-Type': 'text/html; charset=utf-8'}
+    mock_response.encoding = 'utf-8'
+    mocker.patch('requests.Session.get', return_value=mock_response)
 
     content, title = fetch_content("https://www.youtube.com/watch?v=test_id", "youtube-video")
     assert "video transcript" in content
@@ -125,6 +258,136 @@ def test_fetch_content_youtube_transcript_failure(mocker):
     assert content is None
     assert title is None
 
+def test_fetch_engine_fetch_many_yields_every_result(mocker):
+    def fake_get(self, url, timeout, headers=None, stream=False):
+        if url.endswith('/bad'):
+            raise requests.exceptions.ConnectionError("refused")
+        response = Mock()
+        response.status_code = 200
+        response.headers = {'Content-Type': 'text/html'}
+        response.encoding = 'utf-8'
+        response.iter_content.return_value = [f"<html>{url}</html>".encode('utf-8')]
+        response.raise_for_status.return_value = None
+        return response
+    mocker.patch('requests.Session.get', fake_get)
+
+    engine = FetchEngine(max_concurrency=4, per_host_concurrency=2, rate_per_host=1000, burst=10)
+    try:
+        results = {r.url: r for r in engine.fetch_many(["http://a.example/1", "http://a.example/bad", "http://b.example/2"])}
+    finally:
+        engine.close()
+
+    assert results["http://a.example/1"].status == 'ok'
+    assert results["http://b.example/2"].text == "<html>http://b.example/2</html>"
+    assert results["http://a.example/bad"].status == 'error'
+    assert "refused" in results["http://a.example/bad"].error
+
+def test_fetch_engine_revalidates_cached_body_with_conditional_get(mocker, tmp_path):
+    sent_headers = []
+    def fake_get(self, url, timeout, headers=None, stream=False):
+        sent_headers.append(headers or {})
+        response = Mock()
+        if headers and headers.get('If-None-Match') == '"v1"':
+            response.status_code = 304
+        else:
+            response.status_code = 200
+            response.iter_content.return_value = [b"<html>cached body</html>"]
+            response.headers = {'ETag': '"v1"', 'Content-Type': 'text/html'}
+            response.encoding = 'utf-8'
+            response.raise_for_status.return_value = None
+        return response
+    mocker.patch('requests.Session.get', fake_get)
+
+    engine = FetchEngine(rate_per_host=1000, cache=HttpCache(str(tmp_path)))
+    try:
+        first = engine.fetch("http://example.com/page")
+        second = engine.fetch("http://example.com/page")
+    finally:
+        engine.close()
+
+    assert not first.from_cache
+    assert sent_headers[1] == {'If-None-Match': '"v1"'}
+    assert second.from_cache
+    assert second.text == "<html>cached body</html>"
+
+def test_http_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=25)
+    cache.store("http://example.com/a", "a" * 10, etag='"a"')
+    cache.store("http://example.com/b", "b" * 10, etag='"b"')
+    cache.get("http://example.com/a") # Touch a so b becomes least recently used
+    cache.store("http://example.com/c", "c" * 10, etag='"c"')
+
+    assert cache.get("http://example.com/a") == "a" * 10
+    assert cache.validators("http://example.com/b") == {}
+    assert cache.get("http://example.com/c") == "c" * 10
+
+def _streaming_response(chunks, headers):
+    response = Mock()
+    response.status_code = 200
+    response.headers = headers
+    response.encoding = 'utf-8'
+    response.iter_content.return_value = chunks
+    response.raise_for_status.return_value = None
+    return response
+
+def test_fetch_engine_streams_multibyte_text_across_chunks(mocker):
+    body = "<p>caf\u00e9 \u2014 na\u00efve</p>".encode('utf-8')
+    chunks = [body[i:i + 3] for i in range(0, len(body), 3)] # Split inside multi-byte characters
+    mocker.patch('requests.Session.get', return_value=_streaming_response(chunks, {'Content-Type': 'text/html; charset=utf-8'}))
+    engine = FetchEngine(rate_per_host=1000)
+    try:
+        result = engine.fetch("http://example.com/page")
+    finally:
+        engine.close()
+    assert result.status == 'ok'
+    assert result.text == "<p>caf\u00e9 \u2014 na\u00efve</p>"
+
+def test_fetch_engine_aborts_bodies_over_the_size_ceiling(mocker):
+    mocker.patch('requests.Session.get', return_value=_streaming_response([b"<p>" + b"x" * 60, b"x" * 60], {'Content-Type': 'text/html'}))
+    engine = FetchEngine(rate_per_host=1000, max_bytes=100)
+    try:
+        result = engine.fetch("http://example.com/huge")
+    finally:
+        engine.close()
+    assert result.status == 'too_large'
+    assert result.text is None
+
+def test_fetch_source_rejects_non_html_bodies(mocker):
+    mocker.patch('requests.Session.get', return_value=_streaming_response([b"%PDF-1.7 ..."], {'Content-Type': 'text/html'}))
+    result = fetch_source("http://example.com/mislabeled.pdf", "web-article")
+    assert result.status == 'wrong_type'
+    assert result.content is None
+
+    mocker.patch('requests.Session.get', return_value=_streaming_response([b"..."], {'Content-Type': 'image/png'}))
+    result = fetch_source("http://example.com/image", "web-article")
+    assert result.status == 'wrong_type'
+
+def test_nlp_pool_runs_tasks_in_worker_processes_with_timeout():
+    import time
+    pool = NlpPool(workers=1, task_timeout=0.5)
+    try:
+        pool.warm() # Worker start-up and warm-up do not count against the task timeout
+        assert pool.run(os.getpid) != os.getpid()
+        with pytest.raises(NlpTaskTimeout):
+            pool.run(time.sleep, 1)
+    finally:
+        pool.shutdown()
+
+def test_nlp_pool_replaces_workers_stuck_on_a_timed_out_task():
+    import time
+    pool = NlpPool(workers=1, task_timeout=0.5)
+    try:
+        pool.warm()
+        stuck_pid = pool.run(os.getpid)
+        with pytest.raises(NlpTaskTimeout):
+            pool.run(time.sleep, 60)
+        assert pool.recycled == 1
+        pool.warm()
+        # The next task gets a fresh worker instead of queueing behind the stuck one
+        assert pool.run(os.getpid) != stuck_pid
+    finally:
+        pool.shutdown()
+
 # Tests for Flask web_app routes
 def test_index_route(client):
     response = client.get('/')
@@ -132,7 +395,7 @@ def test_index_route(client):
     assert b"Knowledge Reinforcer" in response.data
 
 def test_process_input_direct_text_success(client, mocker):
-    mocker.patch('knowledge_reinforcer.web_app.save_to_knowledge_base')
+    mocker.patch('knowledge_reinforcer.web_app.save_to_knowledge_base', return_value=SaveResult("saved.md", False))
     mocker.patch('knowledge_reinforcer.web_app.process_content_to_markdown', return_value="# Test Markdown")
     mocker.patch('knowledge_reinforcer.web_app.fetch_content', return_value=("raw content", "Test Title"))
 
@@ -146,8 +409,8 @@ def test_process_input_direct_text_success(client, mocker):
         assert '_flashes' in session
         assert session['_flashes'][0][1] == "Content saved successfully!"
 
-def test_process_input_url_success(client, mocker):
-    mocker.patch('knowledge_reinforcer.web_app.save_to_knowledge_base')
+def test_process_input_url_success(client, temp_knowledge_base, mocker):
+    mocker.patch('knowledge_reinforcer.web_app.save_to_knowledge_base', return_value=SaveResult("saved.md", False))
     mocker.patch('knowledge_reinforcer.web_app.process_content_to_markdown', return_value="# Test Markdown")
     mocker.patch('knowledge_reinforcer.web_app.fetch_content', return_value=("raw content", "Test Title"))
 
@@ -161,12 +424,32 @@ def test_process_input_url_success(client, mocker):
         assert '_flashes' in session
         assert session['_flashes'][0][1] == "Content saved successfully!"
 
+def test_process_input_returns_504_when_processing_times_out(client, mocker):
+    mocker.patch('knowledge_reinforcer.web_app.run_nlp_task', side_effect=NlpTaskTimeout)
+
+    response = client.post('/process_input', data={'text': 'Some text.'})
+    assert response.status_code == 504
+
+def test_extract_plain_text_keeps_document_order():
+    html = "<div><h1>Title</h1><p>First <b>bold</b> para.</p><ul><li>Item with <p>nested para</p></li></ul><span>skipped</span><h2>Next</h2></div>"
+    assert extract_plain_text(html) == "Title First bold para. Item with nested para Next"
+    assert extract_plain_text('<?xml version="1.0" encoding="utf-8"?><html><body><p>Declared</p></body></html>') == "Declared"
+    assert extract_plain_text("") == ""
+    assert extract_plain_text("<!-- only a comment -->") == ""
+    assert extract_plain_text('<?xml version="1.0" encoding="utf-8"?><!-- only a comment -->') == ""
+
+def test_analyze_content_runs_suggestions_through_nlp_stage(client, mocker):
+    mocker.patch('knowledge_reinforcer.web_app.suggest_purpose_and_tags', return_value=("Relevant for AI coding: X.", "x, y"))
+
+    response = client.post('/analyze_content', json={'text': 'Some text.'})
+    assert response.get_json() == {'purpose': "Relevant for AI coding: X.", 'tags': "x, y"}
+
 def test_process_input_no_content(client):
     response = client.post('/process_input', data={})
     assert response.status_code == 400
     assert b"Error: No content provided." in response.data
 
-def test_process_input_fetch_failure(client, mocker):
+def test_process_input_fetch_failure(client, temp_knowledge_base, mocker):
     mocker.patch('knowledge_reinforcer.web_app.fetch_content', return_value=(None, None))
 
     response = client.post('/process_input', data={
@@ -184,6 +467,196 @@ def test_browse_route(client, temp_knowledge_base):
     assert b"articles/test_article.md" in response.data
     assert b"direct_text/test_text.md" in response.data
 
+def test_browse_route_lists_items_saved_after_startup(client, temp_knowledge_base):
+    client.get('/browse') # Builds the index for this knowledge base
+    save_to_knowledge_base("saved_later.md", "---\ntitle: Saved Later\ndate_extracted: '2030-01-01T00:00:00'\n---\n\nBody.", "web-article")
+
+    response = client.get('/browse')
+    assert b"Saved Later" in response.data
+    assert response.data.index(b"Saved Later") < response.data.index(b"Test Article") # Newest first
+
+def test_metadata_index_reconciles_only_changed_files(temp_knowledge_base, mocker):
+    index = MetadataIndex(temp_knowledge_base)
+    assert index.reconcile() == {'updated': 2, 'removed': 0}
+
+    read_spy = mocker.spy(knowledge_reinforcer.metadata_index, 'read_front_matter')
+    os.remove(os.path.join(temp_knowledge_base, 'direct_text', 'test_text.md'))
+    with open(os.path.join(temp_knowledge_base, 'articles', 'test_article.md'), 'w') as f:
+        f.write("---\ntitle: Renamed Article\nuser_tags: [a, b]\n---\n\nNew body, different size.")
+
+    assert index.reconcile() == {'updated': 1, 'removed': 1}
+    assert read_spy.call_count == 1
+    items = index.list_items()
+    assert [item['title'] for item in items] == ["Renamed Article"]
+    assert items[0]['tags'] == ["a", "b"]
+
+def _write_items(base_dir, count):
+    for i in range(count):
+        with open(os.path.join(base_dir, 'articles', f'item_{i:02d}.md'), 'w') as f:
+            f.write(f"---\ntitle: Item {i:02d}\ndate_extracted: '2024-01-{i + 1:02d}T12:00:00'\n"
+                    f"source_type: {'youtube-video' if i % 2 else 'web-article'}\nuser_tags: [{'odd' if i % 2 else 'even'}]\n---\n\nBody.")
+
+def test_metadata_index_query_items_pages_with_cursor(temp_knowledge_base):
+    _write_items(temp_knowledge_base, 7)
+    index = MetadataIndex(temp_knowledge_base)
+    index.reconcile()
+
+    titles = []
+    cursor = None
+    while True:
+        items, cursor = index.query_items(source_type='web-article', limit=2, cursor=cursor)
+        titles.extend(item['title'] for item in items)
+        if cursor is None:
+            break
+    assert titles == ["Item 06", "Item 04", "Item 02", "Item 00"]
+
+    items, _ = index.query_items(tag='odd', date_from='2024-01-03', date_to='2024-01-06', sort='title', descending=False)
+    assert [item['title'] for item in items] == ["Item 03", "Item 05"]
+
+    with pytest.raises(ValueError):
+        index.query_items(sort='size')
+    with pytest.raises(ValueError):
+        index.query_items(cursor='not-a-cursor')
+
+def test_browse_api_route(client, temp_knowledge_base):
+    _write_items(temp_knowledge_base, 3)
+
+    response = client.get('/api/browse?limit=2')
+    assert response.status_code == 200
+    assert [item['title'] for item in response.json['items']] == ["Item 02", "Item 01"]
+
+    response = client.get(f"/api/browse?limit=2&cursor={response.json['next_cursor']}")
+    assert [item['title'] for item in response.json['items']] == ["Item 00", "Test Text"]
+
+    response = client.get('/api/browse?date_from=yesterday')
+    assert response.status_code == 400
+    assert 'Invalid date' in response.json['error']
+
+def test_browse_route_links_next_page(client, temp_knowledge_base):
+    response = client.get('/browse?limit=1&sort=title')
+    assert b"Test Text" in response.data
+    assert b"Test Article" not in response.data
+    assert b"Next page" in response.data
+
+def test_search_index_ranks_with_bm25_and_reconciles(temp_knowledge_base):
+    with open(os.path.join(temp_knowledge_base, 'articles', 'generators.md'), 'w') as f:
+        f.write("---\ntitle: Python Generators\nsummary: Lazy iteration.\nextracted_keywords: [yield]\nuser_tags: [python]\n---\n\nGenerators produce values on demand.")
+    with open(os.path.join(temp_knowledge_base, 'articles', 'rust.md'), 'w') as f:
+        f.write("---\ntitle: Rust Ownership\n---\n\nBorrowing rules, unlike Python generators.")
+    index = SearchIndex(temp_knowledge_base)
+    assert index.reconcile() == {'updated': 4, 'removed': 0}
+
+    results = index.search("python generators")
+    assert [result['filename'] for result in results] == ["articles/generators.md", "articles/rust.md"]
+    assert "**Python**" in results[0]['snippet']
+    assert index.search("gen*")[0]['title'] == "Python Generators"
+    assert index.search('") OR (') == [] # Operators in user input are never passed to FTS5
+
+    os.remove(os.path.join(temp_knowledge_base, 'articles', 'rust.md'))
+    assert index.reconcile() == {'updated': 0, 'removed': 1}
+    assert index.rebuild() == 3
+    assert [result['filename'] for result in index.search("python")] == ["articles/generators.md"]
+
+def test_indexes_are_reconciled_at_startup(client, temp_knowledge_base, mocker):
+    reconcile = mocker.spy(knowledge_reinforcer.metadata_index.MetadataIndex, 'reconcile')
+    web_app.start_background_workers()
+    assert reconcile.call_count == 1
+    for filename in ('.kb_metadata.sqlite3', '.kb_search.sqlite3'):
+        assert os.path.exists(os.path.join(temp_knowledge_base, filename))
+    run_batch([], [], "") # Already open in this process, so nothing is walked again
+    assert reconcile.call_count == 1
+
+def test_search_routes_highlight_and_escape(client, temp_knowledge_base):
+    save_to_knowledge_base("html.md", "---\ntitle: Markup Notes\n---\n\nUse <script> tags sparingly in markup.", "web-article")
+
+    response = client.get('/search?q=tags')
+    assert response.status_code == 200
+    assert b"Markup Notes" in response.data
+    assert b"&lt;script&gt; <mark>tags</mark>" in response.data
+
+    response = client.get('/api/search?q=sparingly')
+    assert response.json['results'][0]['filename'] == "articles/html.md"
+    assert "<mark>sparingly</mark>" in response.json['results'][0]['snippet']
+    assert client.get('/api/search?q=x&offset=abc').status_code == 400
+
+def test_run_search_prints_results(temp_knowledge_base, mocker, capsys):
+    mocker.patch('knowledge_reinforcer.main.BASE_KNOWLEDGE_DIR', temp_knowledge_base)
+    results = run_search("article")
+    assert results[0]['filename'] == "articles/test_article.md"
+    assert "1. Test Article (articles/test_article.md)" in capsys.readouterr().out
+
+def test_content_addressed_save_deduplicates(temp_knowledge_base):
+    first = "---\ntitle: Article\nsource_url: http://example.com/a\ndate_extracted: '2024-01-01T00:00:00'\n---\n\nSame   body.\n"
+    resubmitted = "---\ntitle: Article\nsource_url: http://example.com/a\ndate_extracted: '2024-02-01T00:00:00'\n---\n\nSame body.\n"
+
+    saved = save_to_knowledge_base("ignored.md", first, "web-article", mode='content-addressed')
+    digest = content_hash(first)
+    assert saved == SaveResult(os.path.join(temp_knowledge_base, 'objects', digest[:2], digest[2:4], f"{digest}.md"), False)
+
+    duplicate = save_to_knowledge_base("ignored_too.md", resubmitted, "web-article", mode='content-addressed')
+    assert duplicate == SaveResult(saved.path, True)
+    with open(saved.path, encoding='utf-8') as f:
+        assert "2024-01-01" in f.read() # The stored item was not rewritten
+
+    index = knowledge_reinforcer.metadata_index.get_metadata_index(temp_knowledge_base)
+    assert [item['content_hash'] for item in index.find_by_source_url("http://example.com/a")] == [digest]
+    assert [item['filename'] for item in index.find_by_title("Article")] == [f"objects/{digest[:2]}/{digest[2:4]}/{digest}.md"]
+
+def test_already_saved_urls_are_not_fetched_again_in_content_addressed_mode(client, temp_knowledge_base, mocker):
+    content = "---\ntitle: Article\nsource_url: http://example.com/a\n---\n\nBody.\n"
+    saved = save_to_knowledge_base("article.md", content, "web-article")
+    assert knowledge_reinforcer.storage.find_saved_source("http://example.com/a") is None # 'files' mode refetches
+    mocker.patch('knowledge_reinforcer.storage.STORAGE_MODE', 'content-addressed')
+    fetch_content = mocker.patch('knowledge_reinforcer.web_app.fetch_content')
+    fetch_source = mocker.patch('knowledge_reinforcer.main.fetch_source')
+
+    response = client.post('/process_input', data={'url': 'http://example.com/a'})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session['_flashes'][0][1] == "This content is already in the knowledge base."
+
+    mocker.patch('knowledge_reinforcer.kb_utils.COUNTER_FILE', os.path.join(temp_knowledge_base, 'kb_counter.txt'))
+    stats = run_batch(["http://example.com/a"], [], "", fetch_workers=1, process_workers=1)
+    assert (stats['saved'], stats['existing']) == (0, 1)
+    assert fetch_content.call_count == 0
+    assert fetch_source.call_count == 0
+    assert os.path.exists(saved.path)
+
+def test_process_input_reports_duplicate_content(client, mocker):
+    mocker.patch('knowledge_reinforcer.web_app.save_to_knowledge_base', return_value=SaveResult("objects/ab/cd/abcd.md", True))
+    mocker.patch('knowledge_reinforcer.web_app.process_content_to_markdown', return_value="# Test Markdown")
+
+    response = client.post('/process_input', data={'text': 'Already saved text.'})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session['_flashes'][0][1] == "This content is already in the knowledge base."
+
+def test_compressed_items_keep_a_plain_text_header(client, temp_knowledge_base, mocker):
+    content = "---\ntitle: Compressed Item\nuser_tags: [zip]\n---\n\n" + "Squeezable searchable body. " * 200
+    saved = save_to_knowledge_base("compressed.md", content, "web-article", compression='gzip')
+    assert saved.path.endswith(os.path.join('articles', 'compressed.mdz'))
+    assert os.path.getsize(saved.path) < len(content) / 4
+
+    decompress = mocker.spy(knowledge_reinforcer.storage.gzip, 'decompress')
+    assert read_front_matter(saved.path) == {'title': "Compressed Item", 'user_tags': ["zip"]}
+    assert decompress.call_count == 0 # Listing metadata never touches the body
+    metadata, body = read_markdown_file(saved.path)
+    assert metadata['title'] == "Compressed Item"
+    assert body == content.split('---\n', 2)[2]
+
+    assert b"Compressed Item" in client.get('/browse').data
+    assert client.get('/api/search?q=squeezable').json['results'][0]['filename'] == "articles/compressed.mdz"
+
+def test_save_is_atomic_when_the_write_fails(temp_knowledge_base, mocker):
+    original = "---\ntitle: Original\n---\n\nOriginal body."
+    saved = save_to_knowledge_base("atomic.md", original, "web-article")
+    mocker.patch('knowledge_reinforcer.storage.os.replace', side_effect=OSError("disk full"))
+
+    assert save_to_knowledge_base("atomic.md", "---\ntitle: Replacement\n---\n\nNew body.", "web-article") is None
+    with open(saved.path, encoding='utf-8') as f:
+        assert f.read() == original
+    assert sorted(os.listdir(os.path.dirname(saved.path))) == ["atomic.md", "test_article.md"] # No temp file left behind
+
 def test_view_file_route_success(client, temp_knowledge_base):
     response = client.get('/view/articles/test_article.md')
     assert response.status_code == 200
@@ -193,4 +666,270 @@ def test_view_file_route_success(client, temp_knowledge_base):
 def test_view_file_route_not_found(client, temp_knowledge_base):
     response = client.get('/view/nonexistent_file.md')
     assert response.status_code == 404
-    assert b"File not found" in response.data
\ No newline at end of file
+    assert b"File not found" in response.data
+
+def test_view_file_caches_render_and_answers_conditional_requests(client, temp_knowledge_base, mocker):
+    mocker.patch('knowledge_reinforcer.web_app.render_template', side_effect=lambda template, content, metadata, filename: content)
+    cache = RenderCache()
+    mocker.patch('knowledge_reinforcer.web_app.get_render_cache', return_value=cache)
+
+    response = client.get('/view/articles/test_article.md')
+    assert response.status_code == 200
+    assert b"Content of test article." in response.data
+    etag = response.headers['ETag']
+    assert response.headers['Last-Modified']
+    assert client.get('/view/articles/test_article.md').status_code == 200
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    revalidated = client.get('/view/articles/test_article.md', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+    assert (cache.hits, cache.misses) == (1, 1) # Not even a cache lookup
+
+    file_path = os.path.join(temp_knowledge_base, 'articles', 'test_article.md')
+    with open(file_path, 'w') as f:
+        f.write("---\ntitle: Test Article\n---\n\nEdited content.")
+    os.utime(file_path, ns=(1, 2_000_000_000_000_000_000))
+    edited = client.get('/view/articles/test_article.md', headers={'If-None-Match': etag})
+    assert edited.status_code == 200
+    assert b"Edited content." in edited.data
+
+def test_render_cache_evicts_least_recently_used(temp_knowledge_base):
+    cache = RenderCache(max_entries=1)
+    article = os.path.join(temp_knowledge_base, 'articles', 'test_article.md')
+    text = os.path.join(temp_knowledge_base, 'direct_text', 'test_text.md')
+    cache.get(article, os.stat(article))
+    cache.get(text, os.stat(text))
+    cache.get(article, os.stat(article))
+    assert (cache.hits, cache.misses) == (0, 3)
+
+def test_job_queue_claims_once_and_recovers_expired_leases(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), lease_seconds=60)
+    job_id = queue.enqueue({'text': "hello"})
+
+    job = queue.claim()
+    assert job['id'] == job_id and job['payload'] == {'text': "hello"}
+    assert queue.claim() is None # Already running under a lease
+
+    # The worker dies; after a restart the expired lease makes the job claimable again
+    restarted = JobQueue(str(tmp_path / 'jobs.sqlite3'), lease_seconds=60)
+    restarted._conn.execute("UPDATE jobs SET lease_expires_at = 0")
+    reclaimed = restarted.claim()
+    assert reclaimed['id'] == job_id and reclaimed['attempts'] == 2
+
+    assert not queue.complete(job_id, job['claim_token'], {'late': True}) # The first claim was lost
+    assert restarted.complete(job_id, reclaimed['claim_token'], {'filename': "a.md"})
+    assert restarted.get(job_id)['status'] == "done"
+    assert restarted.get(job_id)['result'] == {'filename': "a.md"}
+    assert restarted.claim() is None
+
+def test_job_queue_requeues_jobs_of_dead_processes_when_opened(tmp_path):
+    import socket
+    import subprocess
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), lease_seconds=300)
+    orphan_id = queue.enqueue({'text': "orphan"})
+    live_id = queue.enqueue({'text': "still running"})
+    queue.claim()
+    queue.claim()
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    dead_pid = exited.pid
+    queue._conn.execute("UPDATE jobs SET owner = ? WHERE id = ?", (f"{socket.gethostname()}:{dead_pid}", orphan_id))
+
+    restarted = JobQueue(str(tmp_path / 'jobs.sqlite3'), lease_seconds=300)
+    assert restarted.get(orphan_id)['status'] == "queued"
+    assert restarted.get(live_id)['status'] == "running" # Its owner, this process, is alive
+    reclaimed = restarted.claim() # No need to wait out the 300 s lease
+    assert reclaimed['id'] == orphan_id and reclaimed['attempts'] == 2
+
+@pytest.fixture
+def job_workers(client, tmp_path):
+    app.config['JOB_WORKERS'] = 1
+    app.config['JOB_DB'] = str(tmp_path / 'jobs.sqlite3')
+    yield
+    if web_app._job_workers is not None:
+        web_app._job_workers.stop(timeout=5)
+    web_app._job_queue = None
+    web_app._job_workers = None
+    app.config['JOB_WORKERS'] = 0
+
+def test_process_input_enqueues_job_and_reports_status(client, job_workers, mocker):
+    mocker.patch('knowledge_reinforcer.web_app.process_content_to_markdown', return_value="# Queued Markdown")
+    mock_save = mocker.patch('knowledge_reinforcer.web_app.save_to_knowledge_base',
+                             side_effect=lambda filename, content, content_type: SaveResult(os.path.join(BASE_KNOWLEDGE_DIR, 'direct_text', filename), False))
+
+    response = client.post('/process_input', data={'text': 'Queue me.'}, headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    status_url = response.json['status_url']
+
+    for _ in range(100):
+        job = client.get(status_url).json
+        if job['status'] in ('done', 'failed'):
+            break
+        time.sleep(0.05)
+    assert job['status'] == "done"
+    assert job['result']['filename'] == "direct_text/" + mock_save.call_args.args[0]
+    assert mock_save.call_args.args[0].endswith(f"_{job['id'][:8]}.md")
+    assert client.get('/jobs/unknown').status_code == 404
+
+
+# Tests for batch ingestion
+def test_read_batch_urls_skips_blank_and_comment_lines(tmp_path):
+    batch_file = tmp_path / "urls.txt"
+    batch_file.write_text("http://example.com/a\n\n# comment\n  http://example.com/b  \n")
+    assert _read_batch_urls(str(batch_file)) == ["http://example.com/a", "http://example.com/b"]
+
+
+def test_run_batch_saves_fetched_items_and_counts_failures(mocker, tmp_path, temp_knowledge_base):
+    mocker.patch('knowledge_reinforcer.kb_utils.COUNTER_FILE', str(tmp_path / 'kb_counter.txt'))
+    # Mocks cannot be pickled into a real process pool, so run the processing stage on threads
+    mocker.patch('knowledge_reinforcer.main.ProcessPoolExecutor', lambda max_workers, mp_context, initializer: ThreadPoolExecutor(max_workers, initializer=initializer))
+    mocker.patch('knowledge_reinforcer.main.ensure_nltk_resources')
+    mocker.patch('knowledge_reinforcer.main.fetch_source', side_effect=lambda url, content_type: (
+        SourceResult('error', None, None, "404") if url.endswith('missing') else SourceResult('ok', "<p>raw</p>", "Title", None))
+    )
+    mocker.patch('knowledge_reinforcer.main.process_content_to_markdown', return_value="# Markdown")
+    mock_save = mocker.patch('knowledge_reinforcer.main.save_to_knowledge_base', side_effect=lambda filename, content, content_type: SaveResult(filename, False))
+
+    stats = run_batch(["http://example.com/a", "http://example.com/missing", "http://example.com/b"], [], "", fetch_workers=2, process_workers=2)
+
+    assert stats['saved'] == 2
+    assert stats['failed'] == 1
+    assert mock_save.call_count == 2
+    saved_filenames = {call.args[0] for call in mock_save.call_args_list}
+    assert len(saved_filenames) == 2 # Batch items saved in the same second must not collide
+    assert {name.rsplit('_', 1)[1] for name in saved_filenames} == {"00001.md", "00003.md"}
+    assert kb_utils.get_next_sequence_number() == 4 # One block reserved for the whole batch
+
+
+@pytest.fixture
+def temp_index_files(mocker, tmp_path):
+    log_path = str(tmp_path / 'kb_index.jsonl')
+    legacy_path = str(tmp_path / 'kb_index.json')
+    mocker.patch('knowledge_reinforcer.kb_utils.INDEX_LOG_FILE', log_path)
+    mocker.patch('knowledge_reinforcer.kb_utils.INDEX_FILE', legacy_path)
+    mocker.patch('knowledge_reinforcer.kb_utils.INDEX_FSYNC', False)
+    return log_path, legacy_path
+
+def test_kb_index_appends_and_refreshes_by_offset(temp_index_files):
+    log_path, _ = temp_index_files
+    kb_utils.add_to_index({"title": "First"})
+    assert [item['title'] for item in kb_utils.read_index()] == ["First"]
+
+    # Another process appends, then crashes halfway through a second record
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write('{"title": "Second"}\n{"title": "Tor')
+    assert [item['title'] for item in kb_utils.read_index()] == ["First", "Second"]
+
+    kb_utils.add_to_index({"title": "Third"}) # Cuts off the torn line before appending
+    assert [item['title'] for item in kb_utils.read_index()] == ["First", "Second", "Third"]
+    assert all('date_saved' in item for item in kb_utils.read_index() if item['title'] != "Second")
+    with pytest.raises(ValueError):
+        kb_utils.add_to_index(["not", "a", "dict"])
+
+def test_kb_index_compaction_drops_corrupt_lines(temp_index_files):
+    log_path, _ = temp_index_files
+    kb_utils.add_to_index({"title": "Kept"})
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write('not json\n')
+    kb_utils.add_to_index({"title": "Also kept"})
+    assert len(kb_utils.read_index()) == 2
+
+    assert kb_utils.compact_index() == 2
+    with open(log_path, encoding='utf-8') as f:
+        assert 'not json' not in f.read()
+    kb_utils.add_to_index({"title": "After compaction"})
+    assert [item['title'] for item in kb_utils.read_index()] == ["Kept", "Also kept", "After compaction"]
+
+def test_kb_index_compacts_itself_once_corrupt_lines_pile_up(temp_index_files, mocker):
+    log_path, _ = temp_index_files
+    mocker.patch('knowledge_reinforcer.kb_utils.INDEX_COMPACT_THRESHOLD', 3)
+    kb_utils.add_to_index({"title": "Kept"})
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write('not json\n' * 2)
+    assert len(kb_utils.read_index()) == 1
+    with open(log_path, encoding='utf-8') as f:
+        assert f.read().count('not json') == 2 # Below the threshold
+
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write('not json\n')
+    assert [item['title'] for item in kb_utils.read_index()] == ["Kept"]
+    with open(log_path, encoding='utf-8') as f:
+        assert 'not json' not in f.read()
+    kb_utils.add_to_index({"title": "After compaction"})
+    assert [item['title'] for item in kb_utils.read_index()] == ["Kept", "After compaction"]
+
+def test_kb_index_imports_legacy_json(temp_index_files):
+    _, legacy_path = temp_index_files
+    with open(legacy_path, 'w', encoding='utf-8') as f:
+        json.dump([{"title": "Legacy"}], f, indent=2)
+    kb_utils.add_to_index({"title": "New"})
+    assert [item['title'] for item in kb_utils.read_index()] == ["Legacy", "New"]
+
+def test_sequence_allocator_reserves_disjoint_blocks_concurrently(tmp_path):
+    counter_path = str(tmp_path / 'kb_counter.txt')
+
+    def reserve_blocks(worker):
+        # A separate allocator per worker, as in separate processes: only the file lock is shared
+        allocator = kb_utils.SequenceAllocator(counter_path)
+        return [number for size in (1, 5, 20) * 10 for number in allocator.reserve(size)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        numbers = [number for block in executor.map(reserve_blocks, range(8)) for number in block]
+    assert sorted(numbers) == list(range(1, 8 * 260 + 1))
+
+    with open(counter_path) as f:
+        assert f.read() == str(8 * 260)
+    with pytest.raises(ValueError):
+        kb_utils.SequenceAllocator(counter_path).reserve(0)
+
+def test_get_next_sequence_number_continues_legacy_counter(mocker, tmp_path):
+    counter_path = tmp_path / 'kb_counter.txt'
+    counter_path.write_text('41')
+    mocker.patch('knowledge_reinforcer.kb_utils.COUNTER_FILE', str(counter_path))
+    assert kb_utils.get_next_sequence_number() == 42
+    assert list(kb_utils.reserve_sequence_numbers(3)) == [43, 44, 45]
+
+def test_fetch_engine_forgets_idle_hosts_beyond_the_limit(mocker):
+    mocker.patch('requests.Session.get', return_value=_streaming_response([b"<p>ok</p>"], {'Content-Type': 'text/html'}))
+    engine = FetchEngine(rate_per_host=1000, max_tracked_hosts=3)
+    try:
+        for i in range(10):
+            assert engine.fetch(f"http://host{i}.example/page").status == 'ok'
+        engine.fetch("http://host8.example/again")
+        engine.fetch("http://host10.example/page")
+    finally:
+        engine.close()
+    assert list(engine._hosts) == ["host9.example", "host8.example", "host10.example"]
+
+def test_http_cache_concurrent_stores_of_one_url_do_not_collide(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: cache.store("http://example.com/a", chr(ord("a") + i % 26) * 1000, etag=f'"{i}"'), range(50)))
+    assert len(set(cache.get("http://example.com/a"))) == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_fetch_engine_survives_cache_write_errors(mocker, tmp_path):
+    response = _streaming_response([b"<p>ok</p>"], {'Content-Type': 'text/html', 'ETag': '"v1"'})
+    mocker.patch('requests.Session.get', return_value=response)
+    cache = HttpCache(str(tmp_path))
+    mocker.patch.object(cache, 'store', side_effect=OSError("disk full"))
+    engine = FetchEngine(rate_per_host=1000, cache=cache)
+    try:
+        result = engine.fetch("http://example.com/page")
+    finally:
+        engine.close()
+    assert result.status == 'ok'
+    assert result.text == "<p>ok</p>"
+
+def test_dev_server_starts_workers_only_in_the_reloader_child(mocker, monkeypatch):
+    run = mocker.patch.object(app, 'run')
+    start = mocker.patch('knowledge_reinforcer.web_app.start_background_workers')
+    monkeypatch.delenv('WERKZEUG_RUN_MAIN', raising=False)
+    web_app.run_dev_server(3000)
+    assert start.call_count == 0 # Reloader parent
+
+    monkeypatch.setenv('WERKZEUG_RUN_MAIN', 'true')
+    web_app.run_dev_server(3000)
+    assert start.call_count == 1
+    assert run.call_count == 2